@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+bench_kifu.py
+- 合成した KIF コーパスで generate_kifu_list.py / generate_index_with_search.py の各段階を計測する
+    python bench_kifu.py                         … 850 / 8500 局で計測して bench_results.json に保存
+    python bench_kifu.py --games 850 85000 850000 --repeat 1
+    python bench_kifu.py --compare old.json      … 前回の結果と段階ごとに比べる（遅くなった段階に ▲）
+- 合成コーパス（一時ディレクトリ。--keep で残す）
+  * data/<分類>/*.kif を --dirs 個の分類に分ける（既定は 100 局に1分類、最低 8）
+  * 文字コードは cp932 7割 / UTF-8 2割 / UTF-8(BOM付き) 1割
+  * 棋戦： ありが 8割。ファイル名は YYYYMMDD 始まり / "2010.6.9" 形式 / 日付なし（開始日時 から補完）を混ぜる
+  * 対局者は段位・所属の括弧付きを混ぜ、手数は 20〜200 手（消費時間付き）
+  乱数の種を固定しているので、同じ引数なら同じコーパスになる
+- 計測する段階（各 --repeat 回の最小値、秒）
+  scan / read（全ファイル読み込み）/ decode（ヘッダ部の文字コード判定とデコード）/ header（extract_entry）/
+  list_cold（マニフェスト無しの build_kifu_entries）/ list_warm（マニフェストあり）/ json_write /
+  html_build（build_html + 検索索引 JSON）/ html_virtual（build_html virtual + 行 JSON）
+  大きさ: kifu_list.json / index.html / search_index.json / index.html(--virtual) / index_rows.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from generate_kifu_list import (base_dir, build_kifu_entries, decode_kif_bytes, extract_entry,
+                                header_prefix, scan_kif_files, write_kifu_list)
+from generate_index_with_search import build_html, build_rows_payload, build_search_index, load_sorted_items
+
+BENCH_VERSION = 1
+DEFAULT_GAMES = (850, 8500)
+DEFAULT_OUT = Path("bench_results.json")
+SEED = 20240707
+
+# -----------------------------
+# 合成コーパス
+# -----------------------------
+_SURNAMES = ["佐藤", "鈴木", "高橋", "田中", "伊藤", "渡辺", "山本", "中村", "小林", "加藤",
+             "吉田", "山田", "佐々木", "山口", "松本", "井上", "木村", "林", "斎藤", "清水",
+             "菊池", "及川", "千葉", "菅原", "小野寺", "熊谷", "阿部", "澤口", "田内", "工藤"]
+_GIVEN = ["太郎", "次郎", "健", "翔", "大輔", "遼", "拓海", "優", "直人", "誠", "陽菜", "美咲", "蓮", "悠真"]
+_RANKS = ["", "", "", "初段", "二段", "三段", "四段", "五段", "六段", "1級", "アマ"]
+_PLACES = ["盛岡", "一関", "宮古", "釜石", "花巻", "北上", "奥州", "二戸"]
+_EVENTS = ["岩手県名人戦", "岩手王座戦", "支部対抗戦", "県北支部例会", "若駒杯", "立花杯", "東北六県将棋大会",
+           "朝日アマ名人戦 岩手県予選", "シニア名人戦", "練習対局"]
+_ZEN = "１２３４５６７８９"
+_KAN = "一二三四五六七八九"
+_PIECES = ["歩", "歩", "歩", "銀", "金", "角", "飛", "桂", "香", "玉"]
+
+def _player(rng) -> str:
+    name = rng.choice(_SURNAMES) + ("　" if rng.random() < 0.5 else "") + rng.choice(_GIVEN)
+    rank = rng.choice(_RANKS)
+    if rank and rng.random() < 0.5:
+        name = f"{rank}　{name}"
+    elif rank:
+        name += rank
+    if rng.random() < 0.2:
+        name += f"({rng.choice(_PLACES)})"
+    return name
+
+def synth_kif(rng, day: date) -> tuple:
+    """(ファイル名の本体, KIF テキスト)"""
+    sente, gote = _player(rng), _player(rng)
+    event = f"第{rng.randint(1, 70)}回{rng.choice(_EVENTS)}"
+    lines = ["#KIF version=2.0 encoding=Shift_JIS",
+             f"開始日時：{day:%Y/%m/%d} {rng.randint(9, 18):02d}:{rng.randint(0, 59):02d}:00"]
+    if rng.random() < 0.8:
+        lines.append(f"棋戦：{event}")
+    if rng.random() < 0.5:
+        lines.append(f"場所：{rng.choice(_PLACES)}")
+    if rng.random() < 0.3:
+        lines.append(f"持ち時間：{rng.choice(['15分+60秒', '15分+30秒', '１時間', '40分'])}")
+    lines += ["手合割：平手　　", f"先手：{sente}", f"後手：{gote}", "手数----指手---------消費時間--"]
+    cum = [0, 0]
+    n = rng.randint(20, 200)
+    prev = None
+    for ply in range(1, n + 1):
+        sec = rng.randint(0, 90)
+        cum[ply % 2] += sec
+        f, r = rng.randint(1, 9), rng.randint(1, 9)
+        dest = "同　" if prev and rng.random() < 0.15 else _ZEN[f - 1] + _KAN[r - 1]
+        piece = rng.choice(_PIECES)
+        src = f"{rng.randint(1, 9)}{rng.randint(1, 9)}"
+        t = cum[ply % 2]
+        lines.append(f"{ply:>4} {dest}{piece}({src})   ({sec // 60:2d}:{sec % 60:02d}/"
+                     f"{t // 3600:02d}:{t // 60 % 60:02d}:{t % 60:02d})")
+        prev = dest
+    lines.append(f"{n + 1:>4} 投了")
+    lines.append(f"まで{n}手で{'先手' if n % 2 else '後手'}の勝ち")
+    # ファイル名: YYYYMMDD 始まり 6割 / "2010.6.9" 形式 2割 / 日付なし 2割
+    x = rng.random()
+    names = sente.split("　")[-1][:2] + gote.split("　")[-1][:2]
+    if x < 0.6:
+        stem = f"{day:%Y%m%d}{names}"
+    elif x < 0.8:
+        stem = f"{day.year}.{day.month}.{day.day}{names}"
+    else:
+        stem = f"{names}{rng.randint(1, 9999)}"
+    return stem, "\r\n".join(lines) + "\r\n"
+
+def make_corpus(root: Path, games: int, dirs: int, seed: int = SEED) -> Path:
+    """root/data/<分類>/*.kif を作る。戻り値: data ディレクトリ"""
+    rng = random.Random(seed)
+    data = root / "data"
+    dir_names = [f"分類{i:03d}" if i % 3 else f"kif{i:03d}" for i in range(dirs)]
+    for d in dir_names:
+        (data / d).mkdir(parents=True, exist_ok=True)
+    start = date(2005, 1, 1)
+    used = set()
+    for i in range(games):
+        day = start + timedelta(days=rng.randrange(365 * 21))
+        stem, text = synth_kif(rng, day)
+        d = dir_names[rng.randrange(dirs)]
+        name = f"{stem}.kif"
+        k = 1
+        while (d, name) in used:
+            k += 1
+            name = f"{stem}_{k}.kif"
+        used.add((d, name))
+        x = rng.random()
+        if x < 0.7:
+            raw = text.encode("cp932", errors="replace")
+        elif x < 0.9:
+            raw = text.replace("encoding=Shift_JIS", "encoding=UTF-8").encode("utf-8")
+        else:
+            raw = text.replace("encoding=Shift_JIS", "encoding=UTF-8").encode("utf-8-sig")
+        (data / d / name).write_bytes(raw)
+    return data
+
+# -----------------------------
+# 計測
+# -----------------------------
+def _timed(fn, repeat: int):
+    """fn() を repeat 回実行し、(最小秒, 最後の戻り値)"""
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return round(best, 4), result
+
+def bench_corpus(data: Path, repeat: int) -> dict:
+    stages, sizes = {}, {}
+    stages["scan"], files = _timed(lambda: list(scan_kif_files(data)), repeat)
+    stages["read"], blobs = _timed(lambda: [p.read_bytes() for _, p in files], repeat)
+    stages["decode"], _ = _timed(lambda: [decode_kif_bytes(header_prefix(b)) for b in blobs], repeat)
+    stages["header"], _ = _timed(
+        lambda: [extract_entry(p, d, b) for (d, p), b in zip(files, blobs)], repeat)
+    stages["list_cold"], (entries, manifest, _) = _timed(lambda: build_kifu_entries(data, {}), repeat)
+    stages["list_warm"], _ = _timed(lambda: build_kifu_entries(data, manifest), repeat)
+
+    list_json = data / "kifu_list.json"
+    stages["json_write"], _ = _timed(lambda: write_kifu_list(list_json, entries), repeat)
+    sizes["kifu_list.json"] = list_json.stat().st_size
+
+    items = load_sorted_items(list_json)
+    def page():
+        search = json.dumps(build_search_index(items), ensure_ascii=False, separators=(",", ":"))
+        return build_html(items), search
+    stages["html_build"], (html, search) = _timed(page, repeat)
+    sizes["index.html"] = len(html.encode("utf-8"))
+    sizes["search_index.json"] = len(search.encode("utf-8"))
+
+    def virtual():
+        page = build_html(items, virtual=True)
+        rows = json.dumps(build_rows_payload(items), ensure_ascii=False, separators=(",", ":"))
+        return page, rows
+    stages["html_virtual"], (page, rows) = _timed(virtual, repeat)
+    sizes["index.html(virtual)"] = len(page.encode("utf-8"))
+    sizes["index_rows.json"] = len(rows.encode("utf-8"))
+    return {"files": len(files), "stages": stages, "sizes": sizes}
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=base_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def compare(old: dict, new: dict, threshold: float = 1.2):
+    """同じ局数の結果どうしを段階ごとに比べて表示する（threshold 倍以上遅ければ ▲）"""
+    prev = {r["games"]: r for r in old.get("results", [])}
+    print(f"[比較] {old.get('commit') or '?'} → {new.get('commit') or '?'}")
+    for r in new["results"]:
+        o = prev.get(r["games"])
+        if o is None:
+            continue
+        print(f"  {r['games']} 局")
+        for name, sec in r["stages"].items():
+            before = o["stages"].get(name)
+            if not before:
+                continue
+            ratio = sec / before
+            mark = "▲" if ratio >= threshold else "▽" if ratio <= 1 / threshold else " "
+            print(f"    {mark} {name:<13} {before:>9.4f}s → {sec:>9.4f}s  ×{ratio:.2f}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="合成 KIF コーパスで一覧生成・index.html 生成の各段階を計測する")
+    ap.add_argument("--games", type=int, nargs="+", default=list(DEFAULT_GAMES),
+                    help=f"コーパスの局数（複数可。既定 {' '.join(map(str, DEFAULT_GAMES))}）")
+    ap.add_argument("--dirs", type=int, default=0, help="分類の数（0 で 局数/100、最低 8）")
+    ap.add_argument("--repeat", type=int, default=3, help="各段階の実行回数（最小値を採る。既定 3）")
+    ap.add_argument("--out", type=Path, default=DEFAULT_OUT, help=f"結果の JSON（既定 {DEFAULT_OUT}）")
+    ap.add_argument("--compare", type=Path, metavar="OLD.json", help="前回の結果と比べる")
+    ap.add_argument("--keep", action="store_true", help="合成コーパスを消さずに残す（場所を表示）")
+    args = ap.parse_args(argv)
+
+    results = []
+    for n in args.games:
+        dirs = args.dirs or max(8, n // 100)
+        root = Path(tempfile.mkdtemp(prefix=f"kifu_bench_{n}_"))
+        try:
+            t0 = time.perf_counter()
+            data = make_corpus(root, n, dirs)
+            synth = time.perf_counter() - t0
+            r = bench_corpus(data, args.repeat)
+            r.update({"games": n, "dirs": dirs, "synth_sec": round(synth, 2)})
+            results.append(r)
+            print(f"[INFO] {n} 局 / {dirs} 分類（合成 {synth:.1f}s）")
+            for name, sec in r["stages"].items():
+                print(f"  {name:<13} {sec:>9.4f}s")
+            for name, size in r["sizes"].items():
+                print(f"  {name:<20} {size:>12,d} bytes")
+        finally:
+            if args.keep:
+                print(f"[INFO] コーパス: {root}")
+            else:
+                shutil.rmtree(root, ignore_errors=True)
+
+    out = {"version": BENCH_VERSION, "commit": _git_commit(),
+           "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+           "python": platform.python_version(), "platform": platform.platform(),
+           "repeat": args.repeat, "results": results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, indent=2)
+    print(f"✅ {args.out} に書き出しました。")
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding="utf-8")), out)
+
+if __name__ == "__main__":
+    main()
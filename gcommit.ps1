@@ -6,12 +6,16 @@ Set-Location (git rev-parse --show-toplevel)
 # 1) 追跡/未追跡を一括ステージ（.gitignore尊重、フック自体は除外）
 git add -A -- ':!githooks/**'
 
-# 2) 生成（kifu_list.json / index.html）
-python generate_kifu_list.py
-python generate_index_with_search.py
+# 2) 生成（kifu_list.json / meta / pack(ローカルのみ) / 局面索引 / 序盤木 / 対局者索引 / index.html・検索索引）
+# kifu_list.json・meta・index.html は kifu_watch.py --once が1プロセスでまとめて作る（重複を除くなら --dedup）
+python kifu_watch.py --once
+python generate_kifu_pack.py
+python generate_position_index.py
+python generate_opening_tree.py
+python generate_player_index.py
 
 # 3) 生成物を保険でステージ
-git add -- data/kifu_list.json index.html
+git add -- data/kifu_list.json data/meta data/posidx data/opening data/players.json data/search_index.json index.html
 
 # 4) 何もステージされていなければ終了
 if (git diff --cached --quiet) {
@@ -16,16 +16,38 @@ generate_index_with_search.py
   * 「条件クリア」押下でソートも既定（日時降順）にリセット
   * 棋譜リンククリック時に現在の検索ハッシュ(#t,#p,#d)を viewer.html に ret= として引き渡す
   * ★ 分類セレクトの表示順を data/dir_order.txt で任意制御（未指定は従来順）
+  * 検索用の正規化文字列と文字 bigram の転置索引を生成時に作っておく（入力ごとの全行正規化をしない）。
+    索引は data/search_index.json に分け、最初に語を入れたときに読み込む（--inline でページに埋め込む）
+  * --virtual: 行を data/index_rows.json に分け、表示範囲の行だけを描画する（仮想スクロール）
+  * 列ソートの並び（日付/タイトル/分類 × 昇順/降順）を生成時に計算して埋め込む（クリック時は並びを適用するだけ）
+  * 入力は少し待ってから検索（debounce）。前回の結果を絞り込むだけで済む入力は前回の結果だけを調べ、
+    直近の検索結果はキャッシュする。ハイライトは画面内に見えている行だけ書き換える
+  * --worker: 正規化・照合を Web Worker で行う
+    （Worker が使えなければメインスレッドで同じ処理）
+  * --api URL: 検索を kifu_server.py の /api/search に問い合わせる（失敗したら data/search_index.json でページ内検索）
+  * --stream: kifu_list.json を1件ずつ読み、行を1行ずつファイルへ書く（出力は同じ。エントリ・行 HTML を全部は持たない）
+  * 局面検索（SFEN → data/posidx/ の局面索引を posidx.js で引く。generate_position_index.py の出力）
+  * 序盤の指し手統計（opening.html。generate_opening_tree.py の出力）・対局者別（player.html。generate_player_index.py の出力）へのリンク
 """
 
+import argparse
 import json
 import re
+import sys
+import unicodedata
 from pathlib import Path
 from datetime import datetime
+from html import escape as html_escape
+
+from generate_kifu_list import iter_kifu_list_offsets, read_entry_at
+from kifu_stats import RunStats, profiled
 
 DATA_JSON = Path("data/kifu_list.json")
 OUTPUT_HTML = Path("index.html")
 DIR_ORDER_TXT = Path("data/dir_order.txt")   # ← 新規
+ROWS_JSON = Path("data/index_rows.json")     # --virtual 時の行データ
+SEARCH_JSON = Path("data/search_index.json") # 検索索引（--inline 以外）
+STATS_JSON = Path("data/index.stats.json")   # --stats のレポート
 
 def pick(d, *candidates, default=""):
     for k in candidates:
@@ -54,30 +76,139 @@ def clean_player_name(s: str) -> str:
     t = re.sub(r"\s+", " ", t).strip()
     return t
 
+# === 検索用の正規化（index.html の nfkcLower / cleanNameForSearch + toKatakana と同じ結果にする） ===
+HONORIFIC_RE = r"(さん|君|くん|ちゃん|様|氏|殿|先生|師匠|プロ)$"
+
+def nfkc_lower(s: str) -> str:
+    return unicodedata.normalize("NFKC", s or "").lower()
+
+def to_katakana(s: str) -> str:
+    """ひらがな → カタカナ"""
+    return re.sub(r"[ぁ-ゖ]", lambda m: chr(ord(m.group(0)) + 0x60), s or "")
+
+def clean_name_for_search(s: str) -> str:
+    """JS の cleanNameForSearch と同じ（段位/称号は位置を問わず除去。TITLE_TOKENS を共用）"""
+    if not s:
+        return ""
+    t = nfkc_lower(s).replace("\u3000", " ").strip()
+    t = re.sub(r"[（(][^）)]*[）)]", " ", t)
+    for w in TITLE_TOKENS:
+        t = t.replace(w, " ")
+    t = re.sub(r"(?:十|九|八|七|六|五|四|三|二|初)?段$", " ", t)
+    t = re.sub(r"(?:\d+)?級$", " ", t)
+    t = re.sub(HONORIFIC_RE, " ", t)
+    return re.sub(r"\s+", " ", t).strip()
+
+def norm_title(s: str) -> str:
+    return nfkc_lower(s)
+
+def norm_players(s: str) -> str:
+    return re.sub(r"\s+", "", to_katakana(clean_name_for_search(s)))
+
+def bigrams(s: str):
+    """文字 bigram の集合（空白を含むものは検索語に現れないので除く）"""
+    return {s[i:i + 2] for i in range(len(s) - 1) if not (s[i].isspace() or s[i + 1].isspace())}
+
+def build_search_index(items):
+    """
+    行番号（= items の添字 = 行の data-i）ごとの正規化済み文字列と、bigram → 行番号リスト の転置索引。
+      {"t": [タイトル], "p": [対局者], "ti": {bigram: [i, ...]}, "pi": {...}}
+    クライアントは検索語の bigram の posting を積集合し、残った行だけ includes で確認する。
+    """
+    return search_index_from([norm_title(it["title"]) for it in items],
+                             [norm_players(it["players"]) for it in items])
+
+def search_index_from(titles, players):
+    """build_search_index の本体（正規化済みの列から作る。--stream は行データを持たずにこれを呼ぶ）"""
+    def invert(strings):
+        index = {}
+        for i, text in enumerate(strings):
+            for bg in sorted(bigrams(text)):
+                index.setdefault(bg, []).append(i)
+        return index
+
+    return {"t": titles, "p": players, "ti": invert(titles), "pi": invert(players)}
+
+def build_sort_orders(items):
+    """
+    列ヘッダのソート結果（行番号の並び）を全パターン前計算する。
+      {"date_asc", "date_desc", "title_asc", "title_desc", "dir_asc", "dir_desc"}
+    - 比較はページの JS と同じ: 日付は YYYYMMDD の数値、タイトル/分類は NFKC+小文字を UTF-16 の符号単位順
+    - タイトル/分類が同じなら日付の降順、それも同じなら行番号順（= 初期表示順）
+    """
+    return sort_orders_from([int(date_to_sortkey(it["date"])) for it in items],
+                            [norm_title(it["title"]) for it in items],
+                            [it["dir"] or "" for it in items])
+
+def sort_orders_from(date, titles, dirs):
+    """build_sort_orders の本体（date は YYYYMMDD の数値、titles は norm_title 済み、dirs は生の分類名）"""
+    n = len(date)
+    title = [t.encode("utf-16-be") for t in titles]
+    dirs = [nfkc_lower(d).encode("utf-16-be") for d in dirs]
+
+    base = list(range(n))
+    by_date_desc = sorted(base, key=date.__getitem__, reverse=True)   # 安定ソート（reverse でも同値は元の順）
+    orders = {
+        "date_asc": sorted(base, key=date.__getitem__),
+        "date_desc": by_date_desc,
+    }
+    for name, key in (("title", title), ("dir", dirs)):
+        orders[f"{name}_asc"] = sorted(by_date_desc, key=key.__getitem__)
+        orders[f"{name}_desc"] = sorted(by_date_desc, key=key.__getitem__, reverse=True)
+    return orders
+
+def json_for_script(obj) -> str:
+    """<script type="application/json"> に埋め込める JSON（</script> で閉じられないようにする）"""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+_COMPACT_JSON = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+def write_json_for_script(f, obj):
+    """json_for_script を少しずつ f に書く（文字列は1つのかたまりで出てくるので "</" が分かれることはない）"""
+    for chunk in _COMPACT_JSON.iterencode(obj):
+        f.write(chunk.replace("</", "<\\/"))
+
 def load_items(path: Path):
-    raw = json.loads(path.read_text(encoding="utf-8"))
-    items = []
-    for r in raw:
-        date = pick(r, "date", "日付")
-        title = pick(r, "title", "棋戦", "棋戦名")
-        players = pick(r, "players", "対局者", "先手後手", "先手_vs_後手")
-        dir_ = pick(r, "dir", "分類", "folder", "kifudir")
-        file_ = pick(r, "file", "filename", "kifu", "name")
-
-        if not title:
-            title = "（無題）"
-        if not players:
-            sente = pick(r, "sente", "先手")
-            gote  = pick(r, "gote", "後手")
-            players = f"{sente} vs {gote}" if (sente or gote) else ""
-
-        items.append({
-            "date": date,
-            "title": title,
-            "players": players,
-            "dir": dir_,
-            "file": file_
-        })
+    return normalize_items(json.loads(path.read_text(encoding="utf-8")))
+
+def normalize_items(raw):
+    """kifu_list.json の各要素（旧形式のキー名も可）→ {date, title, players, dir, file}"""
+    return [normalize_item(r) for r in raw]
+
+def normalize_item(r):
+    date = pick(r, "date", "日付")
+    title = pick(r, "title", "棋戦", "棋戦名")
+    players = pick(r, "players", "対局者", "先手後手", "先手_vs_後手")
+    dir_ = pick(r, "dir", "分類", "folder", "kifudir")
+    file_ = pick(r, "file", "filename", "kifu", "name")
+
+    if not title:
+        title = "（無題）"
+    if not players:
+        sente = pick(r, "sente", "先手")
+        gote  = pick(r, "gote", "後手")
+        players = f"{sente} vs {gote}" if (sente or gote) else ""
+
+    return {
+        "date": date,
+        "title": title,
+        "players": players,
+        "dir": dir_,
+        "file": file_
+    }
+
+def load_sorted_items(path: Path = DATA_JSON):
+    """load_items + 日付降順（生成時の並び = 行番号。kifu_server.py も同じ並びで行番号を返す）"""
+    return sort_items(load_items(path))
+
+def sort_items(items):
+    """日付降順に並べ替える（日付なしは末尾。同じ日付は元の順）"""
+    def date_key(it):
+        try:
+            return datetime.strptime(it["date"], "%Y-%m-%d")
+        except Exception:
+            return datetime.min
+    items.sort(key=date_key, reverse=True)
     return items
 
 def collect_dirs_in_appearance_order(items):
@@ -127,43 +258,34 @@ def apply_custom_order(all_dirs, preferred_order):
 def dir_label(d: str) -> str:
     return d if d else "（未分類）"
 
-def build_html(items):
-    # 分類の取得（従来：出現順）→ dir_order.txt があれば任意順に並べ替え
-    dirs_appearance = collect_dirs_in_appearance_order(items)
-    preferred = load_dir_order_list(DIR_ORDER_TXT)
-    ordered_dirs = apply_custom_order(dirs_appearance, preferred)
-
-    # 分類セレクト
-    dir_options_html = '<option value="">（すべて）</option>' + ''.join(
-        f'<option value="{d}">{dir_label(d)}</option>' for d in ordered_dirs
-    )
+def date_display(date: str) -> str:
+    """'YYYY-MM-DD' → 'YYYY/MM/DD'（解釈できなければそのまま）"""
+    try:
+        return datetime.strptime(date, "%Y-%m-%d").strftime("%Y/%m/%d")
+    except Exception:
+        return date
 
-    # 行HTML
+def build_rows_payload(items):
+    """
+    --virtual 用の行データ（行番号 = items の添字 = 検索索引の行番号）
+      [日付表示, タイトル, 分類, ファイル, 対局者の区切り, [[名前, クリーン名], ...]]
+    """
     rows = []
     for it in items:
-        href = f'viewer.html?kifu={it["file"]}&kifudir={it["dir"]}'
-        date_disp = it["date"]
-        try:
-            date_disp = datetime.strptime(it["date"], "%Y-%m-%d").strftime("%Y/%m/%d")
-        except Exception:
-            pass
-        # 対局者リンク
-        players_html = render_players_links(it["players"])
-        dir_txt = dir_label(it["dir"] or "")
-        dir_link = f'<a href="#" class="dirlink" data-dir="{it["dir"] or ""}">{dir_txt}</a>'
-        sortkey = date_to_sortkey(it["date"])
-        rows.append(
-            f'<tr class="row" data-title="{it["title"]}" data-players="{it["players"]}" '
-            f'data-dir="{it["dir"]}" data-date="{sortkey}">'
-            f'<td>{date_disp or "----/--/--"}</td>'
-            f'<td><a class="kifu-link" href="{href}" data-raw="{it["title"]}">{it["title"]}</a></td>'
-            f'<td>{players_html}</td>'
-            f'<td>{dir_link}</td>'
-            f'</tr>'
-        )
-    rows_html = "\n".join(rows)
-
-    HTML_TMPL = r"""<!DOCTYPE html>
+        sep, names = split_players(it["players"])
+        rows.append([date_display(it["date"]), it["title"],
+                     it["dir"] or "", it["file"], sep, [[n, clean_player_name(n)] for n in names]])
+    return {"rows": rows}
+
+def write_rows_json(items, path: Path = ROWS_JSON):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(build_rows_payload(items), f, ensure_ascii=False, separators=(",", ":"))
+
+def write_search_json(items, path: Path = SEARCH_JSON):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(build_search_index(items), f, ensure_ascii=False, separators=(",", ":"))
+
+HTML_TMPL = r"""<!DOCTYPE html>
 <html lang="ja">
 <head>
 <meta charset="UTF-8">
@@ -220,6 +342,28 @@ def build_html(items):
   /* 該当なし */
   tr.nohit td { text-align:center; color:#666; font-style:italic; }
 
+  /* 仮想スクロール（--virtual）: 行の高さを揃えるため1行表示・縞は行番号で付ける */
+  #tbl.virtual { table-layout: fixed; }
+  #tbl.virtual th:nth-child(1) { width: 7.5em; }
+  #tbl.virtual th:nth-child(3) { width: 30%; }
+  #tbl.virtual th:nth-child(4) { width: 9em; }
+  #tbl.virtual td { white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+  #tbl.virtual tr:nth-child(even) { background-color: transparent; }
+  #tbl.virtual tr.alt { background-color: #f9f9f9; }
+  #tbl.virtual tr.spacer td { padding: 0; border: 0; }
+
+  /* 局面検索 */
+  details.posq { margin: 0.4rem 0 0.6rem 0; font-size: 0.95rem; }
+  details.posq summary { cursor: pointer; color: #555; }
+  .posq-row { display: grid; grid-template-columns: 1fr 120px; gap: 8px; margin-top: 6px; }
+  .posq-row input, .posq-row button {
+    width: 100%; padding: 0.5rem 0.6rem; border: 1px solid #ccc; border-radius: 4px;
+    background: #fff; font-size: 16px; box-sizing: border-box;
+  }
+  .posq-row button { cursor: pointer; }
+  #posq-result { margin: 0.4rem 0 0 0; padding-left: 1.2rem; }
+  #posq-result a { color: #006633; text-decoration: none; }
+
   @media (max-width: 660px) {
     body { font-size: 1rem; }
     main { width: 600px; margin: 0.5rem auto; padding: 1rem; }
@@ -239,7 +383,7 @@ def build_html(items):
 <main>
   <div id="content-wrapper">
     <h2>岩手日報掲載棋譜・岩手県関連棋譜</h2>
-    <p class="lead">柿木棋譜ビューアで再生されます</p>
+    <p class="lead">柿木棋譜ビューアで再生されます　<a href="opening.html">序盤の指し手統計</a>　<a href="player.html">対局者別</a></p>
 
     <div class="toolbar">
       <div>
@@ -261,6 +405,15 @@ def build_html(items):
       </div>
     </div>
 
+    <details class="posq">
+      <summary>局面で検索（SFEN）</summary>
+      <div class="posq-row">
+        <input id="q-sfen" type="text" placeholder="例：lnsgkgsnl/1r5b1/ppppppppp/9/9/2P6/PP1PPPPPP/1B5R1/LNSGKGSNL w - 2">
+        <button id="btn-sfen">検索</button>
+      </div>
+      <ul id="posq-result"></ul>
+    </details>
+
     <div class="count"><span id="count"></span> 件表示</div>
 
     <table id="tbl">
@@ -272,7 +425,7 @@ def build_html(items):
           <th class="sortable" data-sort="dir"><span class="sort-label">分類 <span class="sort-indicator" id="ind-dir"></span></span></th>
         </tr>
       </thead>
-      <tbody id="tbody">
+      <tbody id="tbody"__TBODY_ATTRS__>
         __ROWS__
         <tr id="nohit" class="nohit" style="display:none;"><td colspan="4">該当する項目がありません</td></tr>
       </tbody>
@@ -280,6 +433,8 @@ def build_html(items):
   </div>
 </main>
 
+<script id="search-data" type="application/json"__SEARCH_ATTRS__>__SEARCH_DATA__</script>
+<script id="sort-data" type="application/json">__SORT_DATA__</script>
 <script>
 // === 検索 & ソート ユーティリティ ===
 (function(){
@@ -294,38 +449,140 @@ def build_html(items):
   const count    = $("#count");
   const nohitRow = $("#nohit");
 
-  // 基本正規化
-  function nfkcLower(s){ return (s||"").normalize('NFKC').toLowerCase(); }
-  function toKatakana(s){ return (s||"").replace(/[ぁ-ゖ]/g, ch => String.fromCharCode(ch.charCodeAt(0) + 0x60)); }
+  // 生成時に正規化済みの文字列と bigram 転置索引（build_search_index）。
+  // 既定では別ファイル（data-src）にあり、最初に語を入れたときに読み込む（--inline では埋め込み済み）。
+  // --worker では Web Worker が読み込んで検索する
+  const searchEl   = document.getElementById("search-data");
+  const SEARCH_URL = searchEl.dataset.src || "";
+  const USE_WORKER = !!searchEl.dataset.worker;
+  const SEARCH     = SEARCH_URL ? null : JSON.parse(searchEl.textContent);
+  let   API_URL    = searchEl.dataset.api || "";   // --api: 検索を問い合わせる先
+  // 列ソートの並び（build_sort_orders）: "date_desc" など → 行番号の配列
+  const SORTS  = JSON.parse(document.getElementById("sort-data").textContent);
 
-  function normTitle(s){ return nfkcLower(s); }
+  // 行のモデル: 行番号 i（= data-i）で引く。表示は order（並び）→ view（条件に合う行）
+  //   静的  : 行は HTML に埋め込み済み。rowEls[i] の表示/非表示を切り替える
+  //   仮想  : 行は tbody の data-rows（build_rows_payload）から、表示範囲の分だけ <tr> を作る
+  const ROWS_URL = tbody.dataset.rows || "";
+  const VIRTUAL  = !!ROWS_URL;
+  let ROWS    = [];   // 仮想: [日付表示, タイトル, 分類, ファイル, 区切り, [[名前, クリーン名], ...]]
+  let rowEls  = [];   // 静的: 行番号 → <tr>
+  let dirOf   = [];
+  let order   = [];
+  let view    = [];
+  let filter  = {hits: null, dir: "", tHl: [], pHl: []};
 
-  function cleanNameForSearch(s){
-    if(!s) return "";
-    let t = nfkcLower(s).replace(/\u3000/g," ").trim();
-    t = t.replace(/[（(][^）)]*[）)]/g, " ");  // 括弧
-    const tokens = ["十段","九段","八段","七段","六段","五段","四段","三段","二段","初段",
-                    "名人","竜王","王位","王座","王将","棋王","叡王","棋聖","女流","アマ"];
-    tokens.forEach(w=>{ t = t.replace(new RegExp(w,"g"), " "); });
-    t = t.replace(/(?:十|九|八|七|六|五|四|三|二|初)?段$/g, " ");
-    t = t.replace(/(?:\d+)?級$/g, " ");
-    t = t.replace(/(さん|君|くん|ちゃん|様|氏|殿|先生|師匠|プロ)$/g, " ");
-    t = t.replace(/\s+/g, " ").trim();
-    return t;
-  }
-  function normPlayers(s){ return toKatakana(cleanNameForSearch(s)).replace(/\s+/g,""); }
+  // === 検索の中核（正規化・索引引き・結果キャッシュ） ===
+  // SEARCH = build_search_index の出力（語の正規化だけ使うなら null でよい。ti/pi が null なら全行を走査する）。
+  // --worker では関数ごと文字列にして Web Worker でも動かすので、外側の変数を参照しないこと
+  function searchCore(SEARCH){
+    // 基本正規化
+    function nfkcLower(s){ return (s||"").normalize('NFKC').toLowerCase(); }
+    function toKatakana(s){ return (s||"").replace(/[ぁ-ゖ]/g, ch => String.fromCharCode(ch.charCodeAt(0) + 0x60)); }
 
-  function tokensFromTitleInput(s){
-    s = nfkcLower(s).replace(/\u3000/g," ").trim();
-    if(!s) return [];
-    return s.split(/\s+/).filter(Boolean);
-  }
-  function tokensFromPlayersInput(s){
-    s = cleanNameForSearch(s);
-    s = toKatakana(s).replace(/\u3000/g," ").trim();
-    if(!s) return [];
-    return s.split(/\s+/).filter(Boolean).map(x=>x.replace(/\s+/g,""));
+    function cleanNameForSearch(s){
+      if(!s) return "";
+      let t = nfkcLower(s).replace(/\u3000/g," ").trim();
+      t = t.replace(/[（(][^）)]*[）)]/g, " ");  // 括弧
+      const tokens = ["十段","九段","八段","七段","六段","五段","四段","三段","二段","初段",
+                      "名人","竜王","王位","王座","王将","棋王","叡王","棋聖","女流","アマ"];
+      tokens.forEach(w=>{ t = t.replace(new RegExp(w,"g"), " "); });
+      t = t.replace(/(?:十|九|八|七|六|五|四|三|二|初)?段$/g, " ");
+      t = t.replace(/(?:\d+)?級$/g, " ");
+      t = t.replace(/(さん|君|くん|ちゃん|様|氏|殿|先生|師匠|プロ)$/g, " ");
+      t = t.replace(/\s+/g, " ").trim();
+      return t;
+    }
+
+    // bigram の posting を積集合 → 残った行だけ部分一致を確認。1文字の語は正規化済み文字列を走査
+    function intersect(a, b){
+      const out = [];
+      let i = 0, j = 0;
+      while(i < a.length && j < b.length){
+        if(a[i] === b[j]){ out.push(a[i]); i++; j++; }
+        else if(a[i] < b[j]) i++;
+        else j++;
+      }
+      return out;
+    }
+    function lookupToken(tok, norm, index){
+      const chars = Array.from(tok);
+      if(chars.length < 2 || !index){
+        const out = [];
+        for(let i=0; i<norm.length; i++) if(norm[i].includes(tok)) out.push(i);
+        return out;
+      }
+      let ids = null;
+      for(let k=0; k+1<chars.length; k++){
+        const post = index[chars[k] + chars[k+1]];
+        if(!post) return [];
+        ids = ids ? intersect(ids, post) : post;
+        if(!ids.length) return [];
+      }
+      return ids.filter(i=>norm[i].includes(tok));
+    }
+    // 全語に一致する行番号（昇順の配列。語が無ければ null = 全行）
+    function matchRows(tTokens, pTokens){
+      let ids = null;
+      for(const tok of tTokens){
+        const hit = lookupToken(tok, SEARCH.t, SEARCH.ti);
+        ids = ids ? intersect(ids, hit) : hit;
+      }
+      for(const tok of pTokens){
+        const hit = lookupToken(tok, SEARCH.p, SEARCH.pi);
+        ids = ids ? intersect(ids, hit) : hit;
+      }
+      return ids;
+    }
+
+    // 検索結果のキャッシュ（条件 → 行番号。直近 CACHE_MAX 件）。
+    // 前回の語がどれも今回のいずれかの語に含まれる（= 語を伸ばした/足しただけ）なら、前回の結果だけを調べ直す
+    const CACHE_MAX = 32;
+    const cache = new Map();
+    let last = null;   // {tTokens, pTokens, ids}
+    function covers(oldToks, newToks){
+      return oldToks.every(o => newToks.some(n => n.includes(o)));
+    }
+    function searchRows(tTokens, pTokens){
+      if(!tTokens.length && !pTokens.length){ last = null; return null; }
+      const key = tTokens.join(" ") + "\u0000" + pTokens.join(" ");
+      let ids = cache.get(key);
+      if(ids){
+        cache.delete(key);   // 最近使ったものを末尾へ
+      }else if(last && covers(last.tTokens, tTokens) && covers(last.pTokens, pTokens)){
+        ids = last.ids.filter(i =>
+          tTokens.every(tok => SEARCH.t[i].includes(tok)) && pTokens.every(tok => SEARCH.p[i].includes(tok)));
+      }else{
+        ids = matchRows(tTokens, pTokens);
+      }
+      cache.set(key, ids);
+      if(cache.size > CACHE_MAX) cache.delete(cache.keys().next().value);
+      last = {tTokens, pTokens, ids};
+      return ids;
+    }
+
+    function tokensFromTitleInput(s){
+      s = nfkcLower(s).replace(/\u3000/g," ").trim();
+      if(!s) return [];
+      return s.split(/\s+/).filter(Boolean);
+    }
+    function tokensFromPlayersInput(s){
+      s = cleanNameForSearch(s);
+      s = toKatakana(s).replace(/\u3000/g," ").trim();
+      if(!s) return [];
+      return s.split(/\s+/).filter(Boolean).map(x=>x.replace(/\s+/g,""));
+    }
+
+    // 入力文字列のまま検索（Worker からはこれを呼ぶ）
+    function query(title, players){
+      return searchRows(tokensFromTitleInput(title), tokensFromPlayersInput(players));
+    }
+
+    return {nfkcLower, toKatakana, cleanNameForSearch, tokensFromTitleInput, tokensFromPlayersInput,
+            matchRows, searchRows, query};
   }
+  let core = searchCore(SEARCH);
+  const {nfkcLower, tokensFromTitleInput, tokensFromPlayersInput} = core;
 
   // ハイライト
   function highlightText(rawText, tokens){
@@ -376,76 +633,248 @@ def build_html(items):
     if(sortKey === "dir")   indDir.textContent   = arrow;
   }
 
-  function rowValue(row, key){
-    if(key === "date"){
-      const v = row.dataset.date || "00000000";
-      return parseInt(v, 10) || 0;
-    }
-    if(key === "title"){
-      return normTitle(row.dataset.title || "");
-    }
-    if(key === "dir"){
-      return normTitle(row.dataset.dir || "");
-    }
-    return "";
-  }
-
+  // 並びは生成時に計算済み（同順位は日付降順 → 初期表示順）。ここでは適用するだけ
   function sortRows(){
-    const rows = Array.from(tbody.querySelectorAll(".row"));
-    rows.sort((a,b)=>{
-      const va = rowValue(a, sortKey);
-      const vb = rowValue(b, sortKey);
-      if(sortKey === "date"){
-        return sortAsc ? (va - vb) : (vb - va);
-      }else{
-        if(va < vb) return sortAsc ? -1 : 1;
-        if(va > vb) return sortAsc ? 1 : -1;
-        // tie-breaker: date desc
-        const da = rowValue(a, "date"), db = rowValue(b, "date");
-        return db - da;
-      }
-    });
-    // 再配置
-    for(const r of rows){ tbody.appendChild(r); }
-    // nohit 行は常に末尾
-    tbody.appendChild(nohitRow);
+    order = SORTS[`${sortKey}_${sortAsc ? "asc" : "desc"}`];
     setSortIndicator();
+    if(VIRTUAL){ refresh(); return; }
+    // 再配置（表示/非表示はそのまま）。まとめて1回で差し替える
+    const frag = document.createDocumentFragment();
+    for(const i of order){ frag.appendChild(rowEls[i]); }
+    // nohit 行は常に末尾
+    frag.appendChild(nohitRow);
+    tbody.appendChild(frag);
   }
 
   // メイン適用
   function apply({skipHashUpdate=false}={}){
-    const rows = Array.from(tbody.querySelectorAll(".row"));
     const tTokens = tokensFromTitleInput(qTitle.value);
     const pTokens = tokensFromPlayersInput(qPlayers.value);
-    const dirVal  = qDir.value;
-
-    let shown = 0;
-    rows.forEach(tr=>{
-      const titleNorm   = normTitle(tr.dataset.title);
-      const playersNorm = normPlayers(tr.dataset.players);
-      const dir         = tr.dataset.dir || "";
-
-      const okTitle   = tTokens.every(tok => titleNorm.includes(tok));
-      const okPlayers = pTokens.every(tok => playersNorm.includes(tok));
-      const okDir     = !dirVal || dir === dirVal;
-
-      const visible = okTitle && okPlayers && okDir;
-      tr.style.display = visible ? "" : "none";
-      if(visible) shown++;
-
-      // --- ハイライト ---
-      const tAnchor = tr.children[1].querySelector("a.kifu-link");
-      const tRaw = tAnchor.getAttribute("data-raw") || tAnchor.textContent;
-      tAnchor.innerHTML = highlightText(tRaw, qTitle.value.trim()? tTokens: []);
-      const pCell = tr.children[2];
-      for(const a of pCell.querySelectorAll("a.plink")){
-        const pRaw = a.getAttribute("data-raw") || a.textContent;
-        a.innerHTML = highlightText(pRaw, qPlayers.value.trim()? (qPlayers.value.normalize('NFKC').split(/\s+/).filter(Boolean)) : []);
+    const next = {
+      dir:  qDir.value,
+      tHl:  qTitle.value.trim()? tTokens: [],
+      pHl:  qPlayers.value.trim()? (qPlayers.value.normalize('NFKC').split(/\s+/).filter(Boolean)) : [],
+    };
+    if(!skipHashUpdate) updateHash();
+    searchSeq++;   // 返ってくる途中の Worker の結果は捨てる
+    if(tTokens.length || pTokens.length){
+      if(API_URL){
+        pendingFilter = next;
+        searchByApi(searchSeq, qTitle.value, qPlayers.value);
+        return;
       }
+      if(worker){
+        pendingFilter = next;
+        worker.postMessage({seq: searchSeq, t: qTitle.value, p: qPlayers.value});
+        return;
+      }
+      if(!searchReady){ searchOnMainThread(); return; }   // 索引の読み込み待ち（読み込み後に apply し直す）
+    }
+    const ids = core.searchRows(tTokens, pTokens);
+    filter = {...next, hits: ids ? new Set(ids) : null};
+    refresh();
+  }
+
+  // === --worker: 検索（正規化・照合）を Web Worker で行い、ページは一致した行番号だけ受け取る ===
+  // Worker は searchCore を文字列にした Blob から作る。作れない/失敗したらメインスレッドで同じ searchCore を使う
+  let worker = null, searchSeq = 0, searchReady = !SEARCH_URL, searchLoading = null, pendingFilter = null;
+  function workerMain(){
+    let ready = null;
+    self.onmessage = async (e)=>{
+      const msg = e.data;
+      if(msg.url){
+        ready = fetch(msg.url).then(r=>{ if(!r.ok) throw new Error(r.status); return r.json(); }).then(searchCore);
+        ready.catch(()=>self.postMessage({error: true}));
+        return;
+      }
+      let c;
+      try{ c = await ready; }catch(_){ return; }
+      self.postMessage({seq: msg.seq, ids: c.query(msg.t, msg.p)});
+    };
+  }
+  // 索引を読めないとき: 読み込み済みの行から索引と同じ正規化の文字列を作り、bigram 索引なしで全行を走査する
+  function searchFromRows(){
+    const {nfkcLower, toKatakana, cleanNameForSearch} = searchCore(null);
+    const t = [], p = [];
+    for(let i=0; i<dirOf.length; i++){
+      let title, players;
+      if(VIRTUAL){
+        const r = ROWS[i];
+        title = r[1];
+        players = r[5].map(n=>n[0]).join(r[4] ? ` ${r[4]} ` : " ");
+      }else{
+        title = rowEls[i].dataset.title || "";
+        players = rowEls[i].dataset.players || "";
+      }
+      t.push(nfkcLower(title));
+      p.push(toKatakana(cleanNameForSearch(players)).replace(/\s+/g, ""));
+    }
+    return searchCore({t, p, ti: null, pi: null});
+  }
+  // 索引をメインスレッドに読み込む（何度呼ばれても読み込みは1回）
+  function searchOnMainThread(){
+    if(worker){ worker.terminate(); worker = null; }
+    if(!searchLoading) searchLoading = (async ()=>{
+      try{
+        const r = await fetch(SEARCH_URL);
+        if(!r.ok) throw new Error(r.status);
+        core = searchCore(await r.json());
+      }catch(e){
+        core = searchFromRows();
+      }
+      searchReady = true;
+      apply({skipHashUpdate:true});
+    })();
+    return searchLoading;
+  }
+  // === --api: 検索を kifu_server.py に任せ、一致した行番号だけ受け取る ===
+  // 失敗した・行数が合わない（ページとサーバの一覧が違う）ときは、以後 data-src の索引でページ内検索にする
+  async function searchByApi(seq, t, p){
+    let res;
+    try{
+      const r = await fetch(`${API_URL}?t=${encodeURIComponent(t)}&p=${encodeURIComponent(p)}&limit=0`);
+      if(!r.ok) throw new Error(r.status);
+      res = await r.json();
+      if(res.rows !== dirOf.length) throw new Error("rows");
+    }catch(e){
+      API_URL = "";
+      searchOnMainThread();
+      return;
+    }
+    if(seq !== searchSeq) return;
+    filter = {...pendingFilter, hits: res.ids ? new Set(res.ids) : null};
+    refresh();
+  }
+  if(SEARCH_URL && USE_WORKER && !API_URL){
+    try{
+      const src = `${searchCore.toString()}\n(${workerMain.toString()})();`;
+      worker = new Worker(URL.createObjectURL(new Blob([src], {type: "text/javascript"})));
+      worker.onmessage = (e)=>{
+        if(e.data.error){ searchOnMainThread(); return; }
+        if(e.data.seq !== searchSeq) return;
+        filter = {...pendingFilter, hits: e.data.ids ? new Set(e.data.ids) : null};
+        refresh();
+      };
+      worker.onerror = ()=>searchOnMainThread();
+      worker.postMessage({url: new URL(SEARCH_URL, location.href).href});
+    }catch(e){
+      searchOnMainThread();
+    }
+  }
+
+  // filter と order から view を作り直して表示に反映
+  function refresh(){
+    const {hits, dir} = filter;
+    view = order.filter(i => (!hits || hits.has(i)) && (!dir || dirOf[i] === dir));
+    count.textContent = view.length;
+    if(VIRTUAL){ renderWindow(true); return; }
+
+    hlKey = filter.tHl.join(" ") + "\u0000" + filter.pHl.join(" ");
+    const inView = new Uint8Array(rowEls.length);
+    for(const i of view) inView[i] = 1;
+    rowEls.forEach((tr, i)=>{
+      // 表示が変わる行だけ触る
+      if(shown[i] !== inView[i]){
+        tr.style.display = inView[i] ? "" : "none";
+        shown[i] = inView[i];
+      }
+      // ハイライトは画面内の行だけ（画面外の行はスクロールで入ってきたときに付ける）
+      if(inView[i] && (!observer || onScreen.has(i))) highlightRow(i);
     });
-    count.textContent = shown;
-    nohitRow.style.display = shown ? "none" : "";
-    if(!skipHashUpdate) updateHash();
+    nohitRow.style.display = view.length ? "none" : "";
+  }
+
+  // --- ハイライト（静的）: 行ごとに付けた条件を覚えておき、変わった行だけ書き換える ---
+  let hlKey = "\u0000";
+  let shown = new Uint8Array(0);   // 行番号 → 1=表示中
+  let hlDone = [];                 // 行番号 → その行に付いているハイライトの条件
+  const onScreen = new Set();
+  const observer = (!VIRTUAL && "IntersectionObserver" in window) ? new IntersectionObserver((entries)=>{
+    for(const e of entries){
+      const i = +e.target.dataset.i;
+      if(e.isIntersecting){ onScreen.add(i); highlightRow(i); }
+      else onScreen.delete(i);
+    }
+  }, {rootMargin: "200px 0px"}) : null;
+
+  function highlightRow(i){
+    if(hlDone[i] === hlKey) return;
+    hlDone[i] = hlKey;
+    const tr = rowEls[i];
+    const tAnchor = tr.children[1].querySelector("a.kifu-link");
+    const tRaw = tAnchor.getAttribute("data-raw") || tAnchor.textContent;
+    tAnchor.innerHTML = highlightText(tRaw, filter.tHl);
+    const pCell = tr.children[2];
+    for(const a of pCell.querySelectorAll("a.plink")){
+      const pRaw = a.getAttribute("data-raw") || a.textContent;
+      a.innerHTML = highlightText(pRaw, filter.pHl);
+    }
+  }
+
+  // === 仮想スクロール（表示範囲 ± OVERSCAN 行だけ <tr> を作り、前後は高さだけの空行で埋める） ===
+  const OVERSCAN = 15;
+  let rowH = 0;                 // 1行の高さ（最初の描画で実測）
+  let winFirst = -1, winLast = -1;
+
+  function esc(s){
+    return String(s).replace(/[&<>"']/g, c=>({"&":"&amp;","<":"&lt;",">":"&gt;",'"':"&quot;","'":"&#39;"}[c]));
+  }
+  // highlightText の仮想版（エスケープしながら <mark> を付ける）
+  function markText(raw, tokens){
+    const uniq = Array.from(new Set(tokens.filter(Boolean))).sort((a,b)=>b.length-a.length);
+    if(!raw || !uniq.length) return esc(raw);
+    const re = new RegExp(uniq.map(tk=>tk.replace(/[.*+?^${}()|[\]\\]/g, "\\$&")).join("|"), "gi");
+    let out = "", last = 0, m;
+    while((m = re.exec(raw))){
+      out += esc(raw.slice(last, m.index)) + `<mark>${esc(m[0])}</mark>`;
+      last = m.index + m[0].length;
+    }
+    return out + esc(raw.slice(last));
+  }
+  function rowHtml(i, pos){
+    const [date, title, dir, file, sep, names] = ROWS[i];
+    const players = names.map(([n, c])=>
+      `<a class="plink" href="#" data-raw="${esc(n)}" data-player="${esc(c)}">${markText(n, filter.pHl)}</a>`
+    ).join(` ${sep} `);
+    return `<tr class="row${pos % 2 ? " alt" : ""}" data-i="${i}">`
+      + `<td>${esc(date || "----/--/--")}</td>`
+      + `<td><a class="kifu-link" href="viewer.html?kifu=${esc(file)}&amp;kifudir=${esc(dir)}" data-raw="${esc(title)}">${markText(title, filter.tHl)}</a></td>`
+      + `<td>${players}</td>`
+      + `<td><a href="#" class="dirlink" data-dir="${esc(dir)}">${esc(dir || "（未分類）")}</a></td>`
+      + `</tr>`;
+  }
+  function spacer(px){
+    return px > 0 ? `<tr class="spacer"><td colspan="4" style="height:${px}px"></td></tr>` : "";
+  }
+  function renderWindow(force){
+    const top = tbody.getBoundingClientRect().top;
+    const h = rowH || 48;
+    const first = Math.max(0, Math.min(view.length, Math.floor(-top / h) - OVERSCAN));
+    const last  = Math.min(view.length, Math.max(first, Math.ceil((window.innerHeight - top) / h) + OVERSCAN));
+    if(!force && first === winFirst && last === winLast) return;
+    winFirst = first; winLast = last;
+
+    let html = spacer(first * h);
+    for(let k=first; k<last; k++) html += rowHtml(view[k], k);
+    html += spacer((view.length - last) * h);
+    tbody.innerHTML = html;
+    tbody.appendChild(nohitRow);
+    nohitRow.style.display = view.length ? "none" : "";
+
+    if(!rowH && last > first){
+      const tr = tbody.querySelector("tr.row");
+      if(tr && tr.offsetHeight){ rowH = tr.offsetHeight; renderWindow(true); }
+    }
+  }
+  if(VIRTUAL){
+    $("#tbl").classList.add("virtual");
+    let ticking = false;
+    window.addEventListener("scroll", ()=>{
+      if(ticking) return;
+      ticking = true;
+      requestAnimationFrame(()=>{ ticking = false; renderWindow(false); });
+    }, {passive: true});
+    window.addEventListener("resize", ()=>{ rowH = 0; renderWindow(true); });
   }
 
   function clearAll(){
@@ -460,8 +889,15 @@ def build_html(items):
   }
 
   // イベント
-  qTitle.addEventListener("input", ()=>apply());
-  qPlayers.addEventListener("input", ()=>apply());
+  // 入力中は DEBOUNCE_MS 止まってから検索する
+  const DEBOUNCE_MS = 120;
+  let inputTimer = 0;
+  function applySoon(){
+    clearTimeout(inputTimer);
+    inputTimer = setTimeout(()=>apply(), DEBOUNCE_MS);
+  }
+  qTitle.addEventListener("input", applySoon);
+  qPlayers.addEventListener("input", applySoon);
   qDir.addEventListener("change", ()=>apply());
   btnClear.addEventListener("click", clearAll);
 
@@ -518,8 +954,25 @@ document.addEventListener("click", (e)=>{
     });
   });
 
-  // 初期化: ハッシュ復元 → ソート → 適用
-  (function init(){
+  // 初期化: 行の読み込み → ハッシュ復元 → ソート → 適用
+  (async function init(){
+    if(VIRTUAL){
+      try{
+        ROWS = (await (await fetch(ROWS_URL)).json()).rows;
+      }catch(e){
+        nohitRow.style.display = "";
+        nohitRow.firstElementChild.textContent = "一覧の読み込みに失敗しました";
+        return;
+      }
+      dirOf = ROWS.map(r=>r[2] || "");
+    }else{
+      tbody.querySelectorAll(".row").forEach(tr=>{ rowEls[+tr.dataset.i] = tr; });
+      dirOf = rowEls.map(tr=>tr.dataset.dir || "");
+      shown  = new Uint8Array(rowEls.length).fill(1);
+      hlDone = rowEls.map(()=>"\u0000");   // 埋め込み時はハイライト無し
+      if(observer) rowEls.forEach(tr=>observer.observe(tr));
+    }
+
     const {t,p,d} = parseHash();
     if(t) qTitle.value = t;
     if(p) qPlayers.value = p;
@@ -537,14 +990,205 @@ document.addEventListener("click", (e)=>{
   })();
 })();
 </script>
+<script src="posidx.js"></script>
+<script>
+// === 局面検索（SFEN → 局面索引） ===
+(function(){
+  const input = document.querySelector("#q-sfen");
+  const btn   = document.querySelector("#btn-sfen");
+  const out   = document.querySelector("#posq-result");
+
+  function message(text){
+    out.innerHTML = "";
+    const li = document.createElement("li");
+    li.textContent = text;
+    out.appendChild(li);
+  }
+
+  async function run(){
+    if(!input.value.trim()){ out.innerHTML = ""; return; }
+    if(!window.KifuPosIdx){ message("局面検索を読み込めませんでした。"); return; }
+    let key;
+    try{ key = KifuPosIdx.hashSfen(input.value); }
+    catch(e){ message(e.message); return; }
+    try{
+      const [meta, hits] = await Promise.all([KifuPosIdx.loadMeta(), KifuPosIdx.lookup(key)]);
+      if(!hits.length){ message("この局面になった対局はありません"); return; }
+      out.innerHTML = "";
+      for(const h of hits){
+        const [dir, file, title, date] = meta.games[h.game] || [];
+        if(!file) continue;
+        const li = document.createElement("li");
+        const a = document.createElement("a");
+        a.href = `viewer.html?kifu=${encodeURIComponent(file)}&kifudir=${encodeURIComponent(dir)}&tesuu=${h.ply}`;
+        a.textContent = title || file;
+        li.appendChild(a);
+        li.appendChild(document.createTextNode(`（${date || "----/--/--"}）${h.ply}手目`));
+        out.appendChild(li);
+      }
+    }catch(e){
+      message("局面索引の読み込みに失敗しました。");
+    }
+  }
+
+  btn.addEventListener("click", run);
+  input.addEventListener("keydown", (e)=>{ if(e.key === "Enter") run(); });
+})();
+</script>
 </body>
 </html>
 """
+
+
+def render_row(i: int, it: dict) -> str:
+    """1行分の <tr>（i = 行番号 = 検索索引の行番号）"""
+    href = f'viewer.html?kifu={it["file"]}&kifudir={it["dir"]}'
+    date_disp = date_display(it["date"])
+    # 対局者リンク
+    players_html = render_players_links(it["players"])
+    dir_txt = dir_label(it["dir"] or "")
+    dir_link = f'<a href="#" class="dirlink" data-dir="{it["dir"] or ""}">{dir_txt}</a>'
+    sortkey = date_to_sortkey(it["date"])
+    return (
+        f'<tr class="row" data-i="{i}" data-title="{it["title"]}" data-players="{it["players"]}" '
+        f'data-dir="{it["dir"]}" data-date="{sortkey}">'
+        f'<td>{date_disp or "----/--/--"}</td>'
+        f'<td><a class="kifu-link" href="{href}" data-raw="{it["title"]}">{it["title"]}</a></td>'
+        f'<td>{players_html}</td>'
+        f'<td>{dir_link}</td>'
+        f'</tr>'
+    )
+
+def build_dir_options(items) -> str:
+    """分類セレクトの <option>（items は "dir" を持つ辞書の並び。1回だけ走査する）"""
+    # 分類の取得（従来：出現順）→ dir_order.txt があれば任意順に並べ替え
+    dirs_appearance = collect_dirs_in_appearance_order(items)
+    preferred = load_dir_order_list(DIR_ORDER_TXT)
+    ordered_dirs = apply_custom_order(dirs_appearance, preferred)
+    return '<option value="">（すべて）</option>' + ''.join(
+        f'<option value="{d}">{dir_label(d)}</option>' for d in ordered_dirs
+    )
+
+def splits_search(worker: bool, api: str, inline: bool) -> bool:
+    """検索索引を SEARCH_JSON に分けるか（既定は分ける。--inline なら埋め込む。--worker / --api は常に分ける）"""
+    return worker or bool(api) or not inline
+
+def template_attrs(virtual: bool, worker: bool, api: str, inline: bool = False):
+    """(tbody の属性, 検索データ script の属性)"""
+    search_attrs = f' data-src="{SEARCH_JSON.as_posix()}"' if splits_search(worker, api, inline) else ""
+    if worker:
+        search_attrs += ' data-worker="1"'
+    if api:
+        search_attrs += f' data-api="{html_escape(api)}"'
+    return (f' data-rows="{ROWS_JSON.as_posix()}"' if virtual else ""), search_attrs
+
+def build_html(items, virtual: bool = False, worker: bool = False, api: str = "", inline: bool = False):
+    """
+    virtual=False: 全行を <tr> として埋め込む（従来）
+    virtual=True : 行は data/index_rows.json（write_rows_json）に出し、ページは表示範囲の行だけ描画する
+    inline=False : 検索索引は data/search_index.json（write_search_json）に出し、最初の検索で読み込む
+    inline=True  : 検索索引をページに埋め込む（worker / api のときは埋め込まない）
+    worker=True  : 検索は Web Worker で行う
+    api="URL"    : 検索は URL（kifu_server.py の /api/search）に問い合わせる
+    """
+    # 行HTML
+    rows_html = "\n".join(render_row(i, it) for i, it in enumerate([] if virtual else items))
+
+    tbody_attrs, search_attrs = template_attrs(virtual, worker, api, inline)
     html = (HTML_TMPL
-            .replace("__DIR_OPTIONS__", dir_options_html)
-            .replace("__ROWS__", rows_html))
+            .replace("__DIR_OPTIONS__", build_dir_options(items))
+            .replace("__TBODY_ATTRS__", tbody_attrs)
+            .replace("__ROWS__", rows_html)
+            .replace("__SEARCH_ATTRS__", search_attrs)
+            .replace("__SEARCH_DATA__", "" if splits_search(worker, api, inline)
+                     else json_for_script(build_search_index(items)))
+            .replace("__SORT_DATA__", json_for_script(build_sort_orders(items))))
     return html
 
+# -----------------------------
+# --stream: 行データを持たずに書く
+# -----------------------------
+_PLACEHOLDER_RE = re.compile(r"__(DIR_OPTIONS|TBODY_ATTRS|ROWS|SEARCH_ATTRS|SEARCH_DATA|SORT_DATA)__")
+
+def write_index_stream(data_json: Path = DATA_JSON, out_html: Path = OUTPUT_HTML,
+                       virtual: bool = False, worker: bool = False, api: str = "", inline: bool = False) -> int:
+    """
+    build_html + write_text（+ write_rows_json / write_search_json）と同じバイト列を、全行を持たずに書く。
+      1) kifu_list.json を1件ずつ読み、行ごとに 日付キー・ファイル内の位置・正規化済みタイトル/対局者・分類 だけ残す
+      2) 日付降順に並べ、位置から1件ずつ読み直して <tr>（--virtual なら行データ JSON）をファイルへ書く
+    残すのは検索索引・列ソートにもともと要る列だけ（エントリの辞書・行 HTML・ページ全体の文字列は作らない）。
+    kifu_list.json が1行1件の形（generate_kifu_list.py --stream）でなければ従来の方法で作る。戻り値: 件数
+    """
+    pos, date, titles, players, dirs = [], [], [], [], []
+    for p, raw in iter_kifu_list_offsets(data_json):
+        if p is None:   # indent=2 の kifu_list.json
+            items = load_sorted_items(data_json)
+            out_html.write_text(build_html(items, virtual=virtual, worker=worker, api=api, inline=inline),
+                                encoding="utf-8")
+            if virtual:
+                write_rows_json(items)
+            if splits_search(worker, api, inline):
+                write_search_json(items)
+            return len(items)
+        it = normalize_item(raw)
+        pos.append(p)
+        date.append(int(date_to_sortkey(it["date"])))
+        titles.append(norm_title(it["title"]))
+        players.append(norm_players(it["players"]))
+        dirs.append(sys.intern(it["dir"] or ""))
+
+    # 行番号 = 日付降順（sort_items と同じ並び）。列を行番号順に並べ直す
+    order = sorted(range(len(pos)), key=date.__getitem__, reverse=True)
+    pos = [pos[j] for j in order]
+    date = [date[j] for j in order]
+    titles = [titles[j] for j in order]
+    players = [players[j] for j in order]
+    dirs = [dirs[j] for j in order]
+    del order
+
+    def iter_items(f):
+        for p in pos:
+            yield normalize_item(read_entry_at(f, p))
+
+    tbody_attrs, search_attrs = template_attrs(virtual, worker, api, inline)
+    parts = {
+        "DIR_OPTIONS": build_dir_options({"dir": d} for d in dirs),
+        "TBODY_ATTRS": tbody_attrs,
+        "SEARCH_ATTRS": search_attrs,
+    }
+    with open(data_json, "rb") as src:
+        if virtual:
+            with open(ROWS_JSON, "w", encoding="utf-8") as f:
+                f.write('{"rows":[')
+                for i, it in enumerate(iter_items(src)):
+                    sep, names = split_players(it["players"])
+                    row = [date_display(it["date"]), it["title"], it["dir"] or "", it["file"], sep,
+                           [[n, clean_player_name(n)] for n in names]]
+                    f.write(("," if i else "") + _COMPACT_JSON.encode(row))
+                f.write("]}")
+        search = search_index_from(titles, players)
+        if splits_search(worker, api, inline):
+            with open(SEARCH_JSON, "w", encoding="utf-8") as f:
+                for chunk in _COMPACT_JSON.iterencode(search):
+                    f.write(chunk)
+            search = None
+
+        with open(out_html, "w", encoding="utf-8") as out:
+            chunks = _PLACEHOLDER_RE.split(HTML_TMPL)   # [文字, 名前, 文字, 名前, ...]
+            for k, chunk in enumerate(chunks):
+                if k % 2 == 0:
+                    out.write(chunk)
+                elif chunk in parts:
+                    out.write(parts[chunk])
+                elif chunk == "ROWS" and not virtual:
+                    for i, it in enumerate(iter_items(src)):
+                        out.write(("\n" if i else "") + render_row(i, it))
+                elif chunk == "SEARCH_DATA" and search is not None:
+                    write_json_for_script(out, search)
+                elif chunk == "SORT_DATA":
+                    write_json_for_script(out, sort_orders_from(date, titles, dirs))
+    return len(pos)
+
 def date_to_sortkey(s: str) -> str:
     """'YYYY-MM-DD' → 'YYYYMMDD' / 不明は '00000000'"""
     if not s:
@@ -555,45 +1199,85 @@ def date_to_sortkey(s: str) -> str:
     except Exception:
         return "00000000"
 
-def render_players_links(players_text: str) -> str:
-    """'A vs B' / 'A 対 B' をそれぞれクリック可能リンクに（data-player はクリーン名）"""
+def split_players(players_text: str):
+    """'A vs B' / 'A 対 B' → (区切り, [A, B])。分けられなければ ("", [全体])"""
     if not players_text:
-        return ""
+        return "", []
     s = players_text.replace("　", " ").strip()
     for token in ["ＶＳ", "ｖｓ", "VS", "Vs", "vS", "－", "—", "ー"]:
         s = s.replace(token, " vs ")
     parts = [p.strip() for p in s.split(" vs ") if p.strip()]
     if len(parts) == 2:
-        a, b = parts
-        a_clean = clean_player_name(a); b_clean = clean_player_name(b)
-        return (f'<a class="plink" href="#" data-raw="{a}" data-player="{a_clean}">{a}</a> '
-                f'vs <a class="plink" href="#" data-raw="{b}" data-player="{b_clean}">{b}</a>')
+        return "vs", parts
     if "対" in s:
         p2 = [p.strip() for p in s.split("対") if p.strip()]
         if len(p2) == 2:
-            a, b = p2
-            a_clean = clean_player_name(a); b_clean = clean_player_name(b)
-            return (f'<a class="plink" href="#" data-raw="{a}" data-player="{a_clean}">{a}</a> '
-                    f'対 <a class="plink" href="#" data-raw="{b}" data-player="{b_clean}">{b}</a>')
-    return (f'<a class="plink" href="#" data-raw="{players_text}" '
-            f'data-player="{clean_player_name(players_text)}">{players_text}</a>')
-
-def main():
-    if not DATA_JSON.exists():
-        raise SystemExit(f"ERROR: {DATA_JSON} が見つかりません。")
-    items = load_items(DATA_JSON)
+            return "対", p2
+    return "", [players_text]
 
-    # 生成時は日付降順にしておく（初期表示を安定化）
-    def date_key(it):
-        try:
-            return datetime.strptime(it["date"], "%Y-%m-%d")
-        except Exception:
-            return datetime.min
-    items.sort(key=date_key, reverse=True)
+def render_players_links(players_text: str) -> str:
+    """'A vs B' / 'A 対 B' をそれぞれクリック可能リンクに（data-player はクリーン名）"""
+    sep, names = split_players(players_text)
+    links = [f'<a class="plink" href="#" data-raw="{n}" data-player="{clean_player_name(n)}">{n}</a>'
+             for n in names]
+    return f" {sep} ".join(links)
 
-    html = build_html(items)
-    OUTPUT_HTML.write_text(html, encoding="utf-8")
-    print(f"OK: {OUTPUT_HTML} を生成しました。（{len(items)}件）")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="data/kifu_list.json から検索UI付き index.html を生成する")
+    ap.add_argument("--virtual", action="store_true",
+                    help=f"行を {ROWS_JSON} に出力し、表示範囲だけ描画する仮想スクロール版にする（大量の棋譜向け）")
+    ap.add_argument("--inline", action="store_true",
+                    help=f"検索索引を {SEARCH_JSON} に分けず、ページに埋め込む（1ファイルで開ける。ページは大きくなる）")
+    ap.add_argument("--worker", action="store_true", help="検索を Web Worker で行う")
+    ap.add_argument("--api", default="", metavar="URL",
+                    help="検索を kifu_server.py の API（例 http://localhost:8765/api/search）に問い合わせる")
+    ap.add_argument("--stats", nargs="?", const=STATS_JSON, type=Path, metavar="PATH",
+                    help=f"段階ごとの時間・出力サイズ・ピークメモリを JSON に書く（既定 {STATS_JSON}）")
+    ap.add_argument("--profile", type=Path, metavar="PATH",
+                    help="HTML 組み立てを cProfile で計測して PATH に書き出す")
+    ap.add_argument("--stream", action="store_true",
+                    help="行データを持たずに1行ずつ書く（出力は同じ。generate_kifu_list.py --stream の kifu_list.json 向け）")
+    args = ap.parse_args(argv)
+
+    if not DATA_JSON.exists():
+        raise SystemExit(f"ERROR: {DATA_JSON} が見つかりません。")
+    stats = RunStats("generate_index_with_search")
+    outputs = [OUTPUT_HTML]
+    if args.virtual:
+        outputs.append(ROWS_JSON)
+    split = splits_search(args.worker, args.api, args.inline)
+    if split:
+        outputs.append(SEARCH_JSON)
+    if args.stream:
+        with stats.stage("stream"), profiled(args.profile):
+            n = write_index_stream(DATA_JSON, OUTPUT_HTML, virtual=args.virtual, worker=args.worker, api=args.api,
+                                   inline=args.inline)
+    else:
+        # 生成時は日付降順にしておく（初期表示を安定化）
+        with stats.stage("load"):
+            items = load_sorted_items(DATA_JSON)
+        n = len(items)
+        with stats.stage("build_html"), profiled(args.profile):
+            html = build_html(items, virtual=args.virtual, worker=args.worker, api=args.api, inline=args.inline)
+        with stats.stage("write_html"):
+            OUTPUT_HTML.write_text(html, encoding="utf-8")
+        if args.virtual:
+            with stats.stage("rows_json"):
+                write_rows_json(items)
+        if split:
+            with stats.stage("search_json"):
+                write_search_json(items)
+    for path in outputs[1:]:
+        print(f"OK: {path} を生成しました。")
+    print(f"OK: {OUTPUT_HTML} を生成しました。（{n}件）")
+    if args.stats:
+        stats.counters["entries"] = n
+        for path in outputs:
+            stats.counters[f"bytes_{path.name}"] = path.stat().st_size
+        rep = stats.write(args.stats)
+        print(f"OK: {args.stats} に計測結果を書きました。（total {rep['total']['wall']}s）")
+    if args.profile:
+        print(f"OK: {args.profile} にプロファイルを書きました。")
 
 if __name__ == "__main__":
     main()
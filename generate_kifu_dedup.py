@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+generate_kifu_dedup.py
+- 同じ対局が複数の分類（data/kif, data/kif2, data/kif2026, data/日報過去棋譜 …）に入っているものを見つける
+  * 手順ハッシュ = 開始局面の Zobrist ハッシュ + 開始手数 + 本譜の指し手コード列 の blake2b（64bit）
+    ヘッダ（棋戦名・対局者の表記・コメント）や文字コード・改行の違いは無視される
+  * 本譜が --min-plies 手未満の棋譜は比較しない（短い棋譜・手順なしの誤判定を避ける）
+- 手順ハッシュはローカルキャッシュ data/.kifu_dedup.json に保存する（公開対象外）
+    {"version", "files": {"分類/ファイル名": [sha1, 手順ハッシュ or null]}}
+  sha1（generate_kifu_list.py のマニフェスト）が変わった棋譜だけを解析し直す。
+  読み込み時に 手順ハッシュ → [分類/ファイル名...] の辞書を作るので、新しい棋譜1局の照合は O(1)
+- 既定は重複の報告のみ。--collapse で data/kifu_list.json から重複を除き、残した1局に "dups" を付ける
+  残す1局の優先順: 日付あり → 対局者あり → data/dir_order.txt の分類順 → 一覧の並び
+- --check FILE ... で、指定した棋譜が既存のどれと同じ対局かを調べる（追加前の確認用）
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+from pathlib import Path
+
+from generate_kifu_list import data_dir, output_json, manifest_json, load_manifest, write_kifu_list
+from generate_kifu_pack import iter_games
+from generate_index_with_search import load_dir_order_list
+from kif_board import Position
+from kif_parser import parse_kif_bytes
+
+DEDUP_JSON = data_dir / ".kifu_dedup.json"
+DIR_ORDER_TXT = data_dir / "dir_order.txt"
+DEDUP_VERSION = 1
+DEFAULT_MIN_PLIES = 10
+
+def move_hash(game, min_plies: int = DEFAULT_MIN_PLIES) -> str | None:
+    """本譜の手順ハッシュ（16桁の16進）。短すぎる棋譜は None"""
+    moves = game.main.moves
+    if len(moves) < min_plies:
+        return None
+    h = hashlib.blake2b(digest_size=8)
+    h.update(struct.pack("<QI", Position.from_game(game).key, game.main.start))
+    h.update(struct.pack(f"<{len(moves)}H", *moves))
+    return h.hexdigest()
+
+def bytes_move_hash(data: bytes, min_plies: int = DEFAULT_MIN_PLIES) -> str | None:
+    return move_hash(parse_kif_bytes(data), min_plies)
+
+# -----------------------------
+# 手順ハッシュの索引
+# -----------------------------
+class DedupIndex:
+    """
+    "分類/ファイル名" → 手順ハッシュ と、その逆引き 手順ハッシュ → ["分類/ファイル名", ...]
+        idx = DedupIndex.load()
+        idx.find(bytes_move_hash(Path("new.kif").read_bytes()))   # 既存の同じ対局（無ければ []）
+    """
+
+    def __init__(self, files=None, min_plies: int = DEFAULT_MIN_PLIES):
+        self.files = files or {}   # key → [sha1, 手順ハッシュ]
+        self.min_plies = min_plies
+        self.by_hash = {}
+        for key, (_, mh) in self.files.items():
+            if mh:
+                self.by_hash.setdefault(mh, []).append(key)
+
+    @classmethod
+    def load(cls, path: Path = DEDUP_JSON, min_plies: int = DEFAULT_MIN_PLIES):
+        """キャッシュを読む。無い・壊れている・版か最小手数が違う場合は空（全件再解析）"""
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(min_plies=min_plies)
+        if raw.get("version") != DEDUP_VERSION or raw.get("min_plies") != min_plies:
+            return cls(min_plies=min_plies)
+        return cls(raw.get("files") or {}, min_plies)
+
+    def save(self, path: Path = DEDUP_JSON):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": DEDUP_VERSION, "min_plies": self.min_plies, "files": self.files},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def find(self, mh: str | None):
+        return self.by_hash.get(mh, []) if mh else []
+
+    def groups(self):
+        """2局以上ある手順ハッシュ → [key, ...]"""
+        return {mh: keys for mh, keys in self.by_hash.items() if len(keys) > 1}
+
+def build_dedup_index(entries, cache: DedupIndex, manifest: dict | None = None):
+    """
+    一覧の全棋譜について手順ハッシュを求める（sha1 が変わらない棋譜はキャッシュを使う）。
+    manifest を省略すると generate_kifu_list.py のマニフェストをファイルから読む
+    戻り値: (新しい DedupIndex, 解析し直した局数)
+    """
+    if manifest is None:
+        manifest = load_manifest(manifest_json)
+    files = {}
+    todo = []
+    for e in entries:
+        key = f"{e['dir']}/{e['file']}"
+        sha1 = (manifest.get(key) or {}).get("sha1")
+        prev = cache.files.get(key)
+        if sha1 and prev and prev[0] == sha1:
+            files[key] = prev
+        else:
+            todo.append(e)
+    # 解析し直す棋譜は変更されたものなので、パックの写しが古くないか iter_games に確かめさせる
+    for e, data in iter_games(todo, manifest=manifest):
+        key = f"{e['dir']}/{e['file']}"
+        files[key] = [hashlib.sha1(data).hexdigest(), bytes_move_hash(data, cache.min_plies)]
+    # 一覧の並びに揃える（逆引きのリスト順 = 一覧順）
+    ordered = {f"{e['dir']}/{e['file']}": files[f"{e['dir']}/{e['file']}"] for e in entries}
+    return DedupIndex(ordered, cache.min_plies), len(todo)
+
+# -----------------------------
+# 重複の除去
+# -----------------------------
+def load_dir_rank(path: Path = DIR_ORDER_TXT) -> dict:
+    """分類 → dir_order.txt での順位（index.html の分類セレクトと同じ読み方。# 行・空行は飛ばす）"""
+    rank = {}
+    for i, name in enumerate(load_dir_order_list(path) or []):
+        rank.setdefault(name, i)
+    return rank
+
+def collapse_entries(entries, index: DedupIndex, dir_rank: dict | None = None):
+    """
+    重複を除いたエントリ列を返す（残した1局の "dups" に除いた "分類/ファイル名" を入れる）
+    dir_rank を省略すると data/dir_order.txt から読む（load_dir_rank）
+    """
+    if dir_rank is None:
+        dir_rank = load_dir_rank()
+    pos = {f"{e['dir']}/{e['file']}": i for i, e in enumerate(entries)}
+
+    def preference(key):
+        e = entries[pos[key]]
+        return (not e.get("date"), not e.get("players"), dir_rank.get(e["dir"], len(dir_rank)), pos[key])
+
+    drop = set()
+    keep_dups = {}
+    for keys in index.groups().values():
+        keys = sorted(keys, key=preference)
+        keep_dups[keys[0]] = keys[1:]
+        drop.update(keys[1:])
+    out = []
+    for e in entries:
+        key = f"{e['dir']}/{e['file']}"
+        if key in drop:
+            continue
+        if key in keep_dups:
+            e = dict(e, dups=keep_dups[key])
+        out.append(e)
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="手順ハッシュで同じ対局の重複棋譜を見つける")
+    ap.add_argument("--collapse", action="store_true",
+                    help="data/kifu_list.json から重複を除く（残した1局に dups を付ける）")
+    ap.add_argument("--min-plies", type=int, default=DEFAULT_MIN_PLIES,
+                    help=f"この手数未満の棋譜は比較しない（既定 {DEFAULT_MIN_PLIES}）")
+    ap.add_argument("--check", nargs="+", type=Path, metavar="FILE",
+                    help="指定した棋譜と同じ対局が既にあるか調べる（索引は更新しない）")
+    args = ap.parse_args(argv)
+
+    if args.check:
+        index = DedupIndex.load(min_plies=args.min_plies)
+        if not index.files:
+            print("[WARN] 手順ハッシュの索引がありません。先に引数なしで実行してください")
+        for path in args.check:
+            mh = bytes_move_hash(path.read_bytes(), args.min_plies)
+            hits = index.find(mh)
+            if mh is None:
+                print(f"{path}: 手数が短いため比較しません")
+            elif hits:
+                print(f"{path}: 重複 → " + ", ".join(hits))
+            else:
+                print(f"{path}: 新規")
+        return
+
+    entries = json.loads(output_json.read_text(encoding="utf-8"))
+    index, parsed = build_dedup_index(entries, DedupIndex.load(min_plies=args.min_plies))
+    index.save()
+    groups = index.groups()
+    n_dup = sum(len(keys) - 1 for keys in groups.values())
+    print(f"[INFO] parsed={parsed} reused={len(entries) - parsed}")
+    for keys in groups.values():
+        print("  = " + " | ".join(keys))
+    print(f"[INFO] 重複 {len(groups)} 組（除ける棋譜 {n_dup} 局）")
+
+    if args.collapse:
+        out = collapse_entries(entries, index)
+        write_kifu_list(output_json, out)
+        print(f"✅ {output_json} を {len(entries)} → {len(out)} 件にしました。")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
 # -*- coding: utf-8 -*-
+import argparse
+import codecs
+import hashlib
 import json
+import os
 import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 from datetime import datetime
 
+from kifu_stats import RunStats, profiled
+
 # ディレクトリ設定
 # 旧:
 # base_dir = Path.cwd()
@@ -12,16 +22,25 @@ from datetime import datetime
 base_dir = Path(__file__).resolve().parent
 data_dir = base_dir / "data"
 output_json = data_dir / "kifu_list.json"
-
-# 既存構成そのまま
-kifu_entries = []
-encodings = ["utf-8", "shift_jis", "cp932"]
+# 差分再生成用マニフェスト（ローカルキャッシュ。公開対象外）
+manifest_json = data_dir / ".kifu_manifest.json"
+# 抽出ロジックを変えたら上げる（古いマニフェストは破棄され全件再解析になる）
+MANIFEST_VERSION = 5
+# viewer.html 用のメタデータ分割（"分類/ファイル名" の FNV-1a 32bit ハッシュでバケツ分け）
+meta_dir = data_dir / "meta"
+META_BUCKETS = 64
+# 問い合わせ用 SQLite（ローカル。公開対象外。kifu_query.py で引く）
+sqlite_db = data_dir / "kifu.sqlite"
+# --stats のレポート（ローカル。公開対象外）
+stats_json = data_dir / "kifu_list.stats.json"
 
 # -----------------------------
 # 棋戦名から日付推定のためのユーティリティ
 # -----------------------------
 # 例: 2010.6.9 / 2010/6/9 / 2010-6-9 / 2010年6月9日
 _Y4_PATTERN = re.compile(r'(?<!\d)(\d{4})[./\-年](\d{1,2})[./\-月](\d{1,2})(?:日)?(?!\d)')
+# ファイル名の先頭だけ: 2026.03 08（月と日の間が空白の打ち間違い。月・日とも2桁のときだけ）
+_FILENAME_SPACE_PATTERN = re.compile(r'^(\d{4})[./\-](\d{2}) (\d{2})(?!\d)')
 # 例: 23.9.28 / 05/4/3 / 02-12-01 / 23年9月28日（※二桁年 → 平成年と解釈）
 _R2_PATTERN = re.compile(r'(?<!\d)(\d{2})[./\-年](\d{1,2})[./\-月](\d{1,2})(?:日)?(?!\d)')
 # 明示的な「平成」表記にも対応（例: 平成23年9月28日 / 平成23.9.28）
@@ -66,67 +85,613 @@ def parse_date_from_title(title: str) -> str | None:
 
     return None
 
+def parse_date_from_file_name(name: str) -> str | None:
+    """ファイル名（拡張子なし）の日付。parse_date_from_title に加えて先頭の「2026.03 08」も読む"""
+    guessed = parse_date_from_title(name)
+    if guessed:
+        return guessed
+    m = _FILENAME_SPACE_PATTERN.match(name)
+    if m:
+        y, mm, dd = m.groups()
+        return _pad(y, mm, dd)
+    return None
+
+# -----------------------------
+# ヘッダ部の読み取り
+# -----------------------------
+# ヘッダは指し手行（"手数----指手----" 以降）より前にしか無いので、先頭の一定バイトだけ読む。
+# 実データのヘッダは盤面図付きでも 1KB 未満。
+HEADER_READ_BYTES = 8192
+MOVES_SEPARATOR = "手数----"
+# 一覧や DB で使うヘッダ項目（対局日は 開始日時 の無い柿木将棋の出力で使われる）
+HEADER_KEYS = ("開始日時", "対局日", "場所", "持ち時間", "手合割", "棋戦", "先手", "後手")
+
+def header_prefix(data: bytes) -> bytes:
+    """先頭 HEADER_READ_BYTES に切り詰める。途中で切れた場合は最後の改行までに揃える"""
+    if len(data) < HEADER_READ_BYTES:
+        return data
+    data = data[:HEADER_READ_BYTES]
+    cut = data.rfind(b"\n")
+    return data[:cut + 1] if cut >= 0 else data
+
+def read_header_prefix(kif_file: Path) -> bytes:
+    with open(kif_file, "rb") as f:
+        return header_prefix(f.read(HEADER_READ_BYTES))
+
+# -----------------------------
+# 文字コード判定（バイト列を1回だけ見る）
+# -----------------------------
+# 旧実装は utf-8 → shift_jis → cp932 の順にテキストモードで開き直していたが、
+# 途中で break する読み方だと shift_jis が「部分的に成功」して化けた名前が入ることがあった。
+# ここでは BOM → UTF-8 として妥当か → cp932（Shift_JIS の上位互換）の順に判定する。
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+def detect_encoding(data: bytes) -> str:
+    """"utf-8-sig" / "utf-16" / "utf-8" / "cp932" のいずれかを返す"""
+    for bom, enc in _BOMS:
+        if data.startswith(bom):
+            return enc
+    # 末尾で多バイト文字が切れていても誤判定しないよう、逐次デコーダで final=False
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(data, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp932"
+
+def decode_kif_bytes(data: bytes):
+    """バイト列を判定した文字コードで文字列にする。戻り値: (text, encoding)"""
+    enc = detect_encoding(data)
+    # cp932 でも読めないバイトは置換文字にして続行（ファイル全体を捨てない）
+    return data.decode(enc, errors="replace"), enc
+
+def parse_kif_header(text: str) -> dict:
+    """
+    ヘッダ行を1パスで辞書化する（HEADER_KEYS のみ・最初に現れた値を採用）。
+    "手数----指手" の区切り行で打ち切るので、指し手部分は見ない。
+    """
+    header = {}
+    for line in text.splitlines():
+        if line.startswith(MOVES_SEPARATOR):
+            break
+        key, sep, _ = line.partition("：")
+        if sep and key in HEADER_KEYS and key not in header:
+            header[key] = line.strip().split("：", 1)[1]
+    return header
+
+def parse_date_from_header(value: str) -> str | None:
+    """開始日時/対局日（例: 2014/05/10 20:35:32, 2021/03/14(日) 13:00:00）→ YYYY-MM-DD"""
+    if not value:
+        return None
+    m = _Y4_PATTERN.search(value)
+    if m:
+        y, mm, dd = m.groups()
+        return _pad(y, mm, dd)
+    return None
+
+# -----------------------------
+# 1ファイル分の抽出
+# -----------------------------
+def extract_entry(kif_file: Path, dir_name: str, data: bytes | None = None):
+    """
+    KIF 1ファイルから一覧用エントリ（file/title/players/date/dir）を作る。
+      - data を渡した場合はそれを使い、ファイルは開かない（ハッシュ計算と読み込みを共用）
+    戻り値: (entry, header, encoding)  header は HEADER_KEYS の生値（マニフェストに保存）
+    """
+    fname = kif_file.name
+    name_wo_ext = fname[:-4]
+
+    # 1) ファイル名先頭8桁 (YYYYMMDD) から日付抽出
+    try:
+        date_part = fname[:8]
+        parsed_date = datetime.strptime(date_part, "%Y%m%d").strftime("%Y-%m-%d")
+    except Exception:
+        parsed_date = ""
+
+    # 2) ヘッダ部を一度だけ読み、棋戦/先手/後手ほかを1パスで取得
+    prefix = header_prefix(data) if data is not None else read_header_prefix(kif_file)
+    text, encoding = decode_kif_bytes(prefix)
+    header = parse_kif_header(text)
+
+    title = header.get("棋戦", "")
+    sente = header.get("先手", "")
+    gote = header.get("後手", "")
+    if not title:
+        title = name_wo_ext
+
+    players = f"{sente} vs {gote}" if sente and gote else ""
+
+    # 3) 左端日付が空なら、ファイル名中の日付 → 対局日 → 開始日時 → 棋戦名（上記の平成/西暦ルール）の順で補完
+    #    ※開始日時は棋譜ファイルの作成（保存）日時のことがあるので、ファイル名・対局日に書かれた日付を優先する
+    date_str = parsed_date
+    if not date_str or date_str in ("", "----/--/--", "--", "不明"):
+        guessed = (parse_date_from_file_name(name_wo_ext)
+                   or parse_date_from_header(header.get("対局日", ""))
+                   or parse_date_from_header(header.get("開始日時", ""))
+                   or parse_date_from_title(title))
+        if guessed:
+            date_str = guessed
+
+    entry = {
+        "file": fname,
+        "title": title,
+        "players": players,
+        "date": date_str,   # JSONは YYYY-MM-DD で統一
+        "dir": dir_name
+    }
+    return entry, header, encoding
+
+# -----------------------------
+# 差分再生成用マニフェスト
+# -----------------------------
+# "dir/file" → {"size", "mtime_ns", "sha1", "encoding", "entry", "header"}
+# size/mtime が一致すれば読み直さず、不一致でも内容ハッシュが同じなら entry を再利用する。
+
+def load_manifest(path: Path) -> dict:
+    """マニフェストを読み込む。無い・壊れている・版が違う場合は空（全件再解析）"""
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(raw, dict) or raw.get("version") != MANIFEST_VERSION:
+        return {}
+    files = raw.get("files")
+    return files if isinstance(files, dict) else {}
+
+def save_manifest(path: Path, files: dict):
+    """一時ファイルに書いてから置き換える（途中で落ちても壊れたマニフェストを残さない）"""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files},
+                  f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def scan_kif_files(data_dir: Path):
+    """data/<分類>/*.kif を従来と同じ順序（分類名順→ファイル名順）で列挙"""
+    for subdir in sorted(data_dir.iterdir()):
+        if subdir.is_dir():
+            for kif_file in sorted(subdir.glob("*.kif")):
+                yield subdir.name, kif_file
+
+def refresh_record(dir_name: str, kif_file: Path, rec):
+    """
+    マニフェストのレコードを最新化する。戻り値: (rec, kind)
+      kind = "reused"   … size/mtime 一致（ファイルを開かない）
+             "rehashed" … mtime だけ変化・内容ハッシュ一致
+             "parsed"   … 新規/変更ありで再解析
+    """
+    st = kif_file.stat()
+    if rec and rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns:
+        return rec, "reused"
+    # 読むのは1回だけ：同じバイト列でハッシュ計算とヘッダ解析を行う
+    data = kif_file.read_bytes()
+    digest = hashlib.sha1(data).hexdigest()
+    if rec and rec.get("sha1") == digest:
+        # touch / checkout で mtime だけ変わったケース
+        return dict(rec, size=st.st_size, mtime_ns=st.st_mtime_ns), "rehashed"
+    entry, header, encoding = extract_entry(kif_file, dir_name, data)
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha1": digest,
+        "encoding": encoding,
+        "entry": entry,
+        "header": header,
+    }, "parsed"
+
+def _refresh_task(task):
+    """ワーカー用（プロセスプールへ渡すため引数はタプル1つ）"""
+    dir_name, kif_file, rec = task
+    return refresh_record(dir_name, kif_file, rec)
+
+def _timed_refresh_task(task):
+    """--stats 用: ((rec, kind), 所要秒)。時間はワーカー内で測る"""
+    t0 = time.perf_counter()
+    result = _refresh_task(task)
+    return result, time.perf_counter() - t0
+
+def build_kifu_entries(data_dir: Path, manifest: dict, jobs: int = 1, use_threads: bool = False,
+                       stats: RunStats | None = None):
+    """
+    一覧エントリを作る。変更のないファイルはマニフェストの entry を再利用する。
+      - jobs > 1 なら、読み直しが必要なファイルだけをワーカーへ振り分ける
+        （既定はプロセスプール、use_threads=True でスレッドプール）
+      - 結果は列挙順の位置へ戻すので、並列でも出力順は従来と同じ
+    戻り値: (entries, new_manifest, counts)
+      - new_manifest には今回見つかったファイルだけが入る（削除分は自然に落ちる）
+      - stats を渡すと scan / extract の段階時間と、読み直したファイルごとの時間・バイト数を記録する
+    """
+    keys, recs, pending = [], [], []
+    with stats.stage("scan") if stats else nullcontext():
+        for dir_name, kif_file in scan_kif_files(data_dir):
+            key = f"{dir_name}/{kif_file.name}"
+            rec = manifest.get(key)
+            st = kif_file.stat()
+            if rec and rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns:
+                recs.append((rec, "reused"))
+            else:
+                recs.append(None)
+                pending.append((len(keys), (dir_name, kif_file, rec)))
+            keys.append(key)
+
+    tasks = [t for _, t in pending]
+    task_fn = _timed_refresh_task if stats else _refresh_task
+    times = {}
+    with stats.stage("extract") if stats else nullcontext():
+        if jobs > 1 and len(tasks) > 1:
+            pool_cls = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+            with pool_cls(max_workers=jobs) as pool:
+                chunksize = max(1, len(tasks) // (jobs * 4))
+                results = pool.map(task_fn, tasks, chunksize=chunksize)
+                for (pos, _), result in zip(pending, results):
+                    if stats:
+                        result, times[pos] = result
+                    recs[pos] = result
+        else:
+            for pos, task in pending:
+                result = task_fn(task)
+                if stats:
+                    result, times[pos] = result
+                recs[pos] = result
+
+    entries = []
+    new_manifest = {}
+    counts = {"reused": 0, "rehashed": 0, "parsed": 0}
+    for pos, (key, (rec, kind)) in enumerate(zip(keys, recs)):
+        counts[kind] += 1
+        if stats:
+            stats.add_file(key, times.get(pos, 0.0), 0 if kind == "reused" else rec["size"],
+                           kind, rec.get("encoding", ""))
+        new_manifest[key] = rec
+        entries.append(rec["entry"])
+    counts["removed"] = len(manifest.keys() - new_manifest.keys())
+    return entries, new_manifest, counts
+
+def write_kifu_list(path: Path, entries):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+
+# -----------------------------
+# --stream: 1件ずつ作って1件ずつ書く
+# -----------------------------
+# kifu_list.json は「1行 = 1エントリ」の JSON 配列で書く（全体としても普通の JSON なので json.loads でも読める）
+#   [
+#   {"date":...,"title":...},
+#   {"date":...,"title":...}
+#   ]
+def iter_kifu_entries(data_dir: Path, manifest: dict, new_manifest: dict, counts: dict,
+                      stats: RunStats | None = None):
+    """
+    build_kifu_entries の逐次版。ファイルを1つずつ読み、エントリを列挙順に yield する
+    （全エントリのリストを作らない）。new_manifest と counts は呼び出し側の辞書に書き足す
+    stats を渡すと build_kifu_entries と同じくファイルごとの時間・バイト数を記録する
+    """
+    for kind in ("reused", "rehashed", "parsed"):
+        counts.setdefault(kind, 0)
+    for dir_name, kif_file in scan_kif_files(data_dir):
+        key = f"{dir_name}/{kif_file.name}"
+        t0 = time.perf_counter()
+        rec, kind = refresh_record(dir_name, kif_file, manifest.get(key))
+        if stats:
+            stats.add_file(key, time.perf_counter() - t0, 0 if kind == "reused" else rec["size"],
+                           kind, rec.get("encoding", ""))
+        counts[kind] += 1
+        new_manifest[key] = rec
+        yield rec["entry"]
+    counts["removed"] = len(manifest.keys() - new_manifest.keys())
+
+def write_kifu_list_stream(path: Path, entries) -> int:
+    """entries（イテレータ可）を1行1エントリで書く。一時ファイルから置き換える。戻り値: 件数"""
+    tmp = path.with_name(path.name + ".tmp")
+    n = 0
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        f.write("[")
+        for e in entries:
+            f.write(",\n" if n else "\n")
+            f.write(json.dumps(e, ensure_ascii=False, separators=(",", ":")))
+            n += 1
+        f.write("\n]\n")
+    os.replace(tmp, path)
+    return n
+
+def iter_kifu_list_offsets(path: Path = output_json):
+    """
+    kifu_list.json を1件ずつ読む。(バイト位置, エントリ) を yield する（位置は read_entry_at で読み直す用）
+    1行1エントリの形（--stream の出力）でなければ全体を読んで同じように返す（位置は None）
+    """
+    with open(path, "rb") as f:
+        first = f.readline()
+        pos = f.tell()
+        line = f.readline()
+        if first.strip() != b"[" or not line.strip().startswith(b"{"):
+            f.seek(0)
+            for e in json.load(f):
+                yield None, e
+            return
+        try:
+            e = json.loads(line.rstrip().rstrip(b","))
+        except ValueError:   # indent=2 など複数行の形
+            f.seek(0)
+            for e in json.load(f):
+                yield None, e
+            return
+        while True:
+            yield pos, e
+            pos = f.tell()
+            line = f.readline().rstrip()
+            if not line or line == b"]":
+                return
+            e = json.loads(line.rstrip(b","))
+
+def iter_kifu_list(path: Path = output_json):
+    """kifu_list.json のエントリを1件ずつ yield する"""
+    for _, e in iter_kifu_list_offsets(path):
+        yield e
+
+def read_entry_at(f, pos: int) -> dict:
+    """iter_kifu_list_offsets の位置から1件読む（f はバイナリで開いたファイル）"""
+    f.seek(pos)
+    return json.loads(f.readline().rstrip().rstrip(b","))
+
+def update_kifu_list(manifest: dict, jobs: int = 1, use_threads: bool = False,
+                     stats: RunStats | None = None, collapse=None):
+    """
+    1回分の再生成: 抽出 → kifu_list.json・マニフェスト・data/meta/ を書く。
+    manifest はメモリ上のもの（main はファイルから読む。kifu_watch.py は前回の戻り値をそのまま渡す）
+    collapse(entries, new_manifest) を渡すと、その戻り値を kifu_list.json に書く（kifu_watch.py --dedup の
+    重複除去。書く前に済ませるので途中の状態のファイルを置かない）。data/meta/ は除いた棋譜も含めて全件
+    戻り値: (kifu_list.json に書いた entries, new_manifest, counts, meta_written)
+    """
+    stage = stats.stage if stats else (lambda name: nullcontext())
+    entries, new_manifest, counts = build_kifu_entries(
+        data_dir, manifest, jobs=jobs, use_threads=use_threads, stats=stats)
+    listed = entries
+    if collapse is not None:
+        with stage("dedup"):
+            listed = collapse(entries, new_manifest)
+    with stage("json_write"):
+        write_kifu_list(output_json, listed)
+    with stage("manifest_save"):
+        save_manifest(manifest_json, new_manifest)
+    with stage("meta_shards"):
+        meta_written = write_meta_shards(entries)
+    return listed, new_manifest, counts, meta_written
+
+def update_kifu_list_stream(manifest: dict, stats: RunStats | None = None):
+    """
+    update_kifu_list のメモリを抑えた版（--stream）: 逐次に抽出しながら kifu_list.json へ書き、
+    data/meta/ は書き終えたファイルを1件ずつ読み直して作る。戻り値: (件数, new_manifest, counts, meta_written)
+    """
+    stage = stats.stage if stats else (lambda name: nullcontext())
+    new_manifest, counts = {}, {}
+    with stage("extract_write"):
+        n = write_kifu_list_stream(output_json, iter_kifu_entries(data_dir, manifest, new_manifest, counts, stats))
+    with stage("manifest_save"):
+        save_manifest(manifest_json, new_manifest)
+    with stage("meta_shards"):
+        meta_written = write_meta_shards(iter_kifu_list(output_json))
+    return n, new_manifest, counts, meta_written
+
+# -----------------------------
+# viewer.html 用メタデータ分割
+# -----------------------------
+def fnv1a32(s: str) -> int:
+    """UTF-8 バイト列の FNV-1a 32bit（viewer.html の JS と同じ計算）"""
+    h = 0x811C9DC5
+    for b in s.encode("utf-8"):
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+def meta_bucket_name(dir_name: str, fname: str) -> str:
+    return f"{fnv1a32(f'{dir_name}/{fname}') % META_BUCKETS:02x}.json"
+
+def write_meta_shards(entries, out_dir: Path = meta_dir) -> int:
+    """
+    data/meta/XX.json に {"分類/ファイル名": {"title", "players", "date"}} を書き出す。
+    viewer.html は1局のために全件の kifu_list.json ではなくバケツ1つ（数KB）だけを取得する。
+    中身が変わらないバケツは書き換えない。戻り値: 書き換えたファイル数
+    """
+    buckets = {}
+    for e in entries:
+        key = f"{e['dir']}/{e['file']}"
+        buckets.setdefault(meta_bucket_name(e["dir"], e["file"]), {})[key] = {
+            "title": e["title"], "players": e["players"], "date": e["date"]}
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for old in out_dir.glob("*.json"):
+        if old.name not in buckets:
+            old.unlink()
+            written += 1
+    for name, obj in buckets.items():
+        text = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        p = out_dir / name
+        if p.exists() and p.read_text(encoding="utf-8") == text:
+            continue
+        p.write_text(text, encoding="utf-8")
+        written += 1
+    return written
+
+# -----------------------------
+# 索引（posidx / opening / players.json）用の対局ID
+# -----------------------------
+def load_previous_games(path: Path) -> list:
+    """前回出力した索引の "games" 表（無い・壊れていれば空）"""
+    try:
+        games = json.loads(path.read_text(encoding="utf-8")).get("games")
+    except (OSError, ValueError, AttributeError):
+        return []
+    return games if isinstance(games, list) else []
+
+def assign_game_ids(entries, prev_games):
+    """
+    対局ID を前回の games 表から引き継ぐ（分類/ファイル名が同じなら同じ ID）。
+    消えた対局の ID は空き（None）にして新しい対局で先頭から埋め、足りなければ末尾に足す。
+    1局の追加・削除で ID がずれないので、索引の書き換わりはその対局の分だけで済む。
+    戻り値: (entries と同じ並びの対局ID, ID → entry の表（空きは None）)
+    """
+    prev = {}
+    for gid, g in enumerate(prev_games):
+        if g:
+            prev.setdefault((g[0], g[1]), gid)
+    table = [None] * len(prev_games)
+    ids = [None] * len(entries)
+    for i, e in enumerate(entries):
+        gid = prev.get((e["dir"], e["file"]))
+        if gid is not None and table[gid] is None:
+            table[gid] = e
+            ids[i] = gid
+    free = iter([gid for gid, e in enumerate(table) if e is None])
+    for i, e in enumerate(entries):
+        if ids[i] is None:
+            gid = next(free, None)
+            if gid is None:
+                gid = len(table)
+                table.append(None)
+            table[gid] = e
+            ids[i] = gid
+    while table and table[-1] is None:
+        table.pop()
+    return ids, table
+
+# -----------------------------
+# SQLite（games 表 + FTS5 全文索引）
+# -----------------------------
+# games     : 1棋譜1行。HEADER_KEYS の生値も列として持つ
+# games_fts : タイトル/対局者の全文索引（trigram。rowid = games.id）
+#             *_norm は index.html の検索と同じ正規化（NFKC・小文字・カナ・段位/称号/空白除去）
+SQLITE_HEADER_COLUMNS = {
+    "開始日時": "start_time", "対局日": "game_day", "場所": "place", "持ち時間": "time_control",
+    "手合割": "handicap", "棋戦": "event", "先手": "sente", "後手": "gote",
+}
+_GAME_COLUMNS = ("key", "dir", "file", "title", "players", "date", "sha1", "encoding",
+                 *SQLITE_HEADER_COLUMNS.values())
+
+def open_sqlite(path: Path = sqlite_db) -> sqlite3.Connection:
+    con = sqlite3.connect(path)
+    con.executescript(f"""
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY,
+            {", ".join(f"{c} TEXT NOT NULL DEFAULT ''" for c in _GAME_COLUMNS)},
+            UNIQUE (key)
+        );
+        CREATE INDEX IF NOT EXISTS games_date ON games (date);
+        CREATE INDEX IF NOT EXISTS games_dir ON games (dir, date);
+        CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5 (
+            title, players, title_norm, players_norm, tokenize = 'trigram'
+        );
+    """)
+    return con
+
+def _sqlite_row(key: str, rec: dict):
+    e, header = rec["entry"], rec.get("header", {})
+    return (key, e["dir"], e["file"], e["title"], e["players"], e["date"], rec["sha1"],
+            rec.get("encoding", ""), *(header.get(k, "") for k in SQLITE_HEADER_COLUMNS))
+
+def write_sqlite(path: Path, manifest: dict) -> dict:
+    """
+    マニフェストの内容を SQLite に反映する（差分更新）。
+      - 行の中身が同じ棋譜は触らない。変わった棋譜だけ games と games_fts を書き直す
+      - マニフェストに無い棋譜（削除分）は行を消す
+    戻り値: counts（inserted / updated / deleted / unchanged）
+    """
+    from generate_index_with_search import norm_players, norm_title
+
+    con = open_sqlite(path)
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    cols = ", ".join(_GAME_COLUMNS)
+    with con:
+        old = {row[1]: (row[0], tuple(row[1:])) for row in con.execute(f"SELECT id, {cols} FROM games")}
+        for key, rec in manifest.items():
+            row = _sqlite_row(key, rec)
+            prev = old.pop(key, None)
+            if prev is not None and prev[1] == row:
+                counts["unchanged"] += 1
+                continue
+            if prev is None:
+                gid = con.execute(f"INSERT INTO games ({cols}) VALUES ({', '.join('?' * len(row))})",
+                                  row).lastrowid
+                counts["inserted"] += 1
+            else:
+                gid = prev[0]
+                con.execute(f"UPDATE games SET {', '.join(f'{c} = ?' for c in _GAME_COLUMNS)} WHERE id = ?",
+                            (*row, gid))
+                con.execute("DELETE FROM games_fts WHERE rowid = ?", (gid,))
+                counts["updated"] += 1
+            header = rec.get("header", {})
+            players_norm = " ".join(norm_players(header.get(k, "")) for k in ("先手", "後手"))
+            con.execute("INSERT INTO games_fts (rowid, title, players, title_norm, players_norm) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (gid, rec["entry"]["title"], rec["entry"]["players"],
+                         norm_title(rec["entry"]["title"]), players_norm.strip()))
+        for gid, _ in old.values():
+            con.execute("DELETE FROM games WHERE id = ?", (gid,))
+            con.execute("DELETE FROM games_fts WHERE rowid = ?", (gid,))
+            counts["deleted"] += 1
+    con.close()
+    return counts
+
 # -----------------------------
 # メイン処理
 # -----------------------------
-for subdir in sorted(data_dir.iterdir()):
-    if subdir.is_dir():
-        dir_name = subdir.name
-        for kif_file in sorted(subdir.glob("*.kif")):
-            fname = kif_file.name
-            name_wo_ext = fname[:-4]
-
-            # 1) ファイル名先頭8桁 (YYYYMMDD) から日付抽出
-            try:
-                date_part = fname[:8]
-                parsed_date = datetime.strptime(date_part, "%Y%m%d").strftime("%Y-%m-%d")
-            except Exception:
-                parsed_date = ""
-
-            # 2) KIF本文から棋戦/先手/後手を取得（既存ロジック）
-            sente, gote, title = "", "", ""
-            for enc in encodings:
-                try:
-                    with open(kif_file, "r", encoding=enc) as f:
-                        for line in f:
-                            if not title and line.startswith("棋戦："):
-                                title = line.strip().split("：", 1)[1]
-                            elif line.startswith("先手："):
-                                sente = line.strip().split("：", 1)[1]
-                            elif line.startswith("後手："):
-                                gote = line.strip().split("：", 1)[1]
-                            if title and sente and gote:
-                                break
-                    break
-                except Exception:
-                    continue
-
-            if not title:
-                title = name_wo_ext
-
-            players = f"{sente} vs {gote}" if sente and gote else ""
-
-            # 3) 左端日付が空なら、棋戦名から補完（上記の平成/西暦ルール）
-            date_str = parsed_date
-            if not date_str or date_str in ("", "----/--/--", "--", "不明"):
-                guessed = parse_date_from_title(title)
-                if guessed:
-                    date_str = guessed
-
-            entry = {
-                "file": fname,
-                "title": title,
-                "players": players,
-                "date": date_str,   # JSONは YYYY-MM-DD で統一
-                "dir": dir_name
-            }
-            kifu_entries.append(entry)
-
-# JSON 出力
-with open(output_json, "w", encoding="utf-8") as f:
-    json.dump(kifu_entries, f, ensure_ascii=False, indent=2)
-
-print(f"[INFO] base_dir={base_dir}")
-print(f"[INFO] data_dir={data_dir}")
-print(f"[INFO] found {len(kifu_entries)} .kif files across {len([p for p in data_dir.iterdir() if p.is_dir()])} folders")
-print(f"✅ {output_json} に {len(kifu_entries)} 件出力しました。")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="data/*/ の .kif から data/kifu_list.json を生成")
+    ap.add_argument("--full", action="store_true",
+                    help="マニフェストを無視して全ファイルを再解析する")
+    ap.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                    help="抽出の並列数（0 で CPU 数。既定 1 = 逐次）")
+    ap.add_argument("--threads", action="store_true",
+                    help="プロセスではなくスレッドで並列化する（ネットワークドライブ等 I/O 待ちが主な場合）")
+    ap.add_argument("--sqlite", nargs="?", const=sqlite_db, type=Path, metavar="PATH",
+                    help=f"問い合わせ用 SQLite も差分更新する（既定 {sqlite_db.name}。kifu_query.py で検索）")
+    ap.add_argument("--stream", action="store_true",
+                    help="1件ずつ抽出してすぐ書く（全件をメモリに持たない。1行1件のコンパクトな JSON になる。逐次のみで -j は無視）")
+    ap.add_argument("--stats", nargs="?", const=stats_json, type=Path, metavar="PATH",
+                    help=f"段階ごとの時間・ファイルごとの解析時間・ピークメモリを JSON に書く（既定 {stats_json.name}）")
+    ap.add_argument("--profile", type=Path, metavar="PATH",
+                    help="抽出処理を cProfile で計測して PATH に書き出す（--jobs のワーカー内は対象外）")
+    args = ap.parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    stats = RunStats("generate_kifu_list")
+
+    with stats.stage("manifest_load"):
+        manifest = {} if args.full else load_manifest(manifest_json)
+    with profiled(args.profile):
+        if args.stream:
+            n_entries, new_manifest, counts, meta_written = update_kifu_list_stream(
+                manifest, stats=stats if args.stats else None)
+        else:
+            kifu_entries, new_manifest, counts, meta_written = update_kifu_list(
+                manifest, jobs=jobs, use_threads=args.threads, stats=stats if args.stats else None)
+            n_entries = len(kifu_entries)
+
+    print(f"[INFO] base_dir={base_dir}")
+    print(f"[INFO] data_dir={data_dir}")
+    print(f"[INFO] found {n_entries} .kif files across {len([p for p in data_dir.iterdir() if p.is_dir()])} folders")
+    print(f"[INFO] parsed={counts['parsed']} reused={counts['reused']} "
+          f"rehashed={counts['rehashed']} removed={counts['removed']}")
+    enc_counts = {}
+    for rec in new_manifest.values():
+        enc = rec.get("encoding", "?")
+        enc_counts[enc] = enc_counts.get(enc, 0) + 1
+    print("[INFO] encodings: " + " ".join(f"{k}={v}" for k, v in sorted(enc_counts.items())))
+    print(f"[INFO] {meta_dir} : {meta_written} files updated ({META_BUCKETS} buckets)")
+    if args.sqlite:
+        with stats.stage("sqlite"):
+            c = write_sqlite(args.sqlite, new_manifest)
+        print(f"[INFO] {args.sqlite} : inserted={c['inserted']} updated={c['updated']} "
+              f"deleted={c['deleted']} unchanged={c['unchanged']}")
+    if args.stats:
+        stats.counters["entries"] = n_entries
+        rep = stats.write(args.stats)
+        print(f"[INFO] stats: {args.stats} (total {rep['total']['wall']}s, "
+              f"peak {(rep['peak_memory_bytes'] or 0) // 1024} KiB)")
+    if args.profile:
+        print(f"[INFO] profile: {args.profile}")
+    print(f"✅ {output_json} に {n_entries} 件出力しました。")
+
+if __name__ == "__main__":
+    main()
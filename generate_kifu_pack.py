@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+generate_kifu_pack.py
+- data/<分類>/*.kif を追記型のパックファイル data/pack/kifu-NNN.pack にまとめ、
+  (分類, ファイル名) → (パック番号, オフセット, 長さ) の索引 data/pack/index.json を出力
+- 追記型: 変更・追加された棋譜だけを末尾に追記する（削除・変更前の領域はゴミとして残る）
+  * --compact で全件を詰め直す
+  * 内容の同一性は sha1 で判定（generate_kifu_list.py のマニフェストがあればそれを使い、ファイルを開かない）
+- 中身は元ファイルのバイト列そのまま（文字コードも変換しない）
+- Python からは KifuPack（mmap）で読み出す（全局を読む生成スクリプトが何百ものファイルを開かずに済む）
+- data/pack/ はローカルキャッシュ（data/.kifu_times/ と同じく公開・コミットしない）。
+  ビューアと公開サイトは従来どおり data/<分類>/*.kif を読む（パックは棋譜の2つ目の写しになるだけなので載せない。
+  静的サイトからパックを Range 取得する使い方はしない）
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+from pathlib import Path
+
+from generate_kifu_list import data_dir, load_manifest, scan_kif_files
+
+PACK_DIR = data_dir / "pack"
+PACK_INDEX = PACK_DIR / "index.json"
+PACK_VERSION = 1
+# 1パックの上限（超えたら次のパックへ）。追記で書き直すのは最後のパックだけなので、1ファイルを大きくしすぎない
+PACK_MAX_BYTES = 16 * 1024 * 1024
+
+def pack_name(no: int) -> str:
+    return f"kifu-{no:03d}.pack"
+
+# -----------------------------
+# 索引
+# -----------------------------
+# {"version": 1, "packs": ["kifu-000.pack", ...],
+#  "games": {分類: {ファイル名: [パック番号, オフセット, 長さ, sha1]}}}
+
+def load_pack_index(path: Path = PACK_INDEX) -> dict:
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"version": PACK_VERSION, "packs": [], "games": {}}
+    if raw.get("version") != PACK_VERSION:
+        return {"version": PACK_VERSION, "packs": [], "games": {}}
+    return raw
+
+def save_pack_index(index: dict, path: Path = PACK_INDEX):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+# -----------------------------
+# 読み出し
+# -----------------------------
+class KifuPack:
+    """
+    パックを mmap して1局ずつ取り出す。
+        with KifuPack() as pack:
+            data = pack.get("kif", "20210212及川竹林.kif")
+            for dir_name, fname, data in pack: ...
+    """
+
+    def __init__(self, pack_dir: Path = PACK_DIR):
+        self.pack_dir = Path(pack_dir)
+        self.index = load_pack_index(self.pack_dir / "index.json")
+        self.games = self.index["games"]
+        self._files = []
+        self._maps = []
+        for name in self.index["packs"]:
+            p = self.pack_dir / name
+            if not p.exists() or p.stat().st_size == 0:
+                self._files.append(None)
+                self._maps.append(None)
+                continue
+            f = open(p, "rb")
+            self._files.append(f)
+            self._maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __contains__(self, key) -> bool:
+        dir_name, fname = key
+        return fname in self.games.get(dir_name, {})
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self.games.values())
+
+    def get(self, dir_name: str, fname: str) -> bytes | None:
+        loc = self.games.get(dir_name, {}).get(fname)
+        if loc is None:
+            return None
+        no, off, length = loc[0], loc[1], loc[2]
+        mm = self._maps[no]
+        return None if mm is None else mm[off:off + length]
+
+    def __iter__(self):
+        """索引順（分類 → ファイル名の登録順）に (分類, ファイル名, バイト列) を返す"""
+        for dir_name, files in self.games.items():
+            for fname in files:
+                yield dir_name, fname, self.get(dir_name, fname)
+
+    def close(self):
+        for mm in self._maps:
+            if mm is not None:
+                mm.close()
+        for f in self._files:
+            if f is not None:
+                f.close()
+        self._maps, self._files = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def pack_is_current(loc, rec, path: Path) -> bool:
+    """
+    パックの記録 loc が元ファイルの今の内容か。
+    元ファイルの size/mtime がマニフェスト rec と一致し、その sha1 がパックの sha1 と一致するときだけ True
+    （パック更新後に編集された棋譜・マニフェスト更新前に編集された棋譜は False）。元ファイルが無ければパックを使う
+    """
+    if loc is None:
+        return False
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return True
+    return bool(rec and rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns
+                and rec.get("sha1") == loc[3])
+
+def iter_games(entries, data_dir: Path = data_dir, pack_dir: Path = PACK_DIR, manifest: dict | None = None):
+    """
+    kifu_list.json のエントリ順に (entry, バイト列) を返す。
+    パックの中身が今の元ファイルと同じ棋譜（pack_is_current）は mmap から、
+    それ以外（パック未更新の新規分・編集された棋譜）は元ファイルから読む。
+    manifest を省略すると generate_kifu_list.py のマニフェストをファイルから読む
+    """
+    if manifest is None:
+        manifest = load_manifest(data_dir / ".kifu_manifest.json")
+    with KifuPack(pack_dir) as pack:
+        for e in entries:
+            path = data_dir / e["dir"] / e["file"]
+            data = None
+            loc = pack.games.get(e["dir"], {}).get(e["file"])
+            if pack_is_current(loc, manifest.get(f"{e['dir']}/{e['file']}"), path):
+                data = pack.get(e["dir"], e["file"])
+            if data is None:
+                data = path.read_bytes()
+            yield e, data
+
+# -----------------------------
+# 生成
+# -----------------------------
+def build_pack(data_dir: Path = data_dir, pack_dir: Path = PACK_DIR, compact: bool = False):
+    """
+    パックを更新する。戻り値: counts（kept / appended / removed / bytes_appended）
+      - 既存索引と sha1 が一致する棋譜はそのまま（パックを触らない）
+      - それ以外は最後のパックへ追記（上限を超えたら新しいパックを作る）
+    """
+    pack_dir.mkdir(parents=True, exist_ok=True)
+    index_path = pack_dir / "index.json"
+    old = {"version": PACK_VERSION, "packs": [], "games": {}} if compact else load_pack_index(index_path)
+    if compact:
+        for p in pack_dir.glob("kifu-*.pack"):
+            p.unlink()
+
+    manifest = load_manifest(data_dir / ".kifu_manifest.json")
+    packs = list(old["packs"])
+    games = {}
+    counts = {"kept": 0, "appended": 0, "removed": 0, "bytes_appended": 0}
+
+    # 消えたパック（手で消した・コピー漏れ）に入っていた棋譜は追記し直し、追記先も新しいパックにする
+    missing = {no for no, name in enumerate(packs) if not (pack_dir / name).exists()}
+    cur_no = len(packs) - 1
+    cur = None
+    start_new = cur_no < 0 or cur_no in missing
+    cur_size = 0 if start_new else (pack_dir / packs[cur_no]).stat().st_size
+
+    try:
+        for dir_name, kif_file in scan_kif_files(data_dir):
+            fname = kif_file.name
+            prev = old["games"].get(dir_name, {}).get(fname)
+            rec = manifest.get(f"{dir_name}/{fname}")
+            st = kif_file.stat()
+            data = None
+            if rec and rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns:
+                digest = rec["sha1"]
+            else:
+                data = kif_file.read_bytes()
+                digest = hashlib.sha1(data).hexdigest()
+            if prev and prev[3] == digest and prev[0] not in missing:
+                games.setdefault(dir_name, {})[fname] = prev
+                counts["kept"] += 1
+                continue
+
+            if data is None:
+                data = kif_file.read_bytes()
+            if start_new or (cur_size > 0 and cur_size + len(data) > PACK_MAX_BYTES):
+                start_new = False
+                if cur is not None:
+                    cur.close()
+                    cur = None
+                cur_no = len(packs)
+                packs.append(pack_name(cur_no))
+                cur_size = 0
+            if cur is None:
+                cur = open(pack_dir / packs[cur_no], "ab")
+            games.setdefault(dir_name, {})[fname] = [cur_no, cur_size, len(data), digest]
+            cur.write(data)
+            cur_size += len(data)
+            counts["appended"] += 1
+            counts["bytes_appended"] += len(data)
+    finally:
+        if cur is not None:
+            cur.close()
+
+    counts["removed"] = sum(
+        1 for d, files in old["games"].items() for f in files if f not in games.get(d, {}))
+    save_pack_index({"version": PACK_VERSION, "packs": packs, "games": games}, index_path)
+    return counts
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="data/*/ の .kif を追記型パック data/pack/ にまとめる")
+    ap.add_argument("--compact", action="store_true",
+                    help="既存パックを捨てて全件を詰め直す（削除・変更で溜まった不要領域を回収）")
+    args = ap.parse_args(argv)
+
+    counts = build_pack(compact=args.compact)
+    total = sum(p.stat().st_size for p in PACK_DIR.glob("kifu-*.pack"))
+    print(f"[INFO] kept={counts['kept']} appended={counts['appended']} removed={counts['removed']} "
+          f"(+{counts['bytes_appended']} bytes, packs total {total} bytes)")
+    print(f"✅ {PACK_INDEX} を更新しました。")
+
+if __name__ == "__main__":
+    main()
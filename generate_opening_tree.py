@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+generate_opening_tree.py
+- data/kifu_list.json の全対局（平手・初期局面から始まるもの）の序盤 N 手を集計し、
+  指し手をキーにした木（トライ）を作る。各ノードに 局数 / 勝敗 / 代表局 を持たせる
+- 出力（data/opening/）
+  * index.json : {"version", "depth", "min_count", "chunk_size", "nodes",
+                  "games": [[dir, file, title, date, players] or null, ...]}
+                 対局ID = games の添字（generate_position_index.py と同じく前回の index.json から引き継ぐ）
+  * NNNN.json  : ノード ID が chunk_size 個ずつ入ったチャンク（ノード ID = 幅優先の通し番号、根 = 0）
+                 ノード: {"n": 局数, "r": [先手勝, 後手勝, その他], "g": [代表局の対局ID...],
+                          "c": [[USI, KIF表記, 子ノードID, 局数], ...]（局数の多い順）}
+                 opening.html は必要なチャンクだけを取得して1手ずつ辿る
+- 局数が --min-count 未満の手は子ノードを作らない（親の局数・代表局には含まれる）
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from generate_kifu_list import assign_game_ids, data_dir, load_previous_games, output_json
+from generate_kifu_pack import iter_games
+from kif_parser import parse_kif_bytes, move_to_kif, move_to, move_to_usi
+
+OPENING_DIR = data_dir / "opening"
+OPENING_VERSION = 1
+DEFAULT_DEPTH = 24
+DEFAULT_MIN_COUNT = 2
+CHUNK_SIZE = 256
+EXAMPLES_PER_NODE = 5
+
+def chunk_name(no: int) -> str:
+    return f"{no:04d}.json"
+
+class _Node:
+    __slots__ = ("count", "results", "games", "children")
+
+    def __init__(self):
+        self.count = 0
+        self.results = [0, 0, 0]
+        self.games = []
+        self.children = {}   # USI → (KIF表記, _Node)
+
+    def add(self, gid: int, result: int):
+        self.count += 1
+        self.results[result] += 1
+        if len(self.games) < EXAMPLES_PER_NODE:
+            self.games.append(gid)
+
+def is_standard_start(game) -> bool:
+    """平手の初期局面から先手番で始まる棋譜か（駒落ち・盤面図・途中局面は木に入れない）"""
+    return (game.initial is None and game.first_side == 0 and game.main.start == 1
+            and game.header.get("手合割", "平手").strip() in ("", "平手"))
+
+# -----------------------------
+# 集計
+# -----------------------------
+def build_tree(entries, depth: int = DEFAULT_DEPTH, ids=None):
+    """木を作る。ids は entries と同じ並びの対局ID（省略時は添字）。戻り値: (根ノード, 木に入れた局数)"""
+    if ids is None:
+        ids = range(len(entries))
+    # 代表局は新しい対局から順に採る
+    order = sorted(range(len(entries)), key=lambda i: entries[i].get("date") or "", reverse=True)
+    rank = {i: n for n, i in enumerate(order)}
+    games = sorted(((rank[i], ids[i], data) for i, (_, data) in enumerate(iter_games(entries))))
+
+    root = _Node()
+    used = 0
+    for _, gid, data in games:
+        game = parse_kif_bytes(data)
+        if not is_standard_start(game) or not game.main.moves:
+            continue
+        used += 1
+        result = 2 if game.winner is None else game.winner
+        node = root
+        node.add(gid, result)
+        prev_to = None
+        line = game.main
+        for i in range(min(depth, len(line.moves))):
+            code = line.moves[i]
+            usi = move_to_usi(code)
+            child = node.children.get(usi)
+            if child is None:
+                child = (move_to_kif(code, line.pieces[i], prev_to), _Node())
+                node.children[usi] = child
+            node = child[1]
+            node.add(gid, result)
+            prev_to = move_to(code)
+    return root, used
+
+def flatten(root: _Node, min_count: int = DEFAULT_MIN_COUNT):
+    """幅優先で通し番号を振り、JSON 用のノードリストにする"""
+    out = []
+    queue = [root]
+    next_id = 1
+    head = 0
+    while head < len(queue):
+        node = queue[head]
+        head += 1
+        kids = sorted(((usi, kif, child) for usi, (kif, child) in node.children.items()
+                       if child.count >= min_count),
+                      key=lambda t: (-t[2].count, t[0]))
+        c = []
+        for usi, kif, child in kids:
+            c.append([usi, kif, next_id, child.count])
+            queue.append(child)
+            next_id += 1
+        out.append({"n": node.count, "r": node.results, "g": node.games, "c": c})
+    return out
+
+# -----------------------------
+# 出力
+# -----------------------------
+def write_opening_tree(entries, out_dir: Path = OPENING_DIR,
+                       depth: int = DEFAULT_DEPTH, min_count: int = DEFAULT_MIN_COUNT):
+    """木を書き出す。戻り値: (木に入れた局数, ノード数, チャンク数)"""
+    ids, table = assign_game_ids(entries, load_previous_games(out_dir / "index.json"))
+    root, used = build_tree(entries, depth, ids)
+    nodes = flatten(root, min_count)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("[0-9][0-9][0-9][0-9].json"):
+        old.unlink()
+    n_chunks = (len(nodes) + CHUNK_SIZE - 1) // CHUNK_SIZE
+    for no in range(n_chunks):
+        chunk = nodes[no * CHUNK_SIZE:(no + 1) * CHUNK_SIZE]
+        with open(out_dir / chunk_name(no), "w", encoding="utf-8") as f:
+            json.dump(chunk, f, ensure_ascii=False, separators=(",", ":"))
+
+    meta = {
+        "version": OPENING_VERSION,
+        "depth": depth,
+        "min_count": min_count,
+        "chunk_size": CHUNK_SIZE,
+        "nodes": len(nodes),
+        "games": [[e["dir"], e["file"], e["title"], e["date"], e.get("players", "")] if e else None
+                  for e in table],
+    }
+    with open(out_dir / "index.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+    return used, len(nodes), n_chunks
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="序盤の指し手を集計した定跡木 data/opening/ を生成する")
+    ap.add_argument("--depth", type=int, default=DEFAULT_DEPTH,
+                    help=f"集計する手数（既定 {DEFAULT_DEPTH}）")
+    ap.add_argument("--min-count", type=int, default=DEFAULT_MIN_COUNT,
+                    help=f"この局数未満の手はノードにしない（既定 {DEFAULT_MIN_COUNT}）")
+    args = ap.parse_args(argv)
+
+    entries = json.loads(output_json.read_text(encoding="utf-8"))
+    used, n_nodes, n_chunks = write_opening_tree(entries, depth=args.depth, min_count=args.min_count)
+    print(f"[INFO] {used}/{len(entries)} 局を集計（平手以外・手順なしは除外）")
+    print(f"✅ {OPENING_DIR} に {n_nodes} ノード（{n_chunks} チャンク）を出力しました。")
+
+if __name__ == "__main__":
+    main()
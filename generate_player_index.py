@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+generate_player_index.py
+- data/kifu_list.json の先手/後手の表記ゆれ（段位・称号・敬称・括弧内の所属・空白・かな/カナ）をまとめ、
+  対局者ごとの正規 ID を決めて 対局者 → 対局ID の索引を作る
+  * 正規 ID = 検索用の正規化（generate_index_with_search.norm_players）をかけた名前
+    例: "五段 田内 遼(一関)" / "田内 遼五段" / "田内 遼" → "田内遼"
+  * 表示名 = その ID に属する表記のうち、clean_player_name をかけて最も多いもの
+  * 正規化でまとまらない別表記（異体字・旧姓など）は data/player_aliases.txt で指定する
+      # 1行 = 正規名 = 別名, 別名, ...
+      齋藤太郎 = 斎藤太郎, 斉藤太郎
+- 出力 data/players.json
+    {"version", "games": [[dir, file, title, date] or null, ...],   対局ID = 添字（前回の players.json から引き継ぐ）
+     "players": {ID: {"name", "aliases": [表記...], "games": [対局ID...],
+                      "sente", "win", "loss", "other", "first", "last"}}}
+  player.html?id=<ID> がこれを1回引いて対局者ページを表示する
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+
+from generate_kifu_list import assign_game_ids, data_dir, load_previous_games, output_json
+from generate_kifu_pack import iter_games
+from generate_index_with_search import clean_player_name, norm_players, split_players
+from kif_parser import parse_kif_bytes
+
+PLAYERS_JSON = data_dir / "players.json"
+ALIASES_TXT = data_dir / "player_aliases.txt"
+PLAYERS_VERSION = 1
+
+# NFKC でまとまらない字形違い（同じ字として扱う）
+_GLYPH_FOLD = str.maketrans({"髙": "高", "﨑": "崎", "德": "徳", "瀨": "瀬"})
+
+def player_key(name: str) -> str:
+    """表記 → 正規 ID（空なら ""）"""
+    return norm_players(name).translate(_GLYPH_FOLD)
+
+def load_aliases(path: Path = ALIASES_TXT) -> dict:
+    """別名の正規 ID → 正規名の正規 ID。ファイルが無ければ空"""
+    if not path.exists():
+        return {}
+    out = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        s = line.strip()
+        if not s or s.startswith("#") or "=" not in s:
+            continue
+        canon, aliases = s.split("=", 1)
+        target = player_key(canon)
+        for a in aliases.replace("、", ",").split(","):
+            k = player_key(a)
+            if k and target and k != target:
+                out[k] = target
+    return out
+
+def game_players(entry):
+    """エントリの (先手, 後手)。分けられなければ None"""
+    parts = entry.get("players", "").split(" vs ")
+    if len(parts) != 2:
+        _, parts = split_players(entry.get("players", ""))
+        if len(parts) != 2:
+            return None
+    return parts[0].strip(), parts[1].strip()
+
+# -----------------------------
+# 索引作成
+# -----------------------------
+def build_player_index(entries, aliases=None, with_results: bool = True, ids=None):
+    """
+    戻り値: {ID: {...}}（players.json の "players"）
+    with_results=True なら棋譜本体を解析して勝敗も数える（パック/元ファイルを読む）
+    ids は entries と同じ並びの対局ID（省略時は添字）
+    """
+    aliases = load_aliases() if aliases is None else aliases
+    if ids is None:
+        ids = range(len(entries))
+    winners = {}
+    if with_results:
+        for i, (_, data) in enumerate(iter_games(entries)):
+            winners[ids[i]] = parse_kif_bytes(data).winner
+
+    players = {}
+    names = {}
+    for gid, e in zip(ids, entries):
+        pair = game_players(e)
+        if pair is None:
+            continue
+        for side, raw in enumerate(pair):
+            key = player_key(raw)
+            key = aliases.get(key, key)
+            if not key:
+                continue
+            p = players.get(key)
+            if p is None:
+                p = players[key] = {"name": "", "aliases": [], "games": [],
+                                    "sente": 0, "win": 0, "loss": 0, "other": 0, "first": "", "last": ""}
+                names[key] = Counter()
+            names[key][clean_player_name(raw) or raw] += 1
+            if raw not in p["aliases"]:
+                p["aliases"].append(raw)
+            if not p["games"] or p["games"][-1] != gid:
+                p["games"].append(gid)
+            if side == 0:
+                p["sente"] += 1
+            w = winners.get(gid)
+            if w is None:
+                p["other"] += 1
+            elif w == side:
+                p["win"] += 1
+            else:
+                p["loss"] += 1
+            d = e.get("date") or ""
+            if d:
+                p["first"] = min(p["first"] or d, d)
+                p["last"] = max(p["last"], d)
+
+    for key, p in players.items():
+        # 表示名: 最多の表記（同数なら先に出たもの）
+        p["name"] = names[key].most_common(1)[0][0]
+        p["aliases"].sort()
+    return players
+
+def write_player_index(entries, path: Path = PLAYERS_JSON):
+    ids, table = assign_game_ids(entries, load_previous_games(path))
+    players = build_player_index(entries, ids=ids)
+    out = {
+        "version": PLAYERS_VERSION,
+        "games": [[e["dir"], e["file"], e["title"], e["date"]] if e else None for e in table],
+        "players": dict(sorted(players.items(), key=lambda kv: (-len(kv[1]["games"]), kv[0]))),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, separators=(",", ":"))
+    return players
+
+def main():
+    entries = json.loads(output_json.read_text(encoding="utf-8"))
+    players = write_player_index(entries)
+    n_alias = sum(len(p["aliases"]) for p in players.values())
+    print(f"[INFO] {n_alias} 表記 → {len(players)} 名")
+    print(f"✅ {PLAYERS_JSON} を出力しました。")
+
+if __name__ == "__main__":
+    main()
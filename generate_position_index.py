@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+generate_position_index.py
+- data/kifu_list.json の全対局を再生し、各局面の Zobrist ハッシュ → (対局ID, 手数) の索引を作る
+  「この局面になった対局は？」を O(log n) で引けるようにする
+- 出力（data/posidx/）
+  * index.json : {"version", "record_size", "shard_bits", "games": [[dir, file, title, date] or null, ...]}
+                 対局ID = games の添字。前回の index.json から引き継ぐ（assign_game_ids。消えた対局は null）
+                 ので、1局の追加・削除ではその対局の局面があるシャードしか変わらない
+  * XX.bin     : ハッシュ上位 8bit ごとのシャード。レコード <QII（hash, 対局ID, 手数）を hash 昇順に並べたもの
+                 空のシャードは出力しない（404 = 該当なし）
+- 同じ対局で同じ局面が繰り返された場合（千日手など）は最初の手数だけを記録
+- Python からは PositionIndex、静的サイトからは posidx.js（index.html の「局面検索」）で引く
+"""
+
+import json
+import struct
+from pathlib import Path
+
+from generate_kifu_list import assign_game_ids, data_dir, load_previous_games, output_json
+from generate_kifu_pack import iter_games
+from kif_board import Position, replay
+from kif_parser import parse_kif_bytes
+
+POSIDX_DIR = data_dir / "posidx"
+POSIDX_VERSION = 1
+RECORD = struct.Struct("<QII")
+SHARD_BITS = 8
+
+def shard_name(key: int) -> str:
+    return f"{key >> (64 - SHARD_BITS):02x}.bin"
+
+# -----------------------------
+# 生成
+# -----------------------------
+def collect_positions(entries, ids=None):
+    """(hash, 対局ID, 手数) のリストを返す（本譜のみ）。ids は entries と同じ並びの対局ID（省略時は添字）"""
+    records = []
+    for i, (entry, data) in enumerate(iter_games(entries)):
+        gid = ids[i] if ids is not None else i
+        game = parse_kif_bytes(data)
+        if not game.main.moves:
+            continue
+        seen = set()
+        for ply, pos in replay(game):
+            if pos.key not in seen:
+                seen.add(pos.key)
+                records.append((pos.key, gid, ply))
+    return records
+
+def write_position_index(entries, out_dir: Path = POSIDX_DIR):
+    """索引を書き出す。戻り値: (局面レコード数, シャード数)"""
+    ids, table = assign_game_ids(entries, load_previous_games(out_dir / "index.json"))
+    records = collect_positions(entries, ids)
+    records.sort()
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("*.bin"):
+        old.unlink()
+
+    shards = {}
+    for rec in records:
+        shards.setdefault(shard_name(rec[0]), []).append(rec)
+    for name, recs in shards.items():
+        buf = bytearray(RECORD.size * len(recs))
+        for i, rec in enumerate(recs):
+            RECORD.pack_into(buf, i * RECORD.size, *rec)
+        (out_dir / name).write_bytes(buf)
+
+    meta = {
+        "version": POSIDX_VERSION,
+        "record_size": RECORD.size,
+        "shard_bits": SHARD_BITS,
+        "games": [[e["dir"], e["file"], e["title"], e["date"]] if e else None for e in table],
+    }
+    with open(out_dir / "index.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+    return len(records), len(shards)
+
+# -----------------------------
+# 検索
+# -----------------------------
+class PositionIndex:
+    """
+    idx = PositionIndex()
+    idx.lookup_sfen("lnsgkgsnl/1r5b1/ppppppppp/9/9/2P6/PP1PPPPPP/1B5R1/LNSGKGSNL w - 2")
+      → [(対局ID, 手数), ...]
+    idx.game(対局ID) → {"dir", "file", "title", "date"}（消えた対局は None）
+    """
+
+    def __init__(self, index_dir: Path = POSIDX_DIR):
+        self.index_dir = Path(index_dir)
+        meta = json.loads((self.index_dir / "index.json").read_text(encoding="utf-8"))
+        if meta.get("version") != POSIDX_VERSION:
+            raise ValueError(f"{self.index_dir} の版が違います。再生成してください。")
+        self.games = meta["games"]
+        self._shards = {}
+
+    def _shard(self, key: int) -> bytes:
+        name = shard_name(key)
+        if name not in self._shards:
+            p = self.index_dir / name
+            self._shards[name] = p.read_bytes() if p.exists() else b""
+        return self._shards[name]
+
+    def lookup(self, key: int):
+        buf = self._shard(key)
+        size = RECORD.size
+        lo, hi = 0, len(buf) // size
+        while lo < hi:   # 二分探索（lower bound）
+            mid = (lo + hi) // 2
+            if struct.unpack_from("<Q", buf, mid * size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        out = []
+        while lo * size < len(buf):
+            h, gid, ply = RECORD.unpack_from(buf, lo * size)
+            if h != key:
+                break
+            out.append((gid, ply))
+            lo += 1
+        return out
+
+    def lookup_sfen(self, sfen: str):
+        return self.lookup(Position.from_sfen(sfen).key)
+
+    def game(self, gid: int) -> dict:
+        if self.games[gid] is None:
+            return None
+        d, f, title, date = self.games[gid]
+        return {"dir": d, "file": f, "title": title, "date": date}
+
+def main():
+    entries = json.loads(output_json.read_text(encoding="utf-8"))
+    n_records, n_shards = write_position_index(entries)
+    print(f"✅ {POSIDX_DIR} に {len(entries)} 局 / {n_records} 局面（{n_shards} シャード）を出力しました。")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+generate_publish.py
+- 公開用の静的ファイル一式を public/ に作る（regen.bat の後に実行。public/ はコミットしない）
+    python generate_publish.py [--out public] [--no-brotli]
+  kifu_server.py --root public や nginx（gzip_static / brotli_static）などの「圧縮済みファイルをそのまま返す」配信向け
+- 含めるもの: index.html / viewer.html / player.html / opening.html / posidx.js / data/ / kifu/（ビューア素材）
+  data/ の . で始まるローカルキャッシュ・data/pack/・SQLite・--stats のレポート・作業用の .txt は含めない
+- 指紋付き名（内容の sha256 先頭 HASH_LEN 桁）: 参照先が固定の派生ファイルだけ
+    data/kifu_list.json → data/kifu_list.<hash>.json など（FINGERPRINT）
+  ページ内の "data/kifu_list.json" のような引用符付きの参照を書き換える。元の名前のファイルも残す
+  （外部からの直リンクや kifu_server.py 用）。指紋付きは中身が変わると名前が変わるので、ずっとキャッシュしてよい
+- 圧縮済みの別ファイル: 文字のファイル（.html .js .json .kif .css .txt）で COMPRESS_MIN_BYTES 以上のもの
+    x.json.gz（gzip -9。mtime=0 で毎回同じバイト列）/ x.json.br（brotli モジュールがあるときだけ）
+  元の 90% 以上にしかならないものは作らない
+- サービスワーカー sw.js を生成し、各ページに登録用の1行を入れる
+  * ページ・指紋付きファイル・ビューア素材を最初に取得しておく（precache）
+  * 指紋付きファイルはキャッシュ優先、それ以外（一覧・メタ・索引）はネットワーク優先で、つながらなければキャッシュ
+  * 開いた棋譜（data/<分類>/*.kif）は最近の MAX_GAMES 局を残す（電波の悪い会場でも見直せる）
+  * キャッシュ名に precache の内容のハッシュを入れるので、内容が変わって再公開すると古いキャッシュは消える
+- 出力先の隣の .public.publish.json（--out X なら .X.publish.json）に 出力ファイル → sha256 を保存し、
+  変わっていないファイルは書き直さない（出力先の中には置かないので公開されない）
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:   # 無ければ gzip だけ作る
+    brotli = None
+
+from generate_kifu_list import base_dir
+
+PUBLISH_DIR = base_dir / "public"
+PUBLISH_VERSION = 1
+PAGES = ("index.html", "viewer.html", "player.html", "opening.html")
+ASSETS = ("posidx.js",)
+TREES = ("data", "kifu")
+# 指紋付きにする派生ファイル（ページから引用符付きの固定パスで参照されるもの）
+FINGERPRINT = ("data/kifu_list.json", "data/players.json", "data/search_index.json", "data/index_rows.json",
+               "posidx.js", "kifu/kj_free107/kj_free/kj_free.js")
+HASH_LEN = 10
+COMPRESS_SUFFIXES = {".html", ".js", ".json", ".kif", ".css", ".txt"}
+COMPRESS_MIN_BYTES = 512
+COMPRESS_MAX_RATIO = 0.9
+EXCLUDE_SUFFIXES = {".sqlite", ".tmp", ".bak", ".prof"}
+EXCLUDE_DIRS = ("data/pack/",)   # ローカル専用のキャッシュ（generate_kifu_pack.py）
+MAX_GAMES = 50
+MAX_RUNTIME = 300
+
+_FINGERPRINTED_RE = re.compile(rf"\.[0-9a-f]{{{HASH_LEN}}}\.[A-Za-z0-9]+$")
+
+def is_fingerprinted(name: str) -> bool:
+    """指紋付きの名前か（kifu_server.py が Cache-Control: immutable を付けるのに使う）"""
+    return bool(_FINGERPRINTED_RE.search(name))
+
+def fingerprint_name(rel: str, data: bytes) -> str:
+    """data/kifu_list.json → data/kifu_list.<sha256 先頭>.json"""
+    p = Path(rel)
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LEN]
+    return p.with_name(f"{p.stem}.{digest}{p.suffix}").as_posix()
+
+def collect_sources(root: Path = base_dir):
+    """公開するファイル → 相対パス（"/" 区切り）のリスト"""
+    rels = [name for name in PAGES + ASSETS if (root / name).is_file()]
+    for tree in TREES:
+        for path in sorted((root / tree).rglob("*")):
+            rel = path.relative_to(root).as_posix()
+            if not path.is_file() or any(part.startswith(".") for part in path.relative_to(root).parts):
+                continue
+            if rel.startswith(EXCLUDE_DIRS):
+                continue
+            if path.suffix in EXCLUDE_SUFFIXES or path.name.endswith(".stats.json"):
+                continue
+            if tree == "data" and path.suffix == ".txt":
+                continue
+            rels.append(rel)
+    return rels
+
+def rewrite_refs(text: str, renames: dict) -> str:
+    """引用符付きの参照 "old" / 'old' を指紋付きの名前に置き換える"""
+    for old, new in renames.items():
+        text = text.replace(f'"{old}"', f'"{new}"').replace(f"'{old}'", f"'{new}'")
+    return text
+
+def compress_variants(data: bytes):
+    """(拡張子, 圧縮後のバイト列) を返す。縮まないものは返さない"""
+    out = [(".gz", gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        out.append((".br", brotli.compress(data, quality=11)))
+    return [(ext, c) for ext, c in out if len(c) < len(data) * COMPRESS_MAX_RATIO]
+
+# -----------------------------
+# サービスワーカー
+# -----------------------------
+SW_TEMPLATE = r"""// sw.js — generate_publish.py が生成（手で編集しない）
+const VERSION = "__VERSION__";
+const PRECACHE = "kifu-pre-" + VERSION;
+const RUNTIME = "kifu-rt-" + VERSION;
+const GAMES = "kifu-games";
+const PRECACHE_URLS = __PRECACHE__;
+const MAX_GAMES = __MAX_GAMES__;
+const MAX_RUNTIME = __MAX_RUNTIME__;
+const FINGERPRINTED = /\.[0-9a-f]{__HASH_LEN__}\.[A-Za-z0-9]+$/;
+const GAME_RE = /\/data\/[^/]+\/[^/]+\.kif$/;
+const VIEWER_ASSET_RE = /\/kifu\/[^?]+\.(?:jpg|png|mp3)$/;
+
+self.addEventListener("install", event => {
+  event.waitUntil(caches.open(PRECACHE).then(c => c.addAll(PRECACHE_URLS)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener("activate", event => {
+  const keep = new Set([PRECACHE, RUNTIME, GAMES]);
+  event.waitUntil(caches.keys()
+    .then(names => Promise.all(names.filter(n => n.startsWith("kifu-") && !keep.has(n)).map(n => caches.delete(n))))
+    .then(() => self.clients.claim()));
+});
+
+// 古いものから消して max 件にする（Cache の keys() は入れた順）
+async function trim(cache, max){
+  const keys = await cache.keys();
+  for(let i = 0; i < keys.length - max; i++) await cache.delete(keys[i]);
+}
+
+async function cacheFirst(req){
+  const hit = await caches.match(req);
+  if(hit) return hit;
+  const res = await fetch(req);
+  if(res.ok) (await caches.open(RUNTIME)).put(req, res.clone());
+  return res;
+}
+
+// ネットワーク優先。key はクエリを除いた URL（ビューアは ?時刻 を付けて読むため）
+async function networkFirst(req, cacheName, max){
+  const url = new URL(req.url);
+  url.search = "";
+  const key = url.href;
+  const cache = await caches.open(cacheName);
+  try{
+    const res = await fetch(req);
+    if(res.ok){
+      await cache.delete(key);   // 入れ直して「最近見た」順の末尾へ
+      await cache.put(key, res.clone());
+      trim(cache, max);
+    }
+    return res;
+  }catch(err){
+    const hit = await cache.match(key) || await caches.match(key, {ignoreSearch: true});
+    if(hit) return hit;
+    throw err;
+  }
+}
+
+self.addEventListener("fetch", event => {
+  const req = event.request;
+  const url = new URL(req.url);
+  if(req.method !== "GET" || url.origin !== location.origin || url.pathname.includes("/api/")) return;
+  if(FINGERPRINTED.test(url.pathname) || VIEWER_ASSET_RE.test(url.pathname)){
+    event.respondWith(caches.match(req, {ignoreSearch: true}).then(hit => hit || cacheFirst(req)));
+  }else if(GAME_RE.test(decodeURIComponent(url.pathname))){
+    event.respondWith(networkFirst(req, GAMES, MAX_GAMES));
+  }else{
+    event.respondWith(networkFirst(req, RUNTIME, MAX_RUNTIME));
+  }
+});
+"""
+
+SW_REGISTER = ('<script>if("serviceWorker" in navigator){addEventListener("load",'
+               '()=>navigator.serviceWorker.register("sw.js").catch(()=>{}));}</script>')
+
+def build_service_worker(precache, digests: dict) -> str:
+    """precache の各ファイルの sha256 からキャッシュの版を決める（ページが変われば版も変わる）"""
+    lines = "\n".join(f"{rel} {digests.get(rel, '')}" for rel in precache)
+    version = hashlib.sha256(lines.encode("utf-8")).hexdigest()[:HASH_LEN]
+    return (SW_TEMPLATE.replace("__VERSION__", version)
+            .replace("__PRECACHE__", json.dumps(["./"] + list(precache), ensure_ascii=False))
+            .replace("__MAX_GAMES__", str(MAX_GAMES))
+            .replace("__MAX_RUNTIME__", str(MAX_RUNTIME))
+            .replace("__HASH_LEN__", str(HASH_LEN)))
+
+def inject_register(html: str) -> str:
+    if "serviceWorker" in html or "</body>" not in html:
+        return html
+    head, _, tail = html.rpartition("</body>")
+    return head + SW_REGISTER + "\n</body>" + tail
+
+# -----------------------------
+# 書き出し
+# -----------------------------
+def state_path_for(out_dir: Path) -> Path:
+    """public/ → .public.publish.json（出力先の隣）"""
+    return out_dir.with_name(f".{out_dir.name}.publish.json")
+
+class Publisher:
+    def __init__(self, out_dir: Path = PUBLISH_DIR, use_brotli: bool = True):
+        self.out_dir = out_dir
+        self.use_brotli = use_brotli and brotli is not None
+        self.state_path = state_path_for(out_dir)
+        try:
+            raw = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            raw = {}
+        ok = raw.get("version") == PUBLISH_VERSION and raw.get("brotli") == self.use_brotli
+        self.prev = raw.get("files", {}) if ok else {}
+        self.files = {}     # 出力の相対パス → sha256
+        self.counts = {"written": 0, "unchanged": 0, "compressed": 0, "removed": 0}
+        self.bytes = {"raw": 0, "gz": 0, "br": 0}
+
+    def put(self, rel: str, data: bytes):
+        """1ファイルと圧縮版を書く（内容が前回と同じで出力が揃っていれば触らない）"""
+        digest = hashlib.sha256(data).hexdigest()
+        self.files[rel] = digest
+        dest = self.out_dir / rel
+        variants = []
+        if Path(rel).suffix in COMPRESS_SUFFIXES and len(data) >= COMPRESS_MIN_BYTES:
+            variants = [".gz", ".br"] if self.use_brotli else [".gz"]
+        self.bytes["raw"] += len(data)
+        if self.prev.get(rel) == digest and dest.exists():
+            self.counts["unchanged"] += 1
+            for ext in variants:
+                v = dest.with_name(dest.name + ext)
+                if v.exists():
+                    self.bytes[ext[1:]] += v.stat().st_size
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_bytes(data)
+        self.counts["written"] += 1
+        for ext in (".gz", ".br"):
+            dest.with_name(dest.name + ext).unlink(missing_ok=True)
+        if not variants:
+            return
+        for ext, comp in compress_variants(data):
+            if ext not in variants:
+                continue
+            dest.with_name(dest.name + ext).write_bytes(comp)
+            self.bytes[ext[1:]] += len(comp)
+            self.counts["compressed"] += 1
+
+    def finish(self):
+        """今回出力しなかった古いファイル（前回の指紋付きなど）を消し、状態を保存する"""
+        for rel in self.prev.keys() - self.files.keys():
+            for ext in ("", ".gz", ".br"):
+                p = self.out_dir / (rel + ext)
+                if p.exists():
+                    p.unlink()
+            self.counts["removed"] += 1
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": PUBLISH_VERSION, "brotli": self.use_brotli, "files": self.files},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.state_path)
+
+def publish(out_dir: Path = PUBLISH_DIR, use_brotli: bool = True, root: Path = base_dir):
+    """public/ を作る。戻り値: Publisher（件数・バイト数）"""
+    pub = Publisher(out_dir, use_brotli)
+    rels = collect_sources(root)
+    renames = {}
+    for rel in rels:
+        if rel in FINGERPRINT:
+            renames[rel] = fingerprint_name(rel, (root / rel).read_bytes())
+
+    for rel in rels:
+        data = (root / rel).read_bytes()
+        if rel in PAGES:
+            data = inject_register(rewrite_refs(data.decode("utf-8"), renames)).encode("utf-8")
+        pub.put(rel, data)
+        if rel in renames:
+            pub.put(renames[rel], data)
+
+    viewer_assets = [r for r in rels if r.startswith("kifu/kj_free107/kj_free/")
+                     and Path(r).suffix in (".jpg", ".png", ".mp3")]
+    precache = [p for p in PAGES if p in rels] + sorted(renames.values()) + viewer_assets
+    pub.put("sw.js", build_service_worker(precache, pub.files).encode("utf-8"))
+    pub.finish()
+    return pub
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="圧縮済み・指紋付きの公開用ファイルとサービスワーカーを public/ に作る")
+    ap.add_argument("--out", type=Path, default=PUBLISH_DIR, help=f"出力先（既定 {PUBLISH_DIR.name}/）")
+    ap.add_argument("--no-brotli", action="store_true", help="brotli があっても .br を作らない")
+    ap.add_argument("--clean", action="store_true", help="出力先を消してから作り直す")
+    args = ap.parse_args(argv)
+
+    if args.clean and args.out.exists():
+        shutil.rmtree(args.out)
+        state_path_for(args.out).unlink(missing_ok=True)
+    pub = publish(args.out, use_brotli=not args.no_brotli)
+    c, b = pub.counts, pub.bytes
+    if brotli is None and not args.no_brotli:
+        print("[INFO] brotli モジュールが無いので .br は作りません（pip install brotli）")
+    print(f"[INFO] written={c['written']} unchanged={c['unchanged']} compressed={c['compressed']} "
+          f"removed={c['removed']}")
+    print(f"[INFO] bytes raw={b['raw']:,} gz={b['gz']:,}" + (f" br={b['br']:,}" if pub.use_brotli else ""))
+    print(f"✅ {args.out} に {len(pub.files)} ファイルを書き出しました。")
+
+if __name__ == "__main__":
+    main()
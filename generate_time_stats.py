@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+generate_time_stats.py
+- 指し手行の消費時間（"( 0:07/00:00:07)"）を全対局から取り出し、列ごとの連続した配列に保存して集計する
+- 列ストア（ローカルキャッシュ data/.kifu_times/。公開対象外）
+  * 1手1要素: sec.bin（消費秒 uint32）/ cum.bin（その側の累計秒 uint32）/ ply.bin（手数 uint16）/
+              player.bin（指した側の対局者番号 uint32。0 = 不明）
+  * 1局1要素: offsets.bin（1手列の開始位置 uint32、局数+1 個）/ limit.bin（持ち時間の秒 uint32。0 = 不明）
+  * meta.json : {"version", "games": [[dir, file], ...], "players": [名前...]}
+  すべてリトルエンディアン。消費時間が1手も書かれていない棋譜は入れない
+- 集計（numpy があれば bincount 等でまとめて計算、無ければ array + 素の Python で同じ結果）
+  * 局面の段階（序盤 〜30手 / 中盤 〜80手 / 終盤）ごとの1手あたり平均消費時間
+  * 時間切迫の頻度: 持ち時間が分かる対局で、残り TROUBLE_SECONDS 秒未満（秒読み含む）で指した手がある割合
+  * 対局者ごとの段階別平均と切迫率（対局者は generate_player_index.py と同じ正規 ID でまとめる）
+- python generate_time_stats.py [--top N] [--json PATH]
+"""
+
+import argparse
+import json
+import re
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:   # 無くても同じ集計ができる（遅いだけ）
+    np = None
+
+from generate_kifu_list import data_dir, output_json
+from generate_kifu_pack import iter_games
+from generate_player_index import game_players, load_aliases, player_key
+from kif_parser import parse_kif_bytes
+
+TIME_DIR = data_dir / ".kifu_times"
+TIME_VERSION = 1
+MOVE_FIELDS = {"sec": "I", "cum": "I", "ply": "H", "player": "I"}
+GAME_FIELDS = {"offsets": "I", "limit": "I"}
+_NP_DTYPES = {"I": "<u4", "H": "<u2"}
+
+# 段階の境目（手数がこれ以下なら前の段階）
+PHASE_BOUNDS = (30, 80)
+PHASE_NAMES = ("序盤", "中盤", "終盤")
+TROUBLE_SECONDS = 60
+
+_LIMIT_RE = re.compile(r"(?:(\d+)時間)?(?:(\d+)分)?")
+
+def parse_time_limit(value: str) -> int:
+    """持ち時間の表記（例: "15分+60秒" / "１時間" / "各８時間" / "0時間40分"）→ 秒。読めなければ 0"""
+    s = unicodedata.normalize("NFKC", value or "").replace("各", "").strip()
+    m = _LIMIT_RE.match(s)
+    if not m or not (m.group(1) or m.group(2)):
+        return 0
+    return int(m.group(1) or 0) * 3600 + int(m.group(2) or 0) * 60
+
+# -----------------------------
+# 抽出
+# -----------------------------
+def extract_times(entries):
+    """全対局から列を作る。戻り値: (cols: {列名: array}, meta)"""
+    aliases = load_aliases()
+    cols = {name: array(code) for name, code in {**MOVE_FIELDS, **GAME_FIELDS}.items()}
+    cols["offsets"].append(0)
+    games, players, player_ids = [], [""], {"": 0}
+
+    for e, data in iter_games(entries):
+        game = parse_kif_bytes(data)
+        line = game.main
+        if not any(line.times):
+            continue
+        pair = game_players(e) or ("", "")
+        ids = []
+        for raw in pair:
+            key = player_key(raw)
+            key = aliases.get(key, key)
+            if key not in player_ids:
+                player_ids[key] = len(players)
+                players.append(key)
+            ids.append(player_ids[key])
+
+        cum = [0, 0]
+        for i, sec in enumerate(line.times):
+            side = game.side_to_move(line.start + i)
+            cum[side] += sec
+            cols["sec"].append(sec)
+            cols["cum"].append(cum[side])
+            cols["ply"].append(min(line.start + i, 0xFFFF))
+            cols["player"].append(ids[side])
+        cols["offsets"].append(len(cols["sec"]))
+        cols["limit"].append(parse_time_limit(game.header.get("持ち時間", "")))
+        games.append([e["dir"], e["file"]])
+
+    meta = {"version": TIME_VERSION, "games": games, "players": players}
+    return cols, meta
+
+def save_columns(cols, meta, out_dir: Path = TIME_DIR):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name, arr in cols.items():
+        if sys.byteorder != "little":
+            arr = array(arr.typecode, arr)
+            arr.byteswap()
+        (out_dir / f"{name}.bin").write_bytes(arr.tobytes())
+    with open(out_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+
+def load_columns(in_dir: Path = TIME_DIR):
+    """列を読む（numpy があれば ndarray、無ければ array）。戻り値: (cols, meta)"""
+    meta = json.loads((in_dir / "meta.json").read_text(encoding="utf-8"))
+    cols = {}
+    for name, code in {**MOVE_FIELDS, **GAME_FIELDS}.items():
+        raw = (in_dir / f"{name}.bin").read_bytes()
+        if np is not None:
+            cols[name] = np.frombuffer(raw, dtype=_NP_DTYPES[code])
+        else:
+            arr = array(code)
+            arr.frombytes(raw)
+            if sys.byteorder != "little":
+                arr.byteswap()
+            cols[name] = arr
+    return cols, meta
+
+# -----------------------------
+# 集計
+# -----------------------------
+def _derived(cols):
+    """1手ごとの (段階番号, 対局番号, 時間切迫か, 持ち時間が分かるか)"""
+    sec, cum, ply, offsets, limit = cols["sec"], cols["cum"], cols["ply"], cols["offsets"], cols["limit"]
+    if np is not None:
+        phase = np.searchsorted(np.array(PHASE_BOUNDS), ply, side="left")
+        game = np.repeat(np.arange(len(limit)), np.diff(offsets))
+        lim = limit[game].astype(np.int64)
+        known = lim > 0
+        trouble = known & (lim - (cum.astype(np.int64) - sec) < TROUBLE_SECONDS)
+        return phase, game, trouble, known
+    phase = [bisect_left(PHASE_BOUNDS, p) for p in ply]
+    game = [g for g in range(len(limit)) for _ in range(offsets[g + 1] - offsets[g])]
+    known = [limit[g] > 0 for g in game]
+    trouble = [k and limit[g] - (c - s) < TROUBLE_SECONDS
+               for k, g, c, s in zip(known, game, cum, sec)]
+    return phase, game, trouble, known
+
+def _bincount(idx, weights=None, n: int = 0):
+    if np is not None:
+        return np.bincount(idx, weights, minlength=n)
+    out = [0] * n
+    if weights is None:
+        for i in idx:
+            out[i] += 1
+    else:
+        for i, w in zip(idx, weights):
+            out[i] += w
+    return out
+
+def _where(mask, values):
+    if np is not None:
+        return values[mask]
+    return [v for m, v in zip(mask, values) if m]
+
+def _avg(total, n):
+    return round(float(total) / int(n), 1) if n else None
+
+def summarize(cols, meta, top: int = 20):
+    """集計結果の辞書"""
+    phase, game, trouble, known = _derived(cols)
+    n_phase = len(PHASE_NAMES)
+    n_games = len(meta["games"])
+    n_players = len(meta["players"])
+
+    sec_by_phase = _bincount(phase, cols["sec"], n_phase)
+    moves_by_phase = _bincount(phase, None, n_phase)
+
+    limited_games = sum(1 for v in cols["limit"] if v > 0)
+    trouble_games = len(set(int(g) for g in _where(trouble, game)))
+
+    pid = cols["player"]
+    if np is not None:
+        cell = pid.astype(np.int64) * n_phase + phase
+    else:
+        cell = [p * n_phase + ph for p, ph in zip(pid, phase)]
+    p_sec = _bincount(cell, cols["sec"], n_players * n_phase)
+    p_moves = _bincount(cell, None, n_players * n_phase)
+    p_known = _bincount(_where(known, pid), None, n_players)
+    p_trouble = _bincount(_where(trouble, pid), None, n_players)
+    p_games = [0] * n_players
+    offsets = cols["offsets"]
+    for g in range(n_games):
+        first = int(offsets[g])
+        if int(offsets[g + 1]) > first:
+            p_games[int(pid[first])] += 1
+            if int(offsets[g + 1]) > first + 1:
+                p_games[int(pid[first + 1])] += 1
+
+    players = []
+    for p in range(1, n_players):
+        moves = sum(int(p_moves[p * n_phase + k]) for k in range(n_phase))
+        if not moves:
+            continue
+        players.append({
+            "player": meta["players"][p],
+            "games": p_games[p],
+            "moves": moves,
+            "avg": {PHASE_NAMES[k]: _avg(p_sec[p * n_phase + k], p_moves[p * n_phase + k])
+                    for k in range(n_phase)},
+            "trouble_rate": _avg(int(p_trouble[p]) * 100, p_known[p]),
+        })
+    players.sort(key=lambda r: (-r["games"], r["player"]))
+
+    return {
+        "games": n_games,
+        "moves": len(cols["sec"]),
+        "avg_by_phase": {PHASE_NAMES[k]: _avg(sec_by_phase[k], moves_by_phase[k]) for k in range(n_phase)},
+        "time_trouble": {"threshold_sec": TROUBLE_SECONDS, "games_with_limit": limited_games,
+                         "games_in_trouble": trouble_games,
+                         "rate": _avg(trouble_games * 100, limited_games)},
+        "players": players[:top] if top else players,
+    }
+
+def print_summary(s):
+    print(f"[INFO] {s['games']} 局 / {s['moves']} 手（消費時間あり）  numpy={'あり' if np is not None else 'なし'}")
+    print("1手あたり平均（秒）: " + " / ".join(f"{k} {v}" for k, v in s["avg_by_phase"].items()))
+    t = s["time_trouble"]
+    print(f"時間切迫（残り {t['threshold_sec']} 秒未満で指した手がある）: "
+          f"{t['games_in_trouble']}/{t['games_with_limit']} 局（{t['rate']}%）")
+    for r in s["players"]:
+        avg = " ".join(f"{v if v is not None else '-':>6}" for v in r["avg"].values())
+        rate = "-" if r["trouble_rate"] is None else f"{r['trouble_rate']}%"
+        print(f"  {r['player']:<12} {r['games']:>4}局 {avg}  切迫 {rate}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="消費時間を列ストア data/.kifu_times/ に抽出して集計する")
+    ap.add_argument("--top", type=int, default=20, help="対局者別に表示する人数（0 で全員。既定 20）")
+    ap.add_argument("--json", type=Path, metavar="PATH", help="集計結果を JSON で書き出す")
+    ap.add_argument("--no-extract", action="store_true", help="抽出せず既存の列ストアだけで集計する")
+    args = ap.parse_args(argv)
+
+    if not args.no_extract:
+        entries = json.loads(output_json.read_text(encoding="utf-8"))
+        cols, meta = extract_times(entries)
+        save_columns(cols, meta)
+    cols, meta = load_columns()
+    summary = summarize(cols, meta, args.top)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"✅ {args.json} に書き出しました。")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+kif_board.py
+- kif_parser の指し手コードを盤面に適用して局面を再現する（合法手チェックはしない）
+- 局面の 64bit Zobrist ハッシュ（盤上の駒 + 持駒 + 手番）を差分更新で保持
+  * 乱数表は SplitMix64 を固定シードで回して作る（posidx.js でも同じ表を BigInt で再現できる）
+  * 並び: 盤[マス 0..80][駒 0..27] → 持駒[手番 0..1][駒種 0..6][枚数 1..18] → 手番
+    駒の添字 = 駒種-1 + (後手なら 14)
+- SFEN の入出力（局面検索の入力・変換用）
+"""
+
+from kif_parser import (
+    FU, KY, KE, GI, KA, HI, KI, OU, PROMOTE,
+    DROP_BASE, move_to, move_from, is_promote, square,
+)
+
+# -----------------------------
+# Zobrist 乱数表
+# -----------------------------
+ZOBRIST_SEED = 0x4B49465550534958   # "KIFUPSIX"
+HAND_MAX = 18
+_MASK64 = (1 << 64) - 1
+
+def splitmix64(seed: int):
+    """SplitMix64 の乱数列（64bit 整数を無限に返す）"""
+    x = seed & _MASK64
+    while True:
+        x = (x + 0x9E3779B97F4A7C15) & _MASK64
+        z = x
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        yield z ^ (z >> 31)
+
+def _build_zobrist():
+    rnd = splitmix64(ZOBRIST_SEED)
+    board = [[next(rnd) for _ in range(28)] for _ in range(81)]
+    hand = [[[0] + [next(rnd) for _ in range(HAND_MAX)] for _ in range(7)] for _ in range(2)]
+    side = next(rnd)
+    return board, hand, side
+
+ZOBRIST_BOARD, ZOBRIST_HAND, ZOBRIST_SIDE = _build_zobrist()
+
+def _pidx(piece: int) -> int:
+    """符号付き駒 → 乱数表の添字"""
+    return piece - 1 if piece > 0 else -piece - 1 + 14
+
+# -----------------------------
+# 初期配置
+# -----------------------------
+_BACK_RANK = (KY, KE, GI, KI, OU, KI, GI, KE, KY)   # ９筋 → １筋
+
+def _hirate_board():
+    board = [0] * 81
+    for col, kind in enumerate(_BACK_RANK):
+        f = 9 - col
+        board[square(f, 9)] = kind
+        board[square(f, 1)] = -kind
+    for f in range(1, 10):
+        board[square(f, 7)] = FU
+        board[square(f, 3)] = -FU
+    board[square(8, 8)] = KA
+    board[square(2, 8)] = HI
+    board[square(2, 2)] = -KA
+    board[square(8, 2)] = -HI
+    return board
+
+# 駒落ち: 上手（後手）から取り除くマス (筋, 段)
+HANDICAPS = {
+    "香落ち": [(1, 1)],
+    "右香落ち": [(9, 1)],
+    "角落ち": [(2, 2)],
+    "飛車落ち": [(8, 2)],
+    "飛香落ち": [(8, 2), (1, 1)],
+    "二枚落ち": [(8, 2), (2, 2)],
+    "四枚落ち": [(8, 2), (2, 2), (1, 1), (9, 1)],
+    "六枚落ち": [(8, 2), (2, 2), (1, 1), (9, 1), (2, 1), (8, 1)],
+    "八枚落ち": [(8, 2), (2, 2), (1, 1), (9, 1), (2, 1), (8, 1), (3, 1), (7, 1)],
+    "十枚落ち": [(8, 2), (2, 2), (1, 1), (9, 1), (2, 1), (8, 1), (3, 1), (7, 1), (4, 1), (6, 1)],
+}
+
+# -----------------------------
+# 局面
+# -----------------------------
+class Position:
+    """
+    board : 81要素（先手の駒は正、後手の駒は負、空は 0）
+    hands : [先手, 後手] それぞれ [歩,香,桂,銀,角,飛,金] の枚数
+    side  : 手番 0=先手 / 1=後手
+    key   : 64bit Zobrist ハッシュ
+    """
+    __slots__ = ("board", "hands", "side", "key")
+
+    def __init__(self, board=None, hands=None, side: int = 0):
+        self.board = list(board) if board is not None else _hirate_board()
+        self.hands = [list(h) for h in hands] if hands is not None else [[0] * 7, [0] * 7]
+        self.side = side
+        self.key = self.compute_key()
+
+    @classmethod
+    def from_game(cls, game):
+        """KifGame の開始局面（盤面図 → 手合割 → 平手 の順）"""
+        if game.initial is not None:
+            board, hands = game.initial
+            return cls(board, hands, game.first_side)
+        board = _hirate_board()
+        for f, r in HANDICAPS.get(game.header.get("手合割", "").strip(), []):
+            board[square(f, r)] = 0
+        return cls(board, None, game.first_side)
+
+    def copy(self):
+        pos = Position.__new__(Position)
+        pos.board = self.board[:]
+        pos.hands = [self.hands[0][:], self.hands[1][:]]
+        pos.side = self.side
+        pos.key = self.key
+        return pos
+
+    def compute_key(self) -> int:
+        key = 0
+        for sq, piece in enumerate(self.board):
+            if piece:
+                key ^= ZOBRIST_BOARD[sq][_pidx(piece)]
+        for side in (0, 1):
+            for k, n in enumerate(self.hands[side]):
+                if n:
+                    key ^= ZOBRIST_HAND[side][k][min(n, HAND_MAX)]
+        if self.side:
+            key ^= ZOBRIST_SIDE
+        return key
+
+    def _hand_add(self, side: int, kind: int, delta: int):
+        hand = self.hands[side]
+        k = kind - 1
+        n = hand[k]
+        zh = ZOBRIST_HAND[side][k]
+        self.key ^= zh[min(n, HAND_MAX)] ^ zh[min(n + delta, HAND_MAX)]
+        hand[k] = n + delta
+
+    def apply(self, code: int) -> bool:
+        """
+        指し手を適用する。盤面と食い違う手（移動元が空・手番違い・持駒なし）なら何もせず False。
+        """
+        board = self.board
+        side = self.side
+        sign = -1 if side else 1
+        to_sq = move_to(code)
+        frm = move_from(code)
+        if frm > DROP_BASE:
+            kind = frm - DROP_BASE
+            if self.hands[side][kind - 1] <= 0 or board[to_sq]:
+                return False
+            self._hand_add(side, kind, -1)
+            piece = sign * kind
+        else:
+            piece = board[frm]
+            captured = board[to_sq]
+            if piece * sign <= 0 or captured * sign > 0:
+                return False
+            board[frm] = 0
+            self.key ^= ZOBRIST_BOARD[frm][_pidx(piece)]
+            if captured:
+                self.key ^= ZOBRIST_BOARD[to_sq][_pidx(captured)]
+                kind = abs(captured)
+                if kind > PROMOTE:
+                    kind -= PROMOTE
+                if kind != OU:
+                    self._hand_add(side, kind, 1)
+            if is_promote(code) and abs(piece) < KI:
+                piece += sign * PROMOTE
+        board[to_sq] = piece
+        self.key ^= ZOBRIST_BOARD[to_sq][_pidx(piece)] ^ ZOBRIST_SIDE
+        self.side = 1 - side
+        return True
+
+    # -----------------------------
+    # SFEN
+    # -----------------------------
+    def sfen(self, ply: int = 1) -> str:
+        rows = []
+        for r in range(1, 10):
+            row, empty = "", 0
+            for f in range(9, 0, -1):
+                piece = self.board[square(f, r)]
+                if not piece:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += _SFEN_PIECE[piece]
+            rows.append(row + (str(empty) if empty else ""))
+        hand = ""
+        for side in (0, 1):
+            for kind in _SFEN_HAND_ORDER:
+                n = self.hands[side][kind - 1]
+                if n:
+                    letter = _SFEN_LETTER[kind]
+                    hand += (str(n) if n > 1 else "") + (letter if side == 0 else letter.lower())
+        return f"{'/'.join(rows)} {'w' if self.side else 'b'} {hand or '-'} {ply}"
+
+    @classmethod
+    def from_sfen(cls, sfen: str):
+        parts = sfen.strip().split()
+        if parts and parts[0] == "sfen":
+            parts = parts[1:]
+        if len(parts) < 3:
+            raise ValueError(f"SFEN が不正です: {sfen!r}")
+        board = [0] * 81
+        ranks = parts[0].split("/")
+        if len(ranks) != 9:
+            raise ValueError(f"SFEN の段数が不正です: {sfen!r}")
+        for r, row in enumerate(ranks, start=1):
+            f, promoted = 9, False
+            for ch in row:
+                if ch.isdigit():
+                    f -= int(ch)
+                elif ch == "+":
+                    promoted = True
+                else:
+                    kind = _LETTER_KIND[ch.upper()] + (PROMOTE if promoted else 0)
+                    board[square(f, r)] = kind if ch.isupper() else -kind
+                    f -= 1
+                    promoted = False
+        hands = [[0] * 7, [0] * 7]
+        if parts[2] != "-":
+            n = ""
+            for ch in parts[2]:
+                if ch.isdigit():
+                    n += ch
+                    continue
+                hands[0 if ch.isupper() else 1][_LETTER_KIND[ch.upper()] - 1] += int(n or 1)
+                n = ""
+        return cls(board, hands, 1 if parts[1] == "w" else 0)
+
+_SFEN_LETTER = {FU: "P", KY: "L", KE: "N", GI: "S", KA: "B", HI: "R", KI: "G", OU: "K"}
+_LETTER_KIND = {v: k for k, v in _SFEN_LETTER.items()}
+_SFEN_HAND_ORDER = (HI, KA, KI, GI, KE, KY, FU)
+_SFEN_PIECE = {}
+for _kind, _letter in _SFEN_LETTER.items():
+    _SFEN_PIECE[_kind] = _letter
+    _SFEN_PIECE[-_kind] = _letter.lower()
+    if _kind < KI:
+        _SFEN_PIECE[_kind + PROMOTE] = "+" + _letter
+        _SFEN_PIECE[-_kind - PROMOTE] = "+" + _letter.lower()
+
+def replay(game, line=None):
+    """
+    手順を先頭から再生し、(手数, Position) を返すジェネレータ（同じ Position を更新しながら返す）。
+    手数 0 は開始局面。盤面と食い違う手が出たらそこで打ち切る。
+    """
+    line = line or game.main
+    if line is game.main:
+        codes = line.moves
+    else:
+        # 変化は分岐前の手を親の手順から補う
+        codes = [line.move_at(p) for p in range(game.main.start, line.last_ply + 1)]
+    pos = Position.from_game(game)
+    ply = game.main.start - 1
+    yield ply, pos
+    for code in codes:
+        if not pos.apply(code):
+            return
+        ply += 1
+        yield ply, pos
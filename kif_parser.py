@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+kif_parser.py
+- KIF 棋譜の指し手部分（"手数----指手----" 以降）を解析し、コンパクトな配列表現にする
+- 指し手 1手 = array('H') の 1要素（16bit）
+    bit 0-6  : 移動先マス 0..80（(筋-1)*9 + (段-1)。１一=0, ９九=80）
+    bit 7-13 : 移動元マス 0..80 / 駒打ちは 81..87（DROP_BASE + 駒種）
+    bit 14   : 成り
+- 動かした駒（成る前の駒種）は pieces: array('B')、消費時間(秒) は times: array('I') に並べる
+- 「同」「打」「成」「不成」、変化（"変化：N手"）、終局表示（投了・千日手など）、
+  盤面図（BOD）からの開始局面に対応
+- 使い方:
+    game = load_kif(Path("data/kif/20210212及川竹林.kif"))
+    for ply, code, piece, sec in game.main.iter_moves(): ...
+    python kif_parser.py          … data/ 全体を解析して件数と所要時間を表示
+"""
+
+import re
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from generate_kifu_list import data_dir, decode_kif_bytes, scan_kif_files, MOVES_SEPARATOR
+
+# -----------------------------
+# 駒種（成駒 = 元の駒 + PROMOTE）
+# -----------------------------
+FU, KY, KE, GI, KA, HI, KI, OU = 1, 2, 3, 4, 5, 6, 7, 8
+TO, NY, NK, NG, UM, RY = 9, 10, 11, 12, 13, 14
+PROMOTE = 8
+
+# 指し手・盤面図・持駒で使われる駒名
+PIECE_NAMES = {
+    "歩": FU, "香": KY, "桂": KE, "銀": GI, "角": KA, "飛": HI, "金": KI,
+    "玉": OU, "王": OU,
+    "と": TO, "成香": NY, "成桂": NK, "成銀": NG, "馬": UM, "龍": RY, "竜": RY,
+    "杏": NY, "圭": NK, "全": NG,
+}
+# 表示用（KIF の標準表記）
+PIECE_KIF = {
+    FU: "歩", KY: "香", KE: "桂", GI: "銀", KA: "角", HI: "飛", KI: "金", OU: "玉",
+    TO: "と", NY: "成香", NK: "成桂", NG: "成銀", UM: "馬", RY: "龍",
+}
+
+# -----------------------------
+# 指し手コード
+# -----------------------------
+DROP_BASE = 80          # 駒打ちの移動元 = DROP_BASE + 駒種（81..87）
+_FROM_SHIFT = 7
+_PROMOTE_BIT = 1 << 14
+
+def square(file: int, rank: int) -> int:
+    """筋・段（1..9）→ マス番号 0..80"""
+    return (file - 1) * 9 + (rank - 1)
+
+def square_file_rank(sq: int):
+    """マス番号 → (筋, 段)"""
+    return sq // 9 + 1, sq % 9 + 1
+
+def make_move(to_sq: int, from_sq: int, promote: bool = False) -> int:
+    return to_sq | (from_sq << _FROM_SHIFT) | (_PROMOTE_BIT if promote else 0)
+
+def make_drop(to_sq: int, piece: int) -> int:
+    return to_sq | ((DROP_BASE + piece) << _FROM_SHIFT)
+
+def move_to(code: int) -> int:
+    return code & 0x7F
+
+def move_from(code: int) -> int:
+    """移動元マス（駒打ちなら 81..87）"""
+    return (code >> _FROM_SHIFT) & 0x7F
+
+def is_drop(code: int) -> bool:
+    return move_from(code) > DROP_BASE
+
+def drop_piece(code: int) -> int:
+    return move_from(code) - DROP_BASE
+
+def is_promote(code: int) -> bool:
+    return bool(code & _PROMOTE_BIT)
+
+# -----------------------------
+# 終局表示
+# -----------------------------
+# 値: その手番の側から見た結果（"lose" = 手番側の負け / "win" = 手番側の勝ち / "draw" / None = 不明）
+END_MARKERS = {
+    "投了": "lose", "詰み": "lose", "切れ負け": "lose", "反則負け": "lose", "不戦敗": "lose",
+    "反則勝ち": "win", "入玉勝ち": "win", "不戦勝": "win",
+    "千日手": "draw", "持将棋": "draw",
+    "中断": None, "封じ手": None,
+}
+
+# -----------------------------
+# 行の正規表現
+# -----------------------------
+# 移動先（"７六" / "76"）・移動元（"77"）→ マス番号 の表引き（1手ごとの int 変換を避ける）
+_DEST_SQ = {}
+_FROM_SQ = {}
+for _f in range(1, 10):
+    for _r in range(1, 10):
+        _sq = (_f - 1) * 9 + (_r - 1)
+        _DEST_SQ["１２３４５６７８９"[_f - 1] + "一二三四五六七八九"[_r - 1]] = _sq
+        _DEST_SQ[f"{_f}{_r}"] = _sq
+        _FROM_SQ[f"{_f}{_r}"] = _sq
+
+# 例: "   1 ７六歩(77)   ( 0:07/00:00:07)" / "  32 同　桂(21)" / "  41 ４四歩打" / " 162 ９五歩打 ...+"
+# group: 1=手数 2=移動先 3=駒 4=成/不成/打 5=移動元 6,7=消費時間(分,秒)
+_MOVE_RE = re.compile(
+    r"\s*(\d+)\s+"
+    r"(?:同\s*|([１-９1-9][一二三四五六七八九1-9]))"
+    r"(成香|成桂|成銀|[歩香桂銀金角飛玉王と杏圭全馬龍竜])"
+    r"(不成|成|打)?"
+    r"(?:\((\d\d)\))?"
+    r"\s*(?:\(\s*(\d+):(\d+))?"
+)
+_SPECIAL_RE = re.compile(r"\s*(\d+)\s+(" + "|".join(END_MARKERS) + r")")
+_VARIATION_RE = re.compile(r"変化[：:]\s*(\d+)手")
+_RESULT_RE = re.compile(r"まで(\d+)手で(?:(先手|後手|下手|上手)の(勝ち|反則勝ち|反則負け))?")
+
+# -----------------------------
+# データ構造
+# -----------------------------
+class KifLine:
+    """
+    1本の手順（本譜または変化）。
+      start  : 最初の手の手数（本譜は 1）
+      parent : 分岐元の KifLine（本譜は None）
+      moves / pieces / times : 手ごとの配列（同じ添字で対応）
+      end    : 終局表示（"投了" など。無ければ ""）
+    """
+    __slots__ = ("start", "parent", "moves", "pieces", "times", "end")
+
+    def __init__(self, start: int = 1, parent=None):
+        self.start = start
+        self.parent = parent
+        self.moves = array("H")
+        self.pieces = array("B")
+        self.times = array("I")
+        self.end = ""
+
+    def __len__(self):
+        return len(self.moves)
+
+    @property
+    def last_ply(self) -> int:
+        return self.start + len(self.moves) - 1
+
+    def move_at(self, ply: int) -> int | None:
+        """手数 ply の指し手コード（分岐前の手は親の手順から引く）"""
+        line = self
+        while line is not None:
+            if line.start <= ply <= line.last_ply:
+                return line.moves[ply - line.start]
+            if ply >= line.start:
+                return None
+            line = line.parent
+        return None
+
+    def iter_moves(self):
+        """(手数, 指し手コード, 駒種, 消費秒) を順に返す"""
+        for i in range(len(self.moves)):
+            yield self.start + i, self.moves[i], self.pieces[i], self.times[i]
+
+class KifGame:
+    """
+    1局分の解析結果。
+      header       : 指し手より前の "項目：値" 行（最初に現れた値）
+      lines        : [本譜, 変化1, 変化2, ...]
+      first_side   : 初手の手番 0=先手(下手) / 1=後手(上手)
+      initial      : 盤面図（BOD）があれば (board, hands)。board は 81要素の array('b')
+                     （先手の駒は正、後手の駒は負）、hands は [先手7種, 後手7種]（歩〜金の枚数）
+      winner       : 0=先手 / 1=後手 / None（引き分け・中断・不明）
+      skipped      : 解釈できなかった指し手部の行数（コメント行は数えない）
+    """
+    __slots__ = ("header", "lines", "first_side", "initial", "winner", "skipped")
+
+    def __init__(self):
+        self.header = {}
+        self.lines = [KifLine()]
+        self.first_side = 0
+        self.initial = None
+        self.winner = None
+        self.skipped = 0
+
+    @property
+    def main(self) -> KifLine:
+        return self.lines[0]
+
+    @property
+    def end(self) -> str:
+        return self.main.end
+
+    def side_to_move(self, ply: int) -> int:
+        """手数 ply を指す側（0=先手 / 1=後手）"""
+        return self.first_side ^ ((ply - self.main.start) & 1)
+
+# -----------------------------
+# 盤面図（BOD）
+# -----------------------------
+_KAN_NUM = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+def _parse_count(s: str) -> int:
+    """持駒の枚数（"" → 1, "二" → 2, "十八" → 18）"""
+    if not s:
+        return 1
+    if s.startswith("十"):
+        return 10 + _KAN_NUM.get(s[1:], 0)
+    return _KAN_NUM.get(s, 1)
+
+def parse_hands(value: str):
+    """'角　銀二' → [歩,香,桂,銀,角,飛,金] の枚数"""
+    counts = [0] * 7
+    for tok in value.replace("　", " ").split():
+        if tok == "なし":
+            continue
+        kind = PIECE_NAMES.get(tok[0])
+        if kind and kind <= KI:
+            counts[kind - 1] += _parse_count(tok[1:])
+    return counts
+
+def _parse_board_row(line: str, rank: int, board):
+    body = line[1:line.index("|", 1)]
+    for col in range(9):
+        cell = body[col * 2:col * 2 + 2]
+        if len(cell) < 2:
+            break
+        kind = PIECE_NAMES.get(cell[1])
+        if kind:
+            board[square(9 - col, rank)] = -kind if cell[0] == "v" else kind
+
+# -----------------------------
+# 解析本体
+# -----------------------------
+def parse_kif(text: str) -> KifGame:
+    """KIF 文字列を解析して KifGame を返す"""
+    game = KifGame()
+    header = game.header
+    line = game.main
+    in_moves = False
+    board = None
+    hands = [[0] * 7, [0] * 7]
+    rank = 0
+    result_line = None
+    end_ply = None
+
+    for raw in text.splitlines():
+        if not in_moves:
+            if raw.startswith(MOVES_SEPARATOR):
+                in_moves = True
+                continue
+            if raw.startswith("|") and rank < 9:
+                if board is None:
+                    board = array("b", bytes(81))
+                rank += 1
+                _parse_board_row(raw, rank, board)
+                continue
+            if raw.startswith("後手番") or raw.startswith("上手番"):
+                game.first_side = 1
+                continue
+            key, sep, _ = raw.partition("：")
+            if sep:
+                if key not in header:
+                    header[key] = raw.strip().split("：", 1)[1]
+                if key in ("先手の持駒", "下手の持駒"):
+                    hands[0] = parse_hands(header[key])
+                elif key in ("後手の持駒", "上手の持駒"):
+                    hands[1] = parse_hands(header[key])
+                continue
+            if not _MOVE_RE.match(raw):
+                continue
+            # 区切り行の無い棋譜：最初の指し手行から指し手部とみなす
+            in_moves = True
+
+        if not raw or raw[0] in "*&#":
+            continue
+        m = _MOVE_RE.match(raw)
+        if m:
+            ply = int(m.group(1))
+            if not line.moves and line is game.main:
+                # 途中局面（盤面図）からの棋譜は 1 以外の手数で始まることがある
+                line.start = ply
+            elif ply != line.start + len(line.moves):
+                # 手数の飛び・重複は読まない（本譜の整合を優先）
+                game.skipped += 1
+                continue
+            _append_move(line, ply, m.groups())
+            continue
+        m = _SPECIAL_RE.match(raw)
+        if m:
+            line.end = m.group(2)
+            if line is game.main:
+                end_ply = int(m.group(1))   # 勝者は手番（first_side）が決まってから出す
+            continue
+        m = _VARIATION_RE.match(raw)
+        if m:
+            line = _open_variation(game, int(m.group(1)))
+            continue
+        m = _RESULT_RE.match(raw)
+        if m:
+            if m.group(2):
+                result_line = m
+            continue
+        if raw.strip():
+            game.skipped += 1
+
+    if board is not None:
+        game.initial = (board, hands)
+    elif header.get("手合割", "平手").strip() not in ("", "平手"):
+        # 駒落ちは上手（後手）から指す
+        game.first_side = 1
+    if end_ply is not None:
+        outcome = END_MARKERS[game.end]
+        mover = game.side_to_move(end_ply)
+        if outcome == "lose":
+            game.winner = 1 - mover
+        elif outcome == "win":
+            game.winner = mover
+    if game.winner is None and result_line is not None and not game.end:
+        side = 0 if result_line.group(2) in ("先手", "下手") else 1
+        game.winner = side if result_line.group(3) != "反則負け" else 1 - side
+    return game
+
+def _append_move(line: KifLine, ply: int, groups):
+    _, dest, name, modifier, frm, mm, ss = groups
+    if dest:
+        to_sq = _DEST_SQ[dest]
+    else:
+        # 「同」: 直前の手の移動先
+        prev = line.moves[-1] if line.moves else line.move_at(ply - 1)
+        to_sq = prev & 0x7F if prev is not None else 0
+    piece = PIECE_NAMES[name]
+    if modifier == "打" or frm is None:
+        code = to_sq | ((DROP_BASE + piece) << _FROM_SHIFT)
+    else:
+        code = to_sq | (_FROM_SQ[frm] << _FROM_SHIFT)
+        if modifier == "成":
+            code |= _PROMOTE_BIT
+    line.moves.append(code)
+    line.pieces.append(piece)
+    line.times.append(int(mm) * 60 + int(ss) if mm else 0)
+
+def _open_variation(game: KifGame, ply: int) -> KifLine:
+    """"変化：N手" を、手数 N を含む直近の手順からの分岐として開く"""
+    for parent in reversed(game.lines):
+        if parent.start <= ply <= parent.last_ply:
+            break
+    else:
+        parent = game.main
+    var = KifLine(start=ply, parent=parent)
+    game.lines.append(var)
+    return var
+
+def parse_kif_bytes(data: bytes) -> KifGame:
+    text, _ = decode_kif_bytes(data)
+    return parse_kif(text)
+
+def load_kif(path: Path) -> KifGame:
+    return parse_kif_bytes(Path(path).read_bytes())
+
+# -----------------------------
+# 表示用
+# -----------------------------
+def move_to_kif(code: int, piece: int, prev_to: int | None = None) -> str:
+    """指し手コード → KIF 表記（例: ７六歩(77) / 同　銀(31) / ４四歩打 / ２二角成(88)）"""
+    to_sq = move_to(code)
+    if prev_to is not None and prev_to == to_sq:
+        dest = "同　"
+    else:
+        f, r = square_file_rank(to_sq)
+        dest = "１２３４５６７８９"[f - 1] + "一二三四五六七八九"[r - 1]
+    if is_drop(code):
+        return f"{dest}{PIECE_KIF[piece]}打"
+    f, r = square_file_rank(move_from(code))
+    promo = "成" if is_promote(code) else ""
+    return f"{dest}{PIECE_KIF[piece]}{promo}({f}{r})"
+
+_USI_DROP = {FU: "P", KY: "L", KE: "N", GI: "S", KA: "B", HI: "R", KI: "G"}
+
+def move_to_usi(code: int) -> str:
+    """指し手コード → USI 表記（例: 7g7f / 8h2b+ / P*5e）"""
+    f, r = square_file_rank(move_to(code))
+    dest = f"{f}{'abcdefghi'[r - 1]}"
+    if is_drop(code):
+        return f"{_USI_DROP[drop_piece(code)]}*{dest}"
+    ff, fr = square_file_rank(move_from(code))
+    return f"{ff}{'abcdefghi'[fr - 1]}{dest}{'+' if is_promote(code) else ''}"
+
+# -----------------------------
+# コーパス全体の解析（動作確認・計測用）
+# -----------------------------
+def main(argv=None):
+    paths = [Path(a) for a in (argv if argv is not None else sys.argv[1:])]
+    if not paths:
+        paths = [p for _, p in scan_kif_files(data_dir)]
+    t0 = time.perf_counter()
+    n_games = n_moves = n_vars = n_skipped = 0
+    for p in paths:
+        game = load_kif(p)
+        n_games += 1
+        n_moves += len(game.main)
+        n_vars += len(game.lines) - 1
+        n_skipped += game.skipped
+    dt = time.perf_counter() - t0
+    print(f"[INFO] parsed {n_games} games / {n_moves} moves / {n_vars} variations "
+          f"(skipped lines: {n_skipped}) in {dt:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+kifu_convert.py
+- data/ の全棋譜を CSA / SFEN・USI / KIF2 に変換し、1局1行の NDJSON で書き出す
+    python kifu_convert.py -o data/kifu.ndjson
+    python kifu_convert.py --dir 小山怜央プロ棋譜録 --format usi,csa | 解析ツール
+  1局ずつ読んで変換し、すぐ1行書く（全体をメモリに持たない）
+- 1行 = {"dir", "file", "title", "date", "players", "header": {KIF のヘッダ項目},
+         "moves": 手数, "end": 終局表示, "sfen": 開始局面, "usi": "position ... moves ...",
+         "csa": CSA V2.2 の全文, "kif2": "▲７六歩 △３四歩 ..."}
+  （--format で usi / csa / kif2 を選べる。sfen と基本項目は常に出力）
+- 本譜のみ。盤面と食い違う手が出たら、そこまでを変換する（"moves" が元の手数より少なくなる）
+- KIF2 の「右・左・直・上・引・寄・打」は、同じ駒で同じマスへ行ける駒があるときだけ付ける
+  （利きは王手放置・ピンを考えない疑似合法手で判定）
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+from generate_kifu_list import output_json
+from generate_kifu_pack import iter_games
+from kif_board import Position
+from kif_parser import (parse_kif_bytes, move_to, move_from, is_drop, drop_piece, is_promote,
+                        move_to_usi, square, square_file_rank, PIECE_KIF, PROMOTE,
+                        FU, KY, KE, GI, KA, HI, KI, OU, TO, NY, NK, NG, UM, RY)
+
+FORMATS = ("usi", "csa", "kif2")
+
+# -----------------------------
+# 駒の利き（先手から見た (筋の差, 段の差)。前 = 段が減る方向）
+# -----------------------------
+_GOLD = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (0, 1))
+_KING = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+_DIAG = ((-1, -1), (1, -1), (-1, 1), (1, 1))
+_ORTHO = ((0, -1), (-1, 0), (1, 0), (0, 1))
+_STEPS = {
+    FU: ((0, -1),), KE: ((-1, -2), (1, -2)), GI: ((-1, -1), (0, -1), (1, -1), (-1, 1), (1, 1)),
+    KI: _GOLD, TO: _GOLD, NY: _GOLD, NK: _GOLD, NG: _GOLD, OU: _KING,
+    UM: _ORTHO, RY: _DIAG,
+}
+_SLIDES = {KY: ((0, -1),), KA: _DIAG, HI: _ORTHO, UM: _DIAG, RY: _ORTHO}
+_GOLD_LIKE = (GI, KI, TO, NY, NK, NG)
+
+def can_reach(board, frm: int, to: int, kind: int, side: int) -> bool:
+    """side の駒 kind が frm から to へ動けるか（疑似合法）"""
+    ff, fr = square_file_rank(frm)
+    tf, tr = square_file_rank(to)
+    df, dr = tf - ff, tr - fr
+    if side:
+        df, dr = -df, -dr
+    if (df, dr) in _STEPS.get(kind, ()):
+        return True
+    for sf, sr in _SLIDES.get(kind, ()):
+        n = max(abs(df), abs(dr))
+        if n == 0 or (df, dr) != (sf * n, sr * n):
+            continue
+        step = -1 if side else 1
+        return all(not board[square(ff + sf * i * step, fr + sr * i * step)] for i in range(1, n))
+    return False
+
+# -----------------------------
+# KIF2
+# -----------------------------
+_ZEN_FILE = "１２３４５６７８９"
+_KAN_RANK = "一二三四五六七八九"
+
+def _vertical(frm: int, to: int, side: int) -> str:
+    dr = square_file_rank(to)[1] - square_file_rank(frm)[1]
+    if side:
+        dr = -dr
+    return "上" if dr < 0 else "引" if dr > 0 else "寄"
+
+def kif2_relative(board, code: int, side: int) -> str:
+    """同じ駒で同じマスへ行ける駒があるときの区別（"右" / "直" / "打" など。無ければ ""）"""
+    to = move_to(code)
+    sign = -1 if side else 1
+    if is_drop(code):
+        kind = drop_piece(code)
+        others = [sq for sq in range(81)
+                  if board[sq] == sign * kind and can_reach(board, sq, to, kind, side)]
+        return "打" if others else ""
+    frm = move_from(code)
+    kind = abs(board[frm])
+    others = [sq for sq in range(81)
+              if sq != frm and board[sq] == sign * kind and can_reach(board, sq, to, kind, side)]
+    if not others:
+        return ""
+    mine = _vertical(frm, to, side)
+    same = [sq for sq in others if _vertical(sq, to, side) == mine]
+    if not same:
+        return mine
+    # 金・銀（成駒含む）がまっすぐ上がる手は「直」
+    if kind in _GOLD_LIKE and mine == "上" and square_file_rank(frm)[0] == square_file_rank(to)[0]:
+        return "直"
+    # 右・左は指す側から見る（先手は筋の小さい方が右）。全体で決まらなければ上・引・寄と組み合わせる
+    def side_word(group):
+        x = lambda sq: square_file_rank(sq)[0] * (1 if side else -1)
+        if x(frm) > max(x(sq) for sq in group):
+            return "右"
+        if x(frm) < min(x(sq) for sq in group):
+            return "左"
+        return ""
+    return side_word(others) or side_word(same) + mine
+
+def _can_promote(kind: int, frm: int, to: int, side: int) -> bool:
+    if kind not in (FU, KY, KE, GI, KA, HI):
+        return False
+    zone = (lambda r: r <= 3) if side == 0 else (lambda r: r >= 7)
+    return zone(square_file_rank(frm)[1]) or zone(square_file_rank(to)[1])
+
+# -----------------------------
+# 変換
+# -----------------------------
+_CSA_PIECE = {FU: "FU", KY: "KY", KE: "KE", GI: "GI", KA: "KA", HI: "HI", KI: "KI", OU: "OU",
+              TO: "TO", NY: "NY", NK: "NK", NG: "NG", UM: "UM", RY: "RY"}
+_CSA_END = {"投了": "%TORYO", "詰み": "%TSUMI", "千日手": "%SENNICHITE", "持将棋": "%JISHOGI",
+            "中断": "%CHUDAN", "切れ負け": "%TIME_UP", "反則負け": "%ILLEGAL_MOVE", "入玉勝ち": "%KACHI"}
+_CSA_HAND_ORDER = (HI, KA, KI, GI, KE, KY, FU)
+_WEEKDAY_RE = re.compile(r"\s*[(（][日月火水木金土][)）]")
+
+def _csa_position(pos: Position) -> list:
+    lines = []
+    for r in range(1, 10):
+        row = f"P{r}"
+        for f in range(9, 0, -1):
+            piece = pos.board[square(f, r)]
+            row += " * " if not piece else ("+" if piece > 0 else "-") + _CSA_PIECE[abs(piece)]
+        lines.append(row)
+    for side, mark in ((0, "+"), (1, "-")):
+        hand = "".join(f"00{_CSA_PIECE[k]}" * pos.hands[side][k - 1] for k in _CSA_HAND_ORDER)
+        if hand:
+            lines.append(f"P{mark}{hand}")
+    lines.append("-" if pos.side else "+")
+    return lines
+
+def convert_game(game, formats=FORMATS) -> dict:
+    """KifGame → {"moves", "end", "sfen", "usi"?, "csa"?, "kif2"?}"""
+    line = game.main
+    pos = Position.from_game(game)
+    start_sfen = pos.sfen(line.start)
+    standard = start_sfen == Position().sfen(1)
+    csa = []
+    if "csa" in formats:
+        h = game.header
+        csa = ["V2.2", f"N+{h.get('先手', h.get('下手', ''))}", f"N-{h.get('後手', h.get('上手', ''))}"]
+        if h.get("棋戦"):
+            csa.append(f"$EVENT:{h['棋戦']}")
+        if h.get("場所"):
+            csa.append(f"$SITE:{h['場所']}")
+        start = _WEEKDAY_RE.sub("", h.get("開始日時", "") or h.get("対局日", "")).strip()
+        if start:
+            csa.append(f"$START_TIME:{start}")
+        csa.extend(["PI", "+"] if standard else _csa_position(pos))
+
+    usi, kif2 = [], []
+    prev_to = None
+    n = 0
+    for i, code in enumerate(line.moves):
+        side = pos.side
+        to = move_to(code)
+        if is_drop(code):
+            kind, after = drop_piece(code), drop_piece(code)
+        else:
+            kind = abs(pos.board[move_from(code)])
+            after = kind + PROMOTE if is_promote(code) and kind < KI else kind
+        if "kif2" in formats and kind:
+            if prev_to == to:
+                dest = "同　"
+            else:
+                f, r = square_file_rank(to)
+                dest = _ZEN_FILE[f - 1] + _KAN_RANK[r - 1]
+            promo = ""
+            if not is_drop(code) and _can_promote(kind, move_from(code), to, side):
+                promo = "成" if is_promote(code) else "不成"
+            rel = kif2_relative(pos.board, code, side)
+            kif2.append(f"{'△' if side else '▲'}{dest}{PIECE_KIF[kind]}{rel}{promo}")
+        if not pos.apply(code):
+            if kif2 and len(kif2) > n:
+                kif2.pop()
+            break
+        n += 1
+        usi.append(move_to_usi(code))
+        if csa:
+            f, r = square_file_rank(to)
+            src = "00" if is_drop(code) else "%d%d" % square_file_rank(move_from(code))
+            csa.append(f"{'-' if side else '+'}{src}{f}{r}{_CSA_PIECE[after]}")
+            csa.append(f"T{line.times[i]}")
+        prev_to = to
+
+    end = line.end if n == len(line.moves) else ""
+    out = {"moves": n, "end": end, "sfen": start_sfen}
+    if "usi" in formats:
+        head = "position startpos" if standard else f"position sfen {start_sfen}"
+        out["usi"] = head + (" moves " + " ".join(usi) if usi else "")
+    if csa:
+        if end in _CSA_END:
+            csa.append(_CSA_END[end])
+        out["csa"] = "\n".join(csa) + "\n"
+    if "kif2" in formats:
+        out["kif2"] = " ".join(kif2)
+    return out
+
+def convert_entries(entries, out, formats=FORMATS) -> int:
+    """エントリ順に1局ずつ変換して out（テキストストリーム）へ1行ずつ書く。戻り値: 局数"""
+    n = 0
+    for e, data in iter_games(entries):
+        game = parse_kif_bytes(data)
+        rec = {"dir": e["dir"], "file": e["file"], "title": e["title"], "date": e["date"],
+               "players": e.get("players", ""), "header": game.header}
+        rec.update(convert_game(game, formats))
+        out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        n += 1
+    return n
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="全棋譜を CSA / USI / KIF2 に変換して NDJSON で書き出す")
+    ap.add_argument("-o", "--output", type=Path, help="出力先（省略時は標準出力）")
+    ap.add_argument("--format", default=",".join(FORMATS),
+                    help=f"出力する形式（カンマ区切り。既定 {','.join(FORMATS)}）")
+    ap.add_argument("--dir", "-d", action="append", default=[], help="この分類だけ（複数可）")
+    args = ap.parse_args(argv)
+
+    formats = tuple(f.strip() for f in args.format.split(",") if f.strip())
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        ap.error(f"未対応の形式: {', '.join(sorted(unknown))}")
+    entries = json.loads(output_json.read_text(encoding="utf-8"))
+    if args.dir:
+        entries = [e for e in entries if e["dir"] in args.dir]
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="\n") as f:
+            n = convert_entries(entries, f, formats)
+        print(f"✅ {args.output} に {n} 局を書き出しました。", file=sys.stderr)
+    else:
+        convert_entries(entries, sys.stdout, formats)
+
+if __name__ == "__main__":
+    main()
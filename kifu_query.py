@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+kifu_query.py
+- generate_kifu_list.py --sqlite が作る data/kifu.sqlite を引く小さな CLI
+    python kifu_query.py --player 田内 --from 2024-01-01
+    python kifu_query.py --title 王座戦 --dir kif2026 --count
+    python kifu_query.py --sql "SELECT place, count(*) FROM games GROUP BY place ORDER BY 2 DESC"
+- 対局者/棋戦名の語は index.html の検索と同じ正規化をかけて games_fts の *_norm 列と照合する
+  （3文字以上は FTS5 trigram の MATCH、2文字以下は LIKE）。複数指定はすべてを含むもの
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+from generate_kifu_list import sqlite_db
+from generate_index_with_search import norm_players, norm_title
+
+OUTPUT_COLUMNS = ("date", "dir", "file", "title", "players")
+
+def _term_clause(column: str, term: str):
+    """games_fts の1列に対する条件（SQL, 引数）"""
+    if len(term) >= 3:
+        return f"{column} MATCH ?", '"' + term.replace('"', '""') + '"'
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{column} LIKE ? ESCAPE '\\'", f"%{escaped}%"
+
+def build_query(players=(), titles=(), dirs=(), date_from=None, date_to=None,
+                columns=OUTPUT_COLUMNS, limit: int | None = None):
+    """条件から (SQL, 引数) を作る。新しい対局から順"""
+    where, params = [], []
+    for column, terms, norm in (("players_norm", players, norm_players), ("title_norm", titles, norm_title)):
+        for t in terms:
+            t = norm(t)
+            if not t:
+                continue
+            clause, arg = _term_clause(column, t)
+            where.append(f"id IN (SELECT rowid FROM games_fts WHERE {clause})")
+            params.append(arg)
+    if dirs:
+        where.append(f"dir IN ({', '.join('?' * len(dirs))})")
+        params.extend(dirs)
+    if date_from:
+        where.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date <> '' AND date <= ?")
+        params.append(date_to)
+    sql = f"SELECT {', '.join(columns)} FROM games"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY date DESC, dir, file"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="data/kifu.sqlite（generate_kifu_list.py --sqlite）を検索する")
+    ap.add_argument("--player", "-p", action="append", default=[], help="対局者（複数指定で両方を含む対局）")
+    ap.add_argument("--title", "-t", action="append", default=[], help="棋戦名に含まれる語（複数可）")
+    ap.add_argument("--dir", "-d", action="append", default=[], help="分類（複数可）")
+    ap.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", help="この日以降")
+    ap.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", help="この日以前（日付不明は除く）")
+    ap.add_argument("--limit", "-n", type=int, default=100, help="最大件数（0 で無制限。既定 100）")
+    ap.add_argument("--count", action="store_true", help="件数だけを表示する")
+    ap.add_argument("--json", action="store_true", help="JSON Lines で出力する")
+    ap.add_argument("--sql", help="任意の SQL をそのまま実行する（games / games_fts）")
+    ap.add_argument("--db", type=Path, default=sqlite_db, help=f"データベース（既定 {sqlite_db}）")
+    args = ap.parse_args(argv)
+
+    if not args.db.exists():
+        sys.exit(f"[ERROR] {args.db} がありません。先に python generate_kifu_list.py --sqlite を実行してください")
+    con = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+
+    if args.sql:
+        cur = con.execute(args.sql)
+        names = [d[0] for d in cur.description or ()]
+        rows = cur.fetchall()
+    else:
+        sql, params = build_query(args.player, args.title, args.dir, args.date_from, args.date_to,
+                                  limit=None if args.count else args.limit)
+        if args.count:
+            sql = f"SELECT count(*) AS n FROM ({sql})"
+        cur = con.execute(sql, params)
+        names = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+    con.close()
+
+    for row in rows:
+        if args.json:
+            print(json.dumps(dict(zip(names, row)), ensure_ascii=False))
+        else:
+            print("\t".join("" if v is None else str(v) for v in row))
+    if not args.json and not args.count and not args.sql:
+        print(f"[INFO] {len(rows)} 件", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+kifu_server.py
+- 静的ページが重くなったとき用の、ローカル専用の検索サーバ（標準ライブラリの asyncio だけで動く）
+    python kifu_server.py [--port 8765] [--host 127.0.0.1]
+  http://localhost:8765/ を開くと、検索をサーバに問い合わせる版の index.html（--api と同じ）を返す
+- data/kifu_list.json を1回読み込み、メモリ上に索引を持つ
+  * タイトル/対局者: generate_index_with_search.py と同じ正規化 + 文字 bigram の転置索引（index.html と同じ結果）
+  * 分類 → 行番号、日付順・タイトル順などの並び（build_sort_orders）
+  kifu_list.json が更新されたら次の要求で読み直す（結果キャッシュも捨てる）
+- API（JSON。CORS 許可）
+  * GET /api/search?t=タイトル語&p=対局者語&dir=分類&from=YYYY-MM-DD&to=YYYY-MM-DD&sort=date_desc&limit=50&offset=0
+      → {"rows": 全行数, "total": 件数, "ids": [行番号...] or null（条件なし）, "items": [{date,title,players,dir,file}...]}
+      行番号は index.html の行（data-i）と同じ。ids は昇順、items は sort の順
+  * GET /api/stats → 要求数・レイテンシ（p50/p90/p99, ms）・キャッシュのヒット率
+- それ以外のパスはリポジトリ直下の静的ファイル（viewer.html・data/ など。Range 要求にも対応）
+  * --root public で generate_publish.py の出力を配信する。x.gz / x.br があれば Accept-Encoding に合わせてそれを返す
+    / も public/index.html（指紋付きの参照・sw.js の登録入り）を返す
+  * 指紋付きの名前（kifu_list.<hash>.json など）は Cache-Control: immutable、それ以外は no-cache（毎回再検証）
+- 終了時（Ctrl+C）にレイテンシの分位点を表示する
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import time
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from generate_kifu_list import base_dir, output_json
+from generate_publish import is_fingerprinted
+from generate_index_with_search import (build_html, build_search_index, build_sort_orders, bigrams,
+                                        clean_name_for_search, load_sorted_items, nfkc_lower,
+                                        to_katakana, SEARCH_JSON)
+
+DEFAULT_PORT = 8765
+CACHE_SIZE = 256
+LATENCY_WINDOW = 10000   # 分位点を計算する直近の要求数
+API_PATH = "/api/search"
+MAX_HEADER_BYTES = 16 * 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# -----------------------------
+# 索引と検索
+# -----------------------------
+def _intersect(a, b):
+    """昇順の行番号リストの積集合"""
+    out = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i] == b[j]:
+            out.append(a[i])
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+def tokens_from_title(s: str):
+    """JS の tokensFromTitleInput と同じ"""
+    return nfkc_lower(s).replace("　", " ").split()
+
+def tokens_from_players(s: str):
+    """JS の tokensFromPlayersInput と同じ"""
+    return to_katakana(clean_name_for_search(s)).replace("　", " ").split()
+
+class KifuIndex:
+    """kifu_list.json 1回分の索引。search() は同じ条件なら LRU キャッシュから返す"""
+
+    def __init__(self, items):
+        self.items = items
+        idx = build_search_index(items)
+        self.titles, self.players = idx["t"], idx["p"]
+        self.title_index, self.player_index = idx["ti"], idx["pi"]
+        self.sorts = build_sort_orders(items)
+        self.by_dir = {}
+        for i, it in enumerate(items):
+            self.by_dir.setdefault(it["dir"] or "", []).append(i)
+        self.search = lru_cache(maxsize=CACHE_SIZE)(self._search)
+
+    def _lookup(self, tok: str, norm, index):
+        if len(tok) < 2:
+            return [i for i, s in enumerate(norm) if tok in s]
+        ids = None
+        for bg in bigrams(tok):
+            post = index.get(bg)
+            if not post:
+                return []
+            ids = post if ids is None else _intersect(ids, post)
+            if not ids:
+                return []
+        return [i for i in ids if tok in norm[i]]
+
+    def _search(self, t_tokens: tuple, p_tokens: tuple, dir_: str | None, date_from: str, date_to: str):
+        """条件に合う行番号（昇順のタプル）。語も絞り込みも無ければ None"""
+        ids = None
+        for tok in t_tokens:
+            hit = self._lookup(tok, self.titles, self.title_index)
+            ids = hit if ids is None else _intersect(ids, hit)
+        for tok in p_tokens:
+            hit = self._lookup(tok, self.players, self.player_index)
+            ids = hit if ids is None else _intersect(ids, hit)
+        if dir_ is not None:
+            in_dir = self.by_dir.get(dir_, [])
+            ids = in_dir if ids is None else _intersect(ids, in_dir)
+        if date_from or date_to:
+            rng = range(len(self.items)) if ids is None else ids
+            ids = [i for i in rng
+                   if (not date_from or self.items[i]["date"] >= date_from)
+                   and (not date_to or "" < self.items[i]["date"] <= date_to)]
+        return None if ids is None else tuple(ids)
+
+    def query(self, params: dict) -> dict:
+        get = lambda k, d="": (params.get(k) or [d])[0]
+        dir_ = params["dir"][0] if "dir" in params else None
+        ids = self.search(tuple(tokens_from_title(get("t"))), tuple(tokens_from_players(get("p"))),
+                          dir_, get("from"), get("to"))
+        limit = max(0, int(get("limit", "50") or 0))
+        offset = max(0, int(get("offset", "0") or 0))
+        order = self.sorts.get(get("sort", "date_desc"), self.sorts["date_desc"])
+        total = len(self.items) if ids is None else len(ids)
+        items = []
+        if limit:
+            hit = None if ids is None else set(ids)
+            picked = [i for i in order if hit is None or i in hit][offset:offset + limit]
+            items = [dict(self.items[i], i=i) for i in picked]
+        return {"rows": len(self.items), "total": total,
+                "ids": None if ids is None else list(ids), "items": items}
+
+# -----------------------------
+# HTTP
+# -----------------------------
+def percentiles(samples, qs=(50, 90, 99)):
+    if not samples:
+        return {f"p{q}": None for q in qs}
+    s = sorted(samples)
+    return {f"p{q}": round(s[min(len(s) - 1, int(len(s) * q / 100))], 3) for q in qs}
+
+class KifuServer:
+    def __init__(self, root=base_dir, data_json=output_json):
+        self.root = root.resolve()
+        self.data_json = data_json
+        self.index = None
+        self.index_mtime = None
+        self.page = b""
+        self.search_json = b""
+        self.latency = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+
+    def current_index(self) -> KifuIndex:
+        """kifu_list.json が変わっていれば読み直す"""
+        mtime = self.data_json.stat().st_mtime_ns
+        if self.index is None or mtime != self.index_mtime:
+            items = load_sorted_items(self.data_json)
+            self.index = KifuIndex(items)
+            self.index_mtime = mtime
+            self.page = build_html(items, api=API_PATH).encode("utf-8")
+            self.search_json = json.dumps(build_search_index(items), ensure_ascii=False,
+                                          separators=(",", ":")).encode("utf-8")
+        return self.index
+
+    def stats(self) -> dict:
+        info = self.current_index().search.cache_info()
+        lookups = info.hits + info.misses
+        return {"requests": self.requests, "latency_ms": percentiles(self.latency),
+                "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize,
+                          "hit_rate": round(info.hits / lookups, 3) if lookups else None}}
+
+    def route(self, path: str, query: str, headers: dict):
+        """戻り値: (status, content-type, body, 追加ヘッダ)"""
+        if path == API_PATH:
+            try:
+                body = self.current_index().query(parse_qs(query))
+            except ValueError as e:
+                return 400, "application/json", _json({"error": str(e)}), {}
+            return 200, "application/json", _json(body), {}
+        if path == "/api/stats":
+            return 200, "application/json", _json(self.stats()), {}
+        if path in ("/", "/index.html"):
+            if self.root != base_dir.resolve() and (self.root / "index.html").is_file():
+                return self.static("/index.html", headers)
+            self.current_index()
+            return 200, "text/html; charset=utf-8", self.page, {}
+        if path == "/" + SEARCH_JSON.as_posix():
+            self.current_index()
+            return 200, "application/json", self.search_json, {}
+        return self.static(path, headers)
+
+    def static(self, path: str, headers: dict):
+        target = (self.root / unquote(path).lstrip("/")).resolve()
+        # .git/ など「.」で始まるディレクトリの中身も出さない
+        if (not target.is_relative_to(self.root) or not target.is_file()
+                or any(part.startswith(".") for part in target.relative_to(self.root).parts)):
+            return 404, "text/plain; charset=utf-8", b"not found", {}
+        ctype = mimetypes.guess_type(target.name)[0] or "application/octet-stream"
+        if ctype.startswith("text/") or ctype in ("application/json", "application/javascript"):
+            ctype += "; charset=utf-8"
+        extra = {"Cache-Control": IMMUTABLE if is_fingerprinted(target.name) else "no-cache"}
+        rng = headers.get("range", "")
+        if not rng:
+            # 圧縮済みの別ファイル（generate_publish.py）があればそれを返す
+            accept = {t.split(";")[0].strip() for t in headers.get("accept-encoding", "").split(",")}
+            for enc, ext in (("br", ".br"), ("gzip", ".gz")):
+                pre = target.with_name(target.name + ext)
+                if enc in accept and pre.is_file():
+                    extra.update({"Content-Encoding": enc, "Vary": "Accept-Encoding"})
+                    return 200, ctype, pre.read_bytes(), extra
+        data = target.read_bytes()
+        if rng.startswith("bytes="):
+            start_s, _, end_s = rng[6:].split(",")[0].partition("-")
+            try:
+                if start_s:
+                    start, end = int(start_s), int(end_s) if end_s else len(data) - 1
+                else:
+                    start, end = max(0, len(data) - int(end_s)), len(data) - 1
+            except ValueError:
+                start, end = 0, -1
+            if start > end or start >= len(data):
+                return 416, "text/plain", b"", {"Content-Range": f"bytes */{len(data)}"}
+            end = min(end, len(data) - 1)
+            extra["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return 206, ctype, data[start:end + 1], extra
+        extra["Accept-Ranges"] = "bytes"
+        return 200, ctype, data, extra
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                t0 = time.perf_counter()
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    k, sep, v = line.partition(":")
+                    if sep:
+                        headers[k.strip().lower()] = v.strip()
+                url = urlsplit(target)
+                if method not in ("GET", "HEAD"):
+                    status, ctype, body, extra = 405, "text/plain", b"method not allowed", {}
+                else:
+                    status, ctype, body, extra = self.route(url.path, url.query, headers)
+                keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                out = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+                       f"Content-Type: {ctype}", f"Content-Length: {len(body)}",
+                       f"Connection: {'keep-alive' if keep else 'close'}"]
+                if url.path.startswith("/api/"):
+                    out += ["Access-Control-Allow-Origin: *", "Cache-Control: no-store"]
+                out += [f"{k}: {v}" for k, v in extra.items()]
+                writer.write(("\r\n".join(out) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                self.requests += 1
+                self.latency.append((time.perf_counter() - t0) * 1000)
+                if not keep:
+                    break
+        finally:
+            writer.close()
+
+_REASONS = {200: "OK", 206: "Partial Content", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 416: "Range Not Satisfiable"}
+
+def _json(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+async def serve(host: str, port: int, server: KifuServer):
+    srv = await asyncio.start_server(server.handle, host, port, limit=MAX_HEADER_BYTES)
+    print(f"[INFO] {len(server.current_index().items)} 件を読み込みました")
+    print(f"✅ http://{host}:{port}/ で待ち受けています（Ctrl+C で終了）")
+    async with srv:
+        await srv.serve_forever()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="kifu_list.json をメモリに載せて検索 API と静的ファイルを返すローカルサーバ")
+    ap.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス（既定 127.0.0.1）")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"ポート（既定 {DEFAULT_PORT}）")
+    ap.add_argument("--root", type=Path, default=base_dir,
+                    help="静的ファイルの置き場所（既定 リポジトリ直下。generate_publish.py の出力なら public）")
+    args = ap.parse_args(argv)
+
+    server = KifuServer(root=args.root)
+    try:
+        asyncio.run(serve(args.host, args.port, server))
+    except KeyboardInterrupt:
+        pass
+    s = server.stats()
+    lat = s["latency_ms"]
+    print(f"[INFO] requests={s['requests']} latency p50={lat['p50']}ms p90={lat['p90']}ms p99={lat['p99']}ms "
+          f"cache hit_rate={s['cache']['hit_rate']}")
+
+if __name__ == "__main__":
+    main()
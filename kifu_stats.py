@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+kifu_stats.py
+- 生成スクリプトの --stats / --profile 用の計測ヘルパー
+    stats = RunStats("generate_kifu_list")
+    with stats.stage("scan"): ...                         … 段階ごとの実時間と CPU 時間
+    stats.add_file("kif/a.kif", sec, nbytes, "parsed", "cp932")   … 1ファイルごとの解析時間
+    stats.write(Path("data/kifu_list.stats.json"))        … JSON レポート（遅いファイル上位 N 件・ピークメモリ付き）
+    with profiled(Path("kifu_list.prof")): ...            … cProfile（path が None なら何もしない）
+- CPU 時間はこのプロセス分のみ（--jobs のワーカープロセス分は入らない。ファイルごとの時間はワーカー内で測る）
+"""
+
+import cProfile
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+SLOWEST_N = 20
+
+def peak_memory_bytes() -> int | None:
+    """このプロセスのピーク常駐メモリ（取れなければ None）"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024   # Linux は KB 単位
+    if os.name == "nt":
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        c = _Counters()
+        c.cb = ctypes.sizeof(c)
+        try:
+            ok = ctypes.windll.psapi.GetProcessMemoryInfo(
+                ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(c), c.cb)
+        except (AttributeError, OSError):
+            return None
+        return c.PeakWorkingSetSize if ok else None
+    return None
+
+class RunStats:
+    def __init__(self, script: str):
+        self.script = script
+        self.stages = {}
+        self.files = []          # (key, 秒, バイト数, 種別, 文字コード)
+        self.counters = Counter()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        w0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            prev = self.stages.get(name, {"wall": 0.0, "cpu": 0.0})
+            self.stages[name] = {"wall": round(prev["wall"] + time.perf_counter() - w0, 4),
+                                 "cpu": round(prev["cpu"] + time.process_time() - c0, 4)}
+
+    def add_file(self, key: str, seconds: float, nbytes: int, kind: str, encoding: str = ""):
+        self.files.append((key, seconds, nbytes, kind, encoding))
+        self.counters[f"files_{kind}"] += 1
+        self.counters["bytes_read"] += nbytes
+        if encoding and kind == "parsed":
+            self.counters[f"encoding_{encoding}"] += 1
+
+    def report(self, slowest: int = SLOWEST_N) -> dict:
+        parse = [f for f in self.files if f[3] != "reused"]
+        return {
+            "script": self.script,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total": {"wall": round(time.perf_counter() - self._wall0, 4),
+                      "cpu": round(time.process_time() - self._cpu0, 4)},
+            "stages": self.stages,
+            "counters": dict(sorted(self.counters.items())),
+            "files": {
+                "count": len(self.files),
+                "parse_sec_total": round(sum(f[1] for f in parse), 4),
+                "slowest": [{"file": k, "sec": round(s, 5), "bytes": b, "kind": kind, "encoding": enc}
+                            for k, s, b, kind, enc in sorted(parse, key=lambda f: -f[1])[:slowest]],
+            },
+            "peak_memory_bytes": peak_memory_bytes(),
+        }
+
+    def write(self, path: Path, slowest: int = SLOWEST_N) -> dict:
+        rep = self.report(slowest)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rep, f, ensure_ascii=False, indent=2)
+        return rep
+
+def profiled(path: Path | None):
+    """with profiled(path): … の中を cProfile で計測し path に書き出す（snakeviz / pstats で見る）"""
+    if path is None:
+        return nullcontext()
+    return _profiled(path)
+
+@contextmanager
+def _profiled(path: Path):
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield prof
+    finally:
+        prof.disable()
+        prof.dump_stats(str(path))
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+kifu_watch.py
+- data/<分類>/*.kif を一定間隔で見張り、追加・変更・削除があれば同じプロセスの中で再生成する
+    python kifu_watch.py [--interval 0.5] [--dedup] [--virtual] [--inline] [--worker] [--api URL]
+    python kifu_watch.py --once        … 1回だけ再生成して終わる（regen.bat の前半を1プロセスで）
+  再生成するもの: data/kifu_list.json（generate_kifu_list.py と同じ）・data/meta/・
+                  index.html・data/search_index.json（--virtual / --inline / --worker / --api は
+                  generate_index_with_search.py と同じ）
+  --dedup を付けたときだけ generate_kifu_dedup.py --collapse と同じく重複を除く
+  （除いた棋譜は分類での絞り込みにも出なくなるので既定では除かない）
+  局面索引・序盤統計・対局者別などは従来どおり regen.bat で作る
+- 起動後はマニフェストと手順ハッシュの索引をメモリに持ったまま使い回す
+  * 見張りは stat だけ（ファイルは開かない）。変わったファイルだけを読み直して解析する
+  * kifu_list.json・マニフェストを読み直さないので、大会後にまとめて棋譜を置いても1秒以内に一覧へ出る
+- kifu_server.py は kifu_list.json の更新を見て自動で読み直すので、並べて起動しておけば検索 API にもすぐ反映される
+- 再生成に失敗しても（消えたファイルなど）止まらず、次の回で再び試す。Ctrl+C で終了
+"""
+
+import argparse
+import os
+import time
+
+from generate_kifu_list import (base_dir, data_dir, manifest_json, output_json, load_manifest,
+                                scan_kif_files, update_kifu_list)
+from kifu_stats import RunStats
+from generate_kifu_dedup import DedupIndex, build_dedup_index, collapse_entries
+from generate_index_with_search import (OUTPUT_HTML, ROWS_JSON, SEARCH_JSON, build_html, normalize_items,
+                                        sort_items, splits_search, write_rows_json, write_search_json)
+
+DEFAULT_INTERVAL = 0.5
+
+def snapshot(root=data_dir) -> dict:
+    """{"分類/ファイル名": (size, mtime_ns)}（stat のみ）"""
+    snap = {}
+    for dir_name, kif_file in scan_kif_files(root):
+        try:
+            st = kif_file.stat()
+        except FileNotFoundError:   # 列挙と stat の間に消えた
+            continue
+        snap[f"{dir_name}/{kif_file.name}"] = (st.st_size, st.st_mtime_ns)
+    return snap
+
+def diff_snapshots(old: dict, new: dict):
+    """戻り値: (追加, 変更, 削除) の key のリスト"""
+    added = [k for k in new if k not in old]
+    changed = [k for k in new if k in old and old[k] != new[k]]
+    removed = [k for k in old if k not in new]
+    return added, changed, removed
+
+class KifuWatcher:
+    """再生成に使う状態（マニフェスト・手順ハッシュの索引）をメモリに持つ"""
+
+    def __init__(self, virtual: bool = False, worker: bool = False, api: str = "", jobs: int = 1,
+                 dedup: bool = False, inline: bool = False):
+        self.virtual, self.worker, self.api, self.inline = virtual, worker, api, inline
+        self.jobs = jobs
+        self.manifest = load_manifest(manifest_json)
+        self.dedup = DedupIndex.load() if dedup else None
+        self.snap = {}
+
+    def regenerate(self) -> dict:
+        """kifu_list.json →（--dedup なら重複除去）→ index.html。戻り値: 件数と段階ごとの秒数"""
+        stats = RunStats("kifu_watch")
+        entries, self.manifest, counts, _ = update_kifu_list(
+            self.manifest, jobs=self.jobs, stats=stats,
+            collapse=self._collapse if self.dedup is not None else None)
+        t0 = time.perf_counter()
+        items = sort_items(normalize_items(entries))
+        OUTPUT_HTML.write_text(build_html(items, virtual=self.virtual, worker=self.worker, api=self.api,
+                                          inline=self.inline), encoding="utf-8")
+        if self.virtual:
+            write_rows_json(items)
+        if splits_search(self.worker, self.api, self.inline):
+            write_search_json(items)
+        t1 = time.perf_counter()
+        sec = {name: st["wall"] for name, st in stats.stages.items()}
+        dedup = sec.pop("dedup", 0.0)
+        return dict(counts, entries=len(entries),
+                    sec={"list": round(sum(sec.values()), 3), "dedup": round(dedup, 3),
+                         "html": round(t1 - t0, 3)})
+
+    def _collapse(self, entries, manifest):
+        """update_kifu_list の collapse（generate_kifu_dedup.py --collapse と同じ）"""
+        self.dedup, _ = build_dedup_index(entries, self.dedup, manifest)
+        self.dedup.save()
+        return collapse_entries(entries, self.dedup)
+
+    def poll(self):
+        """変化があれば再生成する。戻り値: (追加, 変更, 削除, 再生成の結果 or None)"""
+        snap = snapshot()
+        added, changed, removed = diff_snapshots(self.snap, snap)
+        if not (added or changed or removed):
+            return added, changed, removed, None
+        result = self.regenerate()
+        self.snap = snap
+        return added, changed, removed, result
+
+def _report(added, changed, removed, result):
+    stamp = time.strftime("%H:%M:%S")
+    for label, keys in (("+", added), ("*", changed), ("-", removed)):
+        for key in keys[:10]:
+            print(f"  {label} {key}")
+        if len(keys) > 10:
+            print(f"  {label} ... 他 {len(keys) - 10} 件")
+    s = result["sec"]
+    print(f"[{stamp}] {result['entries']} 件（parsed={result['parsed']} removed={result['removed']}）"
+          f" list {s['list']}s / dedup {s['dedup']}s / html {s['html']}s")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="data/ の棋譜を見張り、kifu_list.json と index.html を同じプロセスで再生成し続ける")
+    ap.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                    help=f"見張る間隔（秒。既定 {DEFAULT_INTERVAL}）")
+    ap.add_argument("--once", action="store_true", help="1回だけ再生成して終わる")
+    ap.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                    help="抽出の並列数（0 で CPU 数。既定 1。起動直後の全件解析が重いとき用）")
+    ap.add_argument("--dedup", action="store_true",
+                    help="同じ対局の重複棋譜を一覧から除く（generate_kifu_dedup.py --collapse と同じ）")
+    ap.add_argument("--virtual", action="store_true", help=f"仮想スクロール版にする（{ROWS_JSON} も書く）")
+    ap.add_argument("--inline", action="store_true", help=f"検索索引を {SEARCH_JSON} に分けずページに埋め込む")
+    ap.add_argument("--worker", action="store_true", help="検索を Web Worker で行う")
+    ap.add_argument("--api", default="", metavar="URL", help="検索を kifu_server.py の API に問い合わせる")
+    args = ap.parse_args(argv)
+
+    os.chdir(base_dir)   # generate_index_with_search.py の出力先は相対パス（regen.bat と同じくリポジトリ直下で動かす）
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    watcher = KifuWatcher(virtual=args.virtual, worker=args.worker, api=args.api, jobs=jobs,
+                          dedup=args.dedup, inline=args.inline)
+    watcher.snap = snapshot()
+    result = watcher.regenerate()
+    print(f"[INFO] {len(watcher.snap)} files / {result['entries']} 件を生成しました"
+          f"（parsed={result['parsed']} reused={result['reused']}）")
+    if args.once:
+        print(f"✅ {output_json} と {OUTPUT_HTML} を更新しました。")
+        return
+    print(f"✅ {data_dir} を {args.interval} 秒ごとに見張っています（Ctrl+C で終了）")
+    try:
+        while True:
+            time.sleep(args.interval)
+            try:
+                added, changed, removed, result = watcher.poll()
+            except (OSError, ValueError) as e:   # 書き込み途中・消えたファイルなど。次の回で取り直す
+                print(f"[WARN] 再生成に失敗しました（次の回で再試行）: {e}")
+                continue
+            if result:
+                _report(added, changed, removed, result)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
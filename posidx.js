@@ -0,0 +1,126 @@
+// posidx.js — 局面検索（generate_position_index.py が出力した data/posidx/ を引く）
+// - SFEN → 64bit Zobrist ハッシュ（kif_board.py と同じ SplitMix64 固定シードの乱数表を BigInt で再現）
+// - ハッシュ上位 8bit のシャード XX.bin を1つだけ取得し、<QII レコードを二分探索
+(function(){
+  const MASK = (1n << 64n) - 1n;
+  const SEED = 0x4B49465550534958n;   // kif_board.ZOBRIST_SEED
+  const HAND_MAX = 18;
+  const KIND = {P:1, L:2, N:3, S:4, B:5, R:6, G:7, K:8};
+
+  function* splitmix64(seed){
+    let x = seed & MASK;
+    for(;;){
+      x = (x + 0x9E3779B97F4A7C15n) & MASK;
+      let z = x;
+      z = ((z ^ (z >> 30n)) * 0xBF58476D1CE4E5B9n) & MASK;
+      z = ((z ^ (z >> 27n)) * 0x94D049BB133111EBn) & MASK;
+      yield z ^ (z >> 31n);
+    }
+  }
+
+  let Z = null;
+  function zobrist(){
+    if(Z) return Z;
+    const g = splitmix64(SEED);
+    const next = ()=>g.next().value;
+    const board = [];
+    for(let sq=0; sq<81; sq++){
+      const row = [];
+      for(let p=0; p<28; p++) row.push(next());
+      board.push(row);
+    }
+    const hand = [];
+    for(let s=0; s<2; s++){
+      const hs = [];
+      for(let k=0; k<7; k++){
+        const c = [0n];
+        for(let n=1; n<=HAND_MAX; n++) c.push(next());
+        hs.push(c);
+      }
+      hand.push(hs);
+    }
+    Z = {board, hand, side: next()};
+    return Z;
+  }
+
+  function hashSfen(sfen){
+    const parts = (sfen||"").trim().split(/\s+/);
+    if(parts[0] === "sfen") parts.shift();
+    if(parts.length < 3) throw new Error("SFEN が不正です");
+    const ranks = parts[0].split("/");
+    if(ranks.length !== 9) throw new Error("SFEN の段数が不正です");
+    const z = zobrist();
+    let key = 0n;
+    ranks.forEach((row, i)=>{
+      let f = 9, promoted = false;
+      for(const ch of row){
+        if(ch >= "1" && ch <= "9"){ f -= Number(ch); continue; }
+        if(ch === "+"){ promoted = true; continue; }
+        const up = ch.toUpperCase();
+        let kind = KIND[up];
+        if(!kind || f < 1) throw new Error("SFEN の駒が不正です: " + ch);
+        if(promoted) kind += 8;
+        const sq = (f-1)*9 + i;
+        key ^= z.board[sq][kind - 1 + (ch === up ? 0 : 14)];
+        f--; promoted = false;
+      }
+    });
+    if(parts[2] !== "-"){
+      const counts = [[0,0,0,0,0,0,0],[0,0,0,0,0,0,0]];
+      let n = "";
+      for(const ch of parts[2]){
+        if(ch >= "0" && ch <= "9"){ n += ch; continue; }
+        const up = ch.toUpperCase();
+        const kind = KIND[up];
+        if(!kind || kind > 7) throw new Error("SFEN の持駒が不正です: " + ch);
+        counts[ch === up ? 0 : 1][kind-1] += Number(n || 1);
+        n = "";
+      }
+      for(let s=0; s<2; s++){
+        for(let k=0; k<7; k++){
+          if(counts[s][k]) key ^= z.hand[s][k][Math.min(counts[s][k], HAND_MAX)];
+        }
+      }
+    }
+    if(parts[1] === "w") key ^= z.side;
+    return key;
+  }
+
+  const metaCache = {};
+  function loadMeta(base){
+    base = base || "data/posidx/";
+    if(!metaCache[base]){
+      metaCache[base] = fetch(base + "index.json").then(r=>{
+        if(!r.ok) throw new Error("局面索引がありません");
+        return r.json();
+      });
+    }
+    return metaCache[base];
+  }
+
+  // key: BigInt → [{game, ply}]
+  async function lookup(key, base){
+    base = base || "data/posidx/";
+    const shard = Number(key >> 56n).toString(16).padStart(2, "0");
+    const res = await fetch(base + shard + ".bin");
+    if(!res.ok) return [];
+    const buf = await res.arrayBuffer();
+    const dv = new DataView(buf);
+    const SIZE = 16;
+    let lo = 0, hi = Math.floor(buf.byteLength / SIZE);
+    while(lo < hi){
+      const mid = (lo + hi) >> 1;
+      if(dv.getBigUint64(mid*SIZE, true) < key) lo = mid + 1; else hi = mid;
+    }
+    const out = [];
+    for(let i=lo; i*SIZE < buf.byteLength; i++){
+      if(dv.getBigUint64(i*SIZE, true) !== key) break;
+      out.push({game: dv.getUint32(i*SIZE + 8, true), ply: dv.getUint32(i*SIZE + 12, true)});
+    }
+    return out;
+  }
+
+  const api = {hashSfen, lookup, loadMeta};
+  if(typeof window !== "undefined") window.KifuPosIdx = api;
+  if(typeof module !== "undefined") module.exports = api;
+})();
@@ -1,3 +1,3 @@
 @echo off
 cd /d %~dp0
-python generate_kifu_list.py && python generate_index_with_search.py
+python kifu_watch.py --once && python generate_kifu_pack.py && python generate_position_index.py && python generate_opening_tree.py && python generate_player_index.py
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# スクリプトはリポジトリ直下に置いてあるので、そこから import できるようにする
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
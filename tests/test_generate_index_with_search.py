@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from generate_index_with_search import (
+    bigrams, build_search_index, build_sort_orders, norm_players, norm_title, splits_search, template_attrs,
+)
+
+ITEMS = [
+    {"date": "2024-05-01", "title": "岩手王座戦", "players": "佐藤 vs 鈴木", "dir": "kifB", "file": "a.kif"},
+    {"date": "", "title": "Ｂ級リーグ", "players": "やまだ四段 vs 佐藤", "dir": "kifA", "file": "b.kif"},
+    {"date": "2025-01-02", "title": "岩手名人戦", "players": "鈴木 vs 田中", "dir": "kifB", "file": "c.kif"},
+]
+
+def test_normalization_matches_page_rules():
+    assert norm_title("Ｂ級リーグ") == "b級リーグ"
+    assert norm_players("やまだ四段") == "ヤマダ"
+    assert norm_players("佐藤 vs 鈴木") == "佐藤vs鈴木"
+
+def test_bigrams_skip_whitespace():
+    assert bigrams("ab c") == {"ab"}
+    assert bigrams("岩手王座戦") == {"岩手", "手王", "王座", "座戦"}
+    assert bigrams("a") == set()
+
+def test_search_index_postings():
+    index = build_search_index(ITEMS)
+    assert index["t"] == ["岩手王座戦", "b級リーグ", "岩手名人戦"]
+    assert index["p"] == ["佐藤vs鈴木", "ヤマダvs佐藤", "鈴木vs田中"]
+    assert index["ti"]["岩手"] == [0, 2]
+    assert index["ti"]["b級"] == [1]
+    assert index["pi"]["佐藤"] == [0, 1]
+    assert index["pi"]["鈴木"] == [0, 2]
+    assert "s鈴" in index["pi"] and "vs" in index["pi"]
+    assert index["pi"]["vs"] == [0, 1, 2]
+
+def test_sort_orders_are_row_permutations():
+    orders = build_sort_orders(ITEMS)
+    assert orders == {
+        "date_asc": [1, 0, 2],
+        "date_desc": [2, 0, 1],
+        "title_asc": [1, 2, 0],
+        "title_desc": [0, 2, 1],
+        "dir_asc": [1, 2, 0],
+        "dir_desc": [2, 0, 1],
+    }
+
+def test_sort_orders_compare_utf16_code_units_like_js():
+    items = [{"date": "2024-01-01", "title": t, "players": "", "dir": "", "file": ""} for t in ("\ue000", "\U00020bb7")]
+    # U+E000 < U+20BB7 だが UTF-16 では 0xE000 > 0xD842（JS の文字列比較と同じ順）
+    assert build_sort_orders(items)["title_asc"] == [1, 0]
+
+def test_search_json_split_and_attrs():
+    assert splits_search(worker=False, api="", inline=False)
+    assert not splits_search(worker=False, api="", inline=True)
+    assert splits_search(worker=True, api="", inline=True)
+    assert template_attrs(False, False, "", inline=True) == ("", "")
+    assert template_attrs(True, True, "") == (' data-rows="data/index_rows.json"',
+                                               ' data-src="data/search_index.json" data-worker="1"')
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from generate_kifu_dedup import DedupIndex, collapse_entries, load_dir_rank, move_hash
+from kif_parser import parse_kif
+
+MOVES = """手数----指手---------消費時間--
+   1 ７六歩(77)
+   2 ３四歩(33)
+   3 ２六歩(27)
+   4 ８四歩(83)
+まで4手で中断
+"""
+
+def test_dir_rank_skips_comments_and_blank_lines(tmp_path):
+    path = tmp_path / "dir_order.txt"
+    path.write_text("# 先頭は コメント\nkif2\n\n#kif\nkif\n（未分類）\nkif2\n", encoding="utf-8")
+    assert load_dir_rank(path) == {"kif2": 0, "kif": 1, "": 2}
+    assert load_dir_rank(tmp_path / "none.txt") == {}
+
+def test_move_hash_ignores_header_and_skips_short_games():
+    a = parse_kif("棋戦：岩手王座戦\n先手：澤口\n後手：田内\n" + MOVES)
+    b = parse_kif("棋戦：王座戦1回戦\n先手：澤口　諒允\n" + MOVES)
+    assert move_hash(a, min_plies=4) == move_hash(b, min_plies=4)
+    assert len(move_hash(a, min_plies=4)) == 16
+    assert move_hash(a, min_plies=5) is None
+
+def test_collapse_keeps_dated_then_named_then_dir_order():
+    entries = [
+        {"dir": "kif", "file": "a.kif", "date": "", "players": "A vs B"},
+        {"dir": "kif2", "file": "a.kif", "date": "2022-09-08", "players": ""},
+        {"dir": "kif", "file": "b.kif", "date": "2022-09-08", "players": "A vs B"},
+        {"dir": "kif2", "file": "b.kif", "date": "2022-09-08", "players": "A vs B"},
+        {"dir": "kif", "file": "c.kif", "date": "2023-01-01", "players": "C vs D"},
+    ]
+    index = DedupIndex({"kif/a.kif": ["s1", "h1"], "kif2/a.kif": ["s2", "h1"], "kif/b.kif": ["s3", "h1"],
+                        "kif2/b.kif": ["s4", "h1"], "kif/c.kif": ["s5", "h2"]})
+    out = collapse_entries(entries, index, dir_rank={"kif2": 0, "kif": 1})
+    assert [(e["dir"], e["file"]) for e in out] == [("kif2", "b.kif"), ("kif", "c.kif")]
+    assert out[0]["dups"] == ["kif/b.kif", "kif2/a.kif", "kif/a.kif"]
+    assert "dups" not in out[1]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from generate_kifu_list import extract_entry, parse_date_from_file_name, parse_date_from_title
+
+HEADER = "開始日時：2026/03/10 00:19:37\n対局日：2026/03/08\n先手：澤口　諒允\n後手：田内　遼\n手数----指手---------消費時間--\n"
+
+def write_kif(path, text):
+    path.write_bytes(text.encode("cp932"))
+    return path
+
+def test_date_prefers_taikyokubi_over_start_time(tmp_path):
+    kif = write_kif(tmp_path / "岩手王座戦1回戦　澤口　田内.kif", HEADER)
+    entry, header, _ = extract_entry(kif, "kif2026")
+    assert header["開始日時"].startswith("2026/03/10")
+    assert entry["date"] == "2026-03-08"
+
+def test_date_falls_back_to_start_time(tmp_path):
+    kif = write_kif(tmp_path / "岩手王座戦1回戦.kif", HEADER.replace("対局日：2026/03/08\n", ""))
+    assert extract_entry(kif, "kif2026")[0]["date"] == "2026-03-10"
+
+def test_date_from_file_name_comes_first(tmp_path):
+    kif = write_kif(tmp_path / "2026.03 08　岩手王座戦1回戦　澤口　田内.kif", HEADER)
+    assert extract_entry(kif, "kif2026")[0]["date"] == "2026-03-08"
+    assert parse_date_from_title("2010.6.9 第54期") == "2010-06-09"
+
+def test_space_separated_date_only_at_file_name_start():
+    assert parse_date_from_file_name("2026.03 08　岩手王座戦") == "2026-03-08"
+    assert parse_date_from_title("2026.03 08　岩手王座戦") is None
+    assert parse_date_from_title("2019.10 3局目") is None
+    assert parse_date_from_file_name("2019.10 3局目") is None
+    assert parse_date_from_file_name("第3局 2019.10 03") is None
+
+def test_game_ids_survive_additions_and_removals():
+    from generate_kifu_list import assign_game_ids
+    e = lambda f: {"dir": "kif", "file": f}
+    ids, table = assign_game_ids([e("a"), e("b"), e("c")], [])
+    assert ids == [0, 1, 2]
+    prev = [[t["dir"], t["file"]] if t else None for t in table]
+    ids, table = assign_game_ids([e("new"), e("a"), e("c")], [None if g[1] == "b" else g for g in prev])
+    assert ids == [1, 0, 2]
+    ids, table = assign_game_ids([e("c"), e("a")], prev)
+    assert ids == [2, 0] and table[1] is None
+    ids, _ = assign_game_ids([e("x"), e("c"), e("a"), e("y")], [[t["dir"], t["file"]] if t else None for t in table])
+    assert ids == [1, 2, 0, 3]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from generate_publish import collect_sources, publish
+
+def make_tree(root):
+    root.mkdir(exist_ok=True)
+    (root / "index.html").write_text("<html><body></body></html>", encoding="utf-8")
+    for rel in ("data/kifu_list.json", "data/kif/a.kif", "data/pack/kifu-001.pack", "data/pack/index.json",
+                "data/.kifu_manifest.json", "data/kifu_list.stats.json"):
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_bytes(b"x")
+
+def test_collect_sources_skips_local_caches(tmp_path):
+    make_tree(tmp_path)
+    assert collect_sources(tmp_path) == ["index.html", "data/kif/a.kif", "data/kifu_list.json"]
+
+def test_publish_state_kept_outside_output(tmp_path):
+    make_tree(tmp_path / "src")
+    out = tmp_path / "public"
+    publish(out, use_brotli=False, root=tmp_path / "src")
+    assert (tmp_path / ".public.publish.json").is_file()
+    assert not any(p.name.startswith(".") for p in out.rglob("*"))
+    assert publish(out, use_brotli=False, root=tmp_path / "src").counts["written"] == 0
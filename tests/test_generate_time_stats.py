@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+import generate_time_stats
+from generate_time_stats import extract_times, load_columns, parse_time_limit, save_columns, summarize
+
+GAME_A = """持ち時間：2分
+手数----指手---------消費時間--
+   1 ７六歩(77)   ( 0:10/00:00:10)
+   2 ３四歩(33)   ( 0:20/00:00:20)
+   3 ２六歩(27)   ( 1:05/00:01:15)
+   4 ８四歩(83)   ( 0:05/00:00:25)
+   5 ２五歩(26)   ( 0:02/00:01:17)
+   6 投了
+"""
+GAME_B = """手数----指手---------消費時間--
+   1 ７六歩(77)   ( 0:30/00:00:30)
+   2 ３四歩(33)   ( 0:40/00:00:40)
+"""
+GAME_NO_TIMES = """手数----指手---------消費時間--
+   1 ７六歩(77)
+   2 ３四歩(33)
+"""
+GAMES = {"a.kif": ("佐藤 vs 鈴木", GAME_A), "b.kif": ("鈴木 vs 田中", GAME_B), "c.kif": ("佐藤 vs 田中", GAME_NO_TIMES)}
+
+def extract(monkeypatch):
+    entries = [{"dir": "t", "file": f, "players": p, "title": "", "date": ""} for f, (p, _) in GAMES.items()]
+    monkeypatch.setattr(generate_time_stats, "load_aliases", lambda: {})
+    monkeypatch.setattr(generate_time_stats, "iter_games",
+                        lambda es: ((e, GAMES[e["file"]][1].encode("cp932")) for e in es))
+    return extract_times(entries)
+
+def test_parse_time_limit():
+    assert parse_time_limit("15分+60秒") == 900
+    assert parse_time_limit("各８時間") == 28800
+    assert parse_time_limit("0時間40分") == 2400
+    assert parse_time_limit("秒読み30秒") == 0
+    assert parse_time_limit("") == 0
+
+def test_extract_columns(monkeypatch):
+    cols, meta = extract(monkeypatch)
+    assert {k: list(v) for k, v in cols.items()} == {
+        "sec": [10, 20, 65, 5, 2, 30, 40],
+        "cum": [10, 20, 75, 25, 77, 30, 40],
+        "ply": [1, 2, 3, 4, 5, 1, 2],
+        "player": [1, 2, 1, 2, 1, 2, 3],
+        "offsets": [0, 5, 7],
+        "limit": [120, 0],
+    }
+    assert meta == {"version": 1, "games": [["t", "a.kif"], ["t", "b.kif"]], "players": ["", "佐藤", "鈴木", "田中"]}
+
+def test_columns_round_trip_and_summary(monkeypatch, tmp_path):
+    cols, meta = extract(monkeypatch)
+    save_columns(cols, meta, tmp_path)
+    assert (tmp_path / "ply.bin").read_bytes() == array("H", [1, 2, 3, 4, 5, 1, 2]).tobytes()
+    loaded, loaded_meta = load_columns(tmp_path)
+    assert {k: list(v) for k, v in loaded.items()} == {k: list(v) for k, v in cols.items()}
+
+    s = summarize(loaded, loaded_meta)
+    assert s["games"] == 2 and s["moves"] == 7
+    assert s["avg_by_phase"] == {"序盤": 24.6, "中盤": None, "終盤": None}
+    # 5手目: 先手の残り 120 - 75 = 45 秒 < 60
+    assert s["time_trouble"] == {"threshold_sec": 60, "games_with_limit": 1, "games_in_trouble": 1, "rate": 100.0}
+    assert s["players"] == [
+        {"player": "鈴木", "games": 2, "moves": 3, "avg": {"序盤": 18.3, "中盤": None, "終盤": None},
+         "trouble_rate": 0.0},
+        {"player": "佐藤", "games": 1, "moves": 3, "avg": {"序盤": 25.7, "中盤": None, "終盤": None},
+         "trouble_rate": 33.3},
+        {"player": "田中", "games": 1, "moves": 1, "avg": {"序盤": 40.0, "中盤": None, "終盤": None},
+         "trouble_rate": None},
+    ]
+    assert [r["player"] for r in summarize(loaded, loaded_meta, top=1)["players"]] == ["鈴木"]
+
+def test_phase_bounds():
+    cols = {"sec": array("I", [1, 2, 3, 4]), "cum": array("I", [1, 2, 4, 6]), "ply": array("H", [30, 31, 80, 81]),
+            "player": array("I", [1, 2, 1, 2]), "offsets": array("I", [0, 4]), "limit": array("I", [0])}
+    s = summarize(cols, {"games": [["t", "x.kif"]], "players": ["", "甲", "乙"]})
+    assert s["avg_by_phase"] == {"序盤": 1.0, "中盤": 2.5, "終盤": 4.0}
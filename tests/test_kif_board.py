@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import generate_position_index
+from generate_position_index import PositionIndex, write_position_index
+from kif_board import Position, replay
+from kif_parser import parse_kif
+
+HIRATE_SFEN = "lnsgkgsnl/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/1B5R1/LNSGKGSNL b - 1"
+KAKU_GAWARI = """手数----指手---------消費時間--
+   1 ７六歩(77)
+   2 ３四歩(33)
+   3 ２二角成(88)
+   4 同　銀(31)
+   5 ４五角打
+"""
+ROOT = Path(__file__).resolve().parent.parent
+
+def positions(text):
+    return [(ply, pos.copy()) for ply, pos in replay(parse_kif(text))]
+
+def test_start_position_and_sfen_round_trip():
+    pos = Position()
+    assert pos.sfen() == HIRATE_SFEN
+    assert Position.from_sfen(HIRATE_SFEN).key == pos.key
+    assert Position.from_sfen("sfen " + HIRATE_SFEN).key == pos.key
+
+def test_incremental_key_matches_full_recompute():
+    seen = positions(KAKU_GAWARI)
+    assert [ply for ply, _ in seen] == [0, 1, 2, 3, 4, 5]
+    for _, pos in seen:
+        assert pos.key == pos.compute_key()
+        assert Position.from_sfen(pos.sfen()).key == pos.key
+    assert seen[4][1].sfen(5) == "lnsgkg1nl/1r5s1/pppppp1pp/6p2/9/2P6/PP1PPPPPP/7R1/LNSGKGSNL b Bb 5"
+    assert seen[5][1].sfen(6) == "lnsgkg1nl/1r5s1/pppppp1pp/6p2/5B3/2P6/PP1PPPPPP/7R1/LNSGKGSNL w b 6"
+
+def test_transposition_gives_same_key():
+    a = positions("   1 ７六歩(77)\n   2 ３四歩(33)\n   3 ２六歩(27)\n")[-1][1]
+    b = positions("   1 ２六歩(27)\n   2 ３四歩(33)\n   3 ７六歩(77)\n")[-1][1]
+    c = positions("   1 ２六歩(27)\n   2 ８四歩(83)\n   3 ７六歩(77)\n")[-1][1]
+    assert a.key == b.key != c.key
+
+def test_illegal_move_stops_replay():
+    assert [ply for ply, _ in positions("   1 ７六歩(77)\n   2 ７五歩(76)\n   3 ２六歩(27)\n")] == [0, 1]
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node が無い")
+def test_posidx_js_hash_matches_python():
+    sfens = [HIRATE_SFEN] + [pos.sfen(ply + 1) for ply, pos in positions(KAKU_GAWARI)]
+    sfens.append("8l/1r3+P1k1/4p1sp1/p5p1p/1p1pP4/P1P3P1P/1PSP1S3/1KG6/LN6L w RB2G2Sbg2n3p 120")
+    script = ("const m = require(process.argv[1]);"
+              "console.log(JSON.stringify(JSON.parse(process.argv[2]).map(s => m.hashSfen(s).toString())));")
+    out = subprocess.run(["node", "-e", script, str(ROOT / "posidx.js"), json.dumps(sfens)],
+                         capture_output=True, text=True, check=True).stdout
+    assert json.loads(out) == [str(Position.from_sfen(s).key) for s in sfens]
+
+def test_position_index_lookup(tmp_path, monkeypatch):
+    games = {"a.kif": KAKU_GAWARI, "b.kif": "   1 ２六歩(27)\n   2 ３四歩(33)\n   3 ７六歩(77)\n"}
+    entries = [{"dir": "kif", "file": f, "title": f, "date": ""} for f in games]
+    monkeypatch.setattr(generate_position_index, "iter_games",
+                        lambda es: ((e, games[e["file"]].encode("utf-8")) for e in es))
+    n_records, _ = write_position_index(entries, tmp_path)
+    assert n_records == 6 + 4
+    idx = PositionIndex(tmp_path)
+    start = Position().key
+    assert sorted(idx.lookup(start)) == [(0, 0), (1, 0)]
+    after3 = positions(KAKU_GAWARI)[3][1]
+    assert idx.lookup(after3.key) == [(0, 3)]
+    assert idx.lookup_sfen(positions(games["b.kif"])[3][1].sfen()) == [(1, 3)]
+    assert idx.game(1) == {"dir": "kif", "file": "b.kif", "title": "b.kif", "date": ""}
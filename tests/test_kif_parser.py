@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from kif_parser import (DROP_BASE, FU, GI, KA, KI, OU, is_drop, is_promote, make_drop, make_move, move_from,
+                        move_to, move_to_kif, move_to_usi, parse_kif, square)
+
+HANDICAP = """手合割：香落ち
+上手：上手さん
+下手：下手さん
+手数----指手---------消費時間--
+   1 ３二金(41)   ( 0:05/00:00:05)
+   2 ７六歩(77)   ( 0:10/00:00:10)
+   3 投了
+まで2手で下手の勝ち
+"""
+
+def board_diagram(rows, turn_line):
+    lines = ["後手の持駒：なし", "  ９ ８ ７ ６ ５ ４ ３ ２ １", "+---------------------------+"]
+    kan = "一二三四五六七八九"
+    for r in range(9):
+        lines.append("|" + rows.get(r + 1, " ・" * 9) + "|" + kan[r])
+    lines += ["+---------------------------+", "先手の持駒：金　歩二", turn_line]
+    return "\n".join(lines) + "\n"
+
+GOTE_BAN = board_diagram({1: " ・ ・ ・ ・v玉 ・ ・ ・ ・", 9: " ・ ・ ・ ・ 玉 ・ ・ ・ ・"}, "後手番") + """手数----指手---------消費時間--
+   1 ４一玉(51)
+   2 ５二金打
+   3 投了
+まで2手で先手の勝ち
+"""
+
+def test_handicap_game_starts_with_uwate_and_shitate_wins():
+    game = parse_kif(HANDICAP)
+    assert game.first_side == 1
+    assert game.end == "投了"
+    assert game.winner == 0
+    assert game.side_to_move(3) == 1
+
+def test_gote_ban_diagram_sets_first_side_and_winner():
+    game = parse_kif(GOTE_BAN)
+    assert game.first_side == 1
+    assert game.winner == 0
+    board, hands = game.initial
+    assert board[square(5, 1)] == -OU and board[square(5, 9)] == OU
+    assert hands[0][KI - 1] == 1 and hands[0][FU - 1] == 2
+    assert hands[1] == [0] * 7
+
+GAME = """開始日時：2021/02/12 10:00:00
+棋戦：テスト
+先手：甲
+後手：乙
+手数----指手---------消費時間--
+   1 ７六歩(77)   ( 0:07/00:00:07)
+   2 ３四歩(33)   ( 1:02/00:01:02)
+*コメント
+   3 ２二角成(88) ( 0:10/00:00:17)
+   4 同　銀(31)   ( 0:03/00:01:05)
+   5 ４五角打     ( 0:01/00:00:18)
+   6 投了
+まで5手で先手の勝ち
+
+変化：3手
+   3 ６六歩(67)   ( 0:01/00:00:08)
+   4 ８四歩(83)
+"""
+
+def test_move_codes_pack_destination_origin_and_flags():
+    assert make_move(square(7, 6), square(7, 7)) == 0x1E3B
+    code = make_move(square(2, 2), square(8, 8), promote=True)
+    assert (move_to(code), move_from(code)) == (square(2, 2), square(8, 8))
+    assert is_promote(code) and not is_drop(code)
+    drop = make_drop(square(4, 5), KA)
+    assert is_drop(drop) and move_from(drop) == DROP_BASE + KA and not is_promote(drop)
+
+def test_parse_main_line_moves_pieces_and_times():
+    game = parse_kif(GAME)
+    main = game.main
+    assert list(main.moves) == [make_move(square(7, 6), square(7, 7)), make_move(square(3, 4), square(3, 3)),
+                                make_move(square(2, 2), square(8, 8), promote=True),
+                                make_move(square(2, 2), square(3, 1)), make_drop(square(4, 5), KA)]
+    assert list(main.pieces) == [FU, FU, KA, GI, KA]
+    assert list(main.times) == [7, 62, 10, 3, 1]
+    assert game.header == {"開始日時": "2021/02/12 10:00:00", "棋戦": "テスト", "先手": "甲", "後手": "乙"}
+    assert (game.end, game.winner, game.skipped) == ("投了", 0, 0)
+
+def test_variation_branches_from_parent_line():
+    game = parse_kif(GAME)
+    assert len(game.lines) == 2
+    var = game.lines[1]
+    assert (var.start, var.parent, len(var)) == (3, game.main, 2)
+    assert var.move_at(2) == game.main.moves[1]
+    assert var.move_at(3) == make_move(square(6, 6), square(6, 7))
+
+def test_kif_and_usi_notation_round_trip():
+    game = parse_kif(GAME)
+    prev, kif, usi = None, [], []
+    for _, code, piece, _ in game.main.iter_moves():
+        kif.append(move_to_kif(code, piece, prev))
+        usi.append(move_to_usi(code))
+        prev = move_to(code)
+    assert kif == ["７六歩(77)", "３四歩(33)", "２二角成(88)", "同　銀(31)", "４五角打"]
+    assert usi == ["7g7f", "3c3d", "8h2b+", "3a2b", "B*4e"]
+
+def test_end_markers_and_result_line():
+    moves = "手数----指手---------消費時間--\n   1 ７六歩(77)\n   2 ３四歩(33)\n"
+    assert parse_kif(moves + "   3 千日手\n").winner is None
+    assert parse_kif(moves + "   3 反則勝ち\n").winner == 0
+    assert parse_kif(moves + "   3 詰み\n").winner == 1
+    assert parse_kif(moves + "まで2手で後手の勝ち\n").winner == 1
+    assert parse_kif(moves + "まで2手で先手の反則負け\n").winner == 1
+    assert parse_kif(moves + "   3 中断\nまで2手で中断\n").winner is None
+
+def test_moves_without_separator_and_skipped_plies():
+    game = parse_kif("先手：甲\n   1 ７六歩(77)\n   3 ２六歩(27)\n   2 ３四歩(33)\n")
+    assert len(game.main) == 2
+    assert game.skipped == 1
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import kifu_convert
+from kif_board import Position
+from kif_parser import make_drop, make_move, parse_kif, square, KI
+from kifu_convert import convert_entries, convert_game, kif2_relative
+
+KAKU_GAWARI = """開始日時：2024/01/02(火) 10:00:00
+場所：盛岡
+棋戦：岩手王座戦
+先手：佐藤
+後手：鈴木
+手数----指手---------消費時間--
+   1 ７六歩(77)   ( 0:05/00:00:05)
+   2 ３四歩(33)   ( 0:03/00:00:03)
+   3 ２二角成(88)   ( 0:01/00:00:06)
+   4 同　銀(31)   ( 0:02/00:00:05)
+   5 ４五角打   ( 0:10/00:00:16)
+   6 投了
+"""
+KYO_OCHI = """手合割：香落ち
+上手：鈴木
+下手：佐藤
+手数----指手---------消費時間--
+   1 ３四歩(33)
+   2 ７六歩(77)
+"""
+
+def test_convert_standard_game():
+    out = convert_game(parse_kif(KAKU_GAWARI))
+    assert out["moves"] == 5 and out["end"] == "投了"
+    assert out["sfen"] == "lnsgkgsnl/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/1B5R1/LNSGKGSNL b - 1"
+    assert out["usi"] == "position startpos moves 7g7f 3c3d 8h2b+ 3a2b B*4e"
+    assert out["kif2"] == "▲７六歩 △３四歩 ▲２二角成 △同　銀 ▲４五角"
+    assert out["csa"] == "\n".join([
+        "V2.2", "N+佐藤", "N-鈴木", "$EVENT:岩手王座戦", "$SITE:盛岡", "$START_TIME:2024/01/02 10:00:00",
+        "PI", "+",
+        "+7776FU", "T5", "-3334FU", "T3", "+8822UM", "T1", "-3122GI", "T2", "+0045KA", "T10",
+        "%TORYO",
+    ]) + "\n"
+
+def test_convert_handicap_game_starts_from_sfen():
+    out = convert_game(parse_kif(KYO_OCHI))
+    sfen = "lnsgkgsn1/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/1B5R1/LNSGKGSNL w - 1"
+    assert out["sfen"] == sfen
+    assert out["usi"] == f"position sfen {sfen} moves 3c3d 7g7f"
+    assert out["kif2"] == "△３四歩 ▲７六歩"
+    assert out["csa"].splitlines()[:4] == ["V2.2", "N+佐藤", "N-鈴木", "P1-KY-KE-GI-KI-OU-KI-GI-KE * "]
+    assert out["csa"].splitlines()[12:] == ["-", "-3334FU", "T0", "+7776FU", "T0"]
+
+def test_convert_stops_at_illegal_move():
+    out = convert_game(parse_kif("   1 ７六歩(77)\n   2 ７五歩(76)\n   3 投了\n"), formats=("usi", "kif2"))
+    assert out == {"moves": 1, "end": "", "sfen": Position().sfen(1),
+                   "usi": "position startpos moves 7g7f", "kif2": "▲７六歩"}
+
+def test_kif2_relative_words():
+    start = Position()
+    assert kif2_relative(start.board, make_move(square(5, 8), square(4, 9)), 0) == "右"
+    assert kif2_relative(start.board, make_move(square(5, 8), square(6, 9)), 0) == "左"
+    gote = Position.from_sfen(start.sfen().replace(" b ", " w "))
+    assert kif2_relative(gote.board, make_move(square(5, 2), square(6, 1)), 1) == "右"
+
+    golds = Position.from_sfen("4k4/9/9/9/9/9/9/4GG3/4K4 b G 1")
+    assert kif2_relative(golds.board, make_move(square(5, 7), square(5, 8)), 0) == "直"
+    assert kif2_relative(golds.board, make_move(square(5, 7), square(4, 8)), 0) == "右"
+    assert kif2_relative(golds.board, make_move(square(4, 7), square(4, 8)), 0) == "直"
+    assert kif2_relative(golds.board, make_move(square(3, 8), square(4, 8)), 0) == ""
+    assert kif2_relative(golds.board, make_drop(square(5, 7), KI), 0) == "打"
+    assert kif2_relative(golds.board, make_drop(square(1, 1), KI), 0) == ""
+
+    side_by_side = Position.from_sfen("4k4/9/9/9/9/9/9/4G4/3K1G3 b - 1")
+    assert kif2_relative(side_by_side.board, make_move(square(4, 8), square(5, 8)), 0) == "寄"
+    assert kif2_relative(side_by_side.board, make_move(square(4, 8), square(4, 9)), 0) == "上"
+
+def test_convert_entries_writes_one_line_per_game(monkeypatch):
+    entries = [{"dir": "t", "file": "a.kif", "title": "岩手王座戦", "date": "2024-01-02", "players": "佐藤 vs 鈴木"}]
+    monkeypatch.setattr(kifu_convert, "iter_games", lambda es: ((e, KAKU_GAWARI.encode("cp932")) for e in es))
+    out = io.StringIO()
+    assert convert_entries(entries, out, formats=("usi",)) == 1
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 1
+    rec = json.loads(lines[0])
+    assert list(rec) == ["dir", "file", "title", "date", "players", "header", "moves", "end", "sfen", "usi"]
+    assert rec["header"]["場所"] == "盛岡" and rec["moves"] == 5
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import json
+import sqlite3
+
+from generate_kifu_list import write_sqlite
+from kifu_query import build_query, main
+
+def record(dir_, file_, title, sente, gote, date):
+    return {
+        "entry": {"dir": dir_, "file": file_, "title": title, "players": f"{sente} vs {gote}", "date": date},
+        "header": {"先手": sente, "後手": gote, "場所": "盛岡"},
+        "sha1": f"sha-{file_}",
+        "encoding": "cp932",
+    }
+
+def manifest():
+    return {
+        "kif2026/a.kif": record("kif2026", "a.kif", "岩手王座戦1回戦", "澤口　諒允", "田内　遼", "2026-03-08"),
+        "kif2026/b.kif": record("kif2026", "b.kif", "岩手名人戦", "田内　遼四段", "佐藤　一", "2026-02-01"),
+        "kif2025/c.kif": record("kif2025", "c.kif", "Ｂ級リーグ", "佐藤　一", "鈴木　二", ""),
+    }
+
+def query(db, **kw):
+    con = sqlite3.connect(db)
+    sql, params = build_query(**kw, columns=("file",))
+    rows = [r[0] for r in con.execute(sql, params)]
+    con.close()
+    return rows
+
+def test_write_sqlite_is_incremental(tmp_path):
+    db = tmp_path / "kifu.sqlite"
+    m = manifest()
+    assert write_sqlite(db, m) == {"inserted": 3, "updated": 0, "deleted": 0, "unchanged": 0}
+    assert write_sqlite(db, m) == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 3}
+
+    m["kif2026/b.kif"]["entry"]["title"] = "岩手竜王戦"
+    del m["kif2025/c.kif"]
+    assert write_sqlite(db, m) == {"inserted": 0, "updated": 1, "deleted": 1, "unchanged": 1}
+    con = sqlite3.connect(db)
+    assert con.execute("SELECT count(*) FROM games_fts").fetchone() == (2,)
+    assert con.execute("SELECT place FROM games WHERE file = 'a.kif'").fetchone() == ("盛岡",)
+    con.close()
+    assert query(db, titles=["竜王"]) == ["b.kif"]
+    assert query(db, titles=["名人"]) == []
+
+def test_query_uses_search_normalization(tmp_path):
+    db = tmp_path / "kifu.sqlite"
+    write_sqlite(db, manifest())
+    assert query(db) == ["a.kif", "b.kif", "c.kif"]
+    assert query(db, players=["田内"]) == ["a.kif", "b.kif"]          # 2文字 → LIKE
+    assert query(db, players=["田内遼", "佐藤"]) == ["b.kif"]         # 段位を落として照合
+    assert query(db, titles=["b級"]) == ["c.kif"]
+    assert query(db, titles=["岩手王座"]) == ["a.kif"]                # 3文字以上 → trigram MATCH
+    assert query(db, dirs=["kif2025"]) == ["c.kif"]
+    assert query(db, date_from="2026-03-01") == ["a.kif"]
+    assert query(db, date_to="2026-12-31") == ["a.kif", "b.kif"]     # 日付不明は除く
+
+def test_cli_json_and_count(tmp_path, capsys):
+    db = tmp_path / "kifu.sqlite"
+    write_sqlite(db, manifest())
+    main(["--db", str(db), "--player", "佐藤", "--json"])
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(l)["file"] for l in lines] == ["b.kif", "c.kif"]
+    main(["--db", str(db), "--title", "岩手", "--count"])
+    assert capsys.readouterr().out == "2\n"
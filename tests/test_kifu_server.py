@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from kifu_server import KifuServer
+
+def make_root(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "config").write_text("[core]\n", encoding="utf-8")
+    (tmp_path / ".publish.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "viewer.html").write_text("<html></html>", encoding="utf-8")
+    return KifuServer(root=tmp_path)
+
+def test_static_serves_plain_file(tmp_path):
+    status, ctype, body, _ = make_root(tmp_path).route("/viewer.html", "", {})
+    assert status == 200
+    assert ctype.startswith("text/html")
+    assert body == b"<html></html>"
+
+def test_static_hides_dot_directory(tmp_path):
+    server = make_root(tmp_path)
+    assert server.route("/.git/config", "", {})[0] == 404
+    assert server.route("/%2Egit/config", "", {})[0] == 404
+
+def test_static_hides_dot_file_and_parent(tmp_path):
+    server = make_root(tmp_path)
+    assert server.route("/.publish.json", "", {})[0] == 404
+    assert server.route("/../etc/passwd", "", {})[0] == 404
+
+def test_root_page_served_from_publish_root(tmp_path):
+    (tmp_path / "index.html").write_text("<html>public</html>", encoding="utf-8")
+    status, ctype, body, extra = KifuServer(root=tmp_path).route("/", "", {})
+    assert status == 200
+    assert body == b"<html>public</html>"
+    assert extra["Cache-Control"] == "no-cache"